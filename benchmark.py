@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark reprodutível das operações CRUD
+Este script sobe um mongod descartável (ou, sem mongod instalado, um substituto
+em memória via mongomock), popula usuarios, produtos, posts e vendas na escala
+pedida e mede cada operação de MongoDBCRUD e os pipelines de exemplo_agregacao.
+O resultado (p50/p95/p99, throughput e RSS do cliente) é gravado em JSON para
+comparar execuções.
+
+Uso:
+    python benchmark.py --escala 10000 --saida resultado.json
+    python benchmark.py --escala 100000 --baseline resultado.json   # detecta regressões
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from pymongo import MongoClient
+
+from bulk_loader import chunked
+from exemplo_avancado import (
+    pipeline_vendas_por_dia,
+    pipeline_vendas_por_produto,
+    pipeline_vendas_por_vendedor,
+)
+from mongodb_crud import MongoDBCRUD
+from vendas_rollup import VendasRollup
+
+
+SEMENTE = 42
+CIDADES = ["São Paulo", "Rio de Janeiro", "Belo Horizonte", "Salvador", "Fortaleza", "Brasília"]
+CATEGORIAS = ["Eletrônicos", "Informática", "Acessórios", "Roupas"]
+PRODUTOS = ["Notebook", "Mouse", "Teclado", "Monitor", "Smartphone"]
+VENDEDORES = ["Ana", "Bruno", "Carlos", "Diana", "Eduardo"]
+
+
+# Geração de dados (determinística para uma mesma semente)
+def gerar_usuarios(n, rng):
+    """Usuários no formato aceito pelo validador de init-mongo.js"""
+    agora = datetime.now()
+    for i in range(n):
+        yield {
+            "nome": f"Usuário {i}",
+            "email": f"usuario{i}@exemplo.com",
+            "idade": rng.randint(18, 80),
+            "cidade": rng.choice(CIDADES),
+            "ativo": True,
+            "data_criacao": agora,
+        }
+
+
+def gerar_produtos(n, rng):
+    """Produtos no formato de exemplo_ecommerce"""
+    agora = datetime.now()
+    for i in range(n):
+        yield {
+            "nome": f"Produto {i}",
+            "categoria": rng.choice(CATEGORIAS),
+            "preco": round(rng.uniform(10, 3000), 2),
+            "estoque": rng.randint(0, 500),
+            "descricao": "Produto gerado para benchmark",
+            "ativo": True,
+            "data_criacao": agora,
+        }
+
+
+def gerar_posts(n, rng):
+    """Posts no formato de exemplo_blog, com comentários embutidos"""
+    agora = datetime.now()
+    for i in range(n):
+        yield {
+            "titulo": f"Post {i}",
+            "autor": rng.choice(VENDEDORES),
+            "conteudo": "Lorem ipsum dolor sit amet " * rng.randint(5, 40),
+            "tags": rng.sample(["mongodb", "python", "nosql", "database", "crud"], 2),
+            "visualizacoes": rng.randint(0, 10000),
+            "likes": rng.randint(0, 500),
+            "comentarios": [
+                {"autor": rng.choice(VENDEDORES), "texto": "Comentário de teste " * 3,
+                 "data": agora - timedelta(hours=h)}
+                for h in range(rng.randint(0, 10))
+            ],
+            "publicado": rng.random() < 0.8,
+            "data_publicacao": agora - timedelta(days=rng.randint(0, 365)),
+        }
+
+
+def gerar_vendas(n, rng):
+    """Vendas no formato de exemplo_agregacao"""
+    agora = datetime.now()
+    for _ in range(n):
+        quantidade = rng.randint(1, 10)
+        preco = round(rng.uniform(50, 2000), 2)
+        yield {
+            "produto": rng.choice(PRODUTOS),
+            "vendedor": rng.choice(VENDEDORES),
+            "quantidade": quantidade,
+            "preco_unitario": preco,
+            "total": quantidade * preco,
+            "data_venda": agora - timedelta(days=rng.randint(0, 30)),
+        }
+
+
+GERADORES = {
+    "usuarios": gerar_usuarios,
+    "produtos": gerar_produtos,
+    "posts": gerar_posts,
+    "vendas": gerar_vendas,
+}
+
+
+# Servidor descartável
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def servidor_temporario(mongod=None, argumentos=()):
+    """
+    Sobe um mongod descartável em um diretório temporário
+
+    Se o binário não existir, usa mongomock (em memória) quando instalado.
+
+    Yields:
+        tuple: (connection_string ou None, MongoClient, backend)
+    """
+    binario = mongod or shutil.which("mongod")
+    if binario is None:
+        try:
+            import mongomock
+        except ImportError:
+            raise RuntimeError("mongod não encontrado e mongomock não instalado "
+                               "(pip install mongomock)")
+        yield None, mongomock.MongoClient(), "mongomock"
+        return
+
+    diretorio = tempfile.mkdtemp(prefix="bench-mongod-")
+    porta = _porta_livre()
+    processo = subprocess.Popen(
+        [binario, "--dbpath", diretorio, "--port", str(porta), "--bind_ip", "127.0.0.1",
+         "--quiet", *argumentos],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    uri = f"mongodb://127.0.0.1:{porta}/"
+    client = MongoClient(uri, serverSelectionTimeoutMS=500)
+    try:
+        limite = time.monotonic() + 30
+        while True:
+            try:
+                client.admin.command("ping")
+                break
+            except Exception:
+                if processo.poll() is not None or time.monotonic() > limite:
+                    raise RuntimeError("mongod não iniciou")
+                time.sleep(0.2)
+        yield uri, client, "mongod"
+    finally:
+        client.close()
+        processo.terminate()
+        try:
+            processo.wait(10)
+        except subprocess.TimeoutExpired:
+            processo.kill()
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+# Medição
+def percentis(amostras, pontos=(50, 95, 99)):
+    """Percentis (nearest-rank) de uma lista de amostras"""
+    if not amostras:
+        return {f"p{p}": None for p in pontos}
+    ordenadas = sorted(amostras)
+    return {
+        f"p{p}": ordenadas[min(len(ordenadas) - 1, max(0, int(round(p / 100 * len(ordenadas))) - 1))]
+        for p in pontos
+    }
+
+
+def rss_atual_mb():
+    """RSS atual do processo em MB (Linux), ou o pico se /proc não existir"""
+    try:
+        with open("/proc/self/statm") as arquivo:
+            paginas = int(arquivo.read().split()[1])
+        return paginas * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return rss_pico_mb()
+
+
+def rss_pico_mb():
+    """Pico de RSS do processo em MB"""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1024 / 1024 if sys.platform == "darwin" else pico / 1024
+
+
+def medir(funcao, iteracoes, aquecimento=5):
+    """
+    Executa funcao(i) repetidamente e resume as latências
+
+    O aquecimento recebe i a partir de `iteracoes`, fora da faixa medida, para que
+    operações que geram chaves a partir de i não repitam as da medição.
+
+    Returns:
+        dict: iteracoes, p50/p95/p99 e média em ms, ops/s e RSS ao final
+    """
+    for i in range(iteracoes, iteracoes + min(aquecimento, iteracoes)):
+        funcao(i)
+    latencias = []
+    inicio = time.perf_counter()
+    for i in range(iteracoes):
+        t0 = time.perf_counter()
+        funcao(i)
+        latencias.append((time.perf_counter() - t0) * 1000)
+    total = time.perf_counter() - inicio
+    return {
+        "iteracoes": iteracoes,
+        **{k: round(v, 4) for k, v in percentis(latencias).items()},
+        "media_ms": round(sum(latencias) / len(latencias), 4),
+        "ops_por_segundo": round(iteracoes / total, 1) if total else None,
+        "rss_mb": round(rss_atual_mb(), 1),
+    }
+
+
+# Cenário
+def popular(db, escala, rng, batch_size=5000):
+    """Insere `escala` documentos em cada coleção e cria os índices de init-mongo.js"""
+    tempos = {}
+    for nome, gerador in GERADORES.items():
+        colecao = db[nome]
+        colecao.drop()
+        inicio = time.perf_counter()
+        for lote in chunked(gerador(escala, rng), batch_size):
+            colecao.insert_many(lote, ordered=False)
+        tempos[nome] = round(time.perf_counter() - inicio, 3)
+    db.usuarios.create_index("email", unique=True)
+    for campo in ("nome", "idade", "cidade", "ativo"):
+        db.usuarios.create_index(campo)
+    db.usuarios.create_index([("idade", 1), ("_id", 1)])
+    for campo in ("produto", "vendedor"):
+        db.vendas.create_index(campo)
+    db.vendas.create_index([("data_venda", -1)])
+    return tempos
+
+
+def _crud(client, uri, database):
+    crud = MongoDBCRUD(uri or "mongodb://mongomock/", database, verbosity="quiet")
+    if uri is None:
+        crud.client = client
+        crud.db = client[database]
+        crud.collection = crud.db["usuarios"]
+    else:
+        crud.connect()
+    return crud
+
+
+def executar(escala, iteracoes, mongod=None, database="bench_db"):
+    """
+    Executa o benchmark completo
+
+    Returns:
+        dict: Metadados, tempos de carga e métricas por operação
+    """
+    rng = random.Random(SEMENTE)
+    with servidor_temporario(mongod) as (uri, client, backend):
+        db = client[database]
+        carga = popular(db, escala, rng)
+        crud = _crud(client, uri, database)
+
+        ids = [str(d["_id"]) for d in islice(db.usuarios.find({}, {"_id": 1}), 10000)]
+        novo = iter(range(10**9))
+        operacoes = {}
+
+        operacoes["create_user"] = medir(
+            lambda i: crud.create_user(f"Bench {i}", f"bench{i}@exemplo.com", 30),
+            iteracoes)
+        operacoes["create_multiple_users"] = medir(
+            lambda i: crud.create_multiple_users([
+                {"nome": "Lote", "email": f"lote{next(novo)}@exemplo.com", "idade": 40}
+                for _ in range(100)
+            ]), max(1, iteracoes // 10))
+        operacoes["read_user_by_id"] = medir(
+            lambda i: crud.read_user_by_id(rng.choice(ids)), iteracoes)
+        operacoes["read_users_by_filter"] = medir(
+            lambda i: crud.read_users_by_filter({"idade": rng.randint(18, 80)}, limite=100),
+            iteracoes)
+        operacoes["read_users_by_filter_summary"] = medir(
+            lambda i: crud.read_users_by_filter({"idade": rng.randint(18, 80)}, limite=100,
+                                                view="summary"), iteracoes)
+        operacoes["read_all_users"] = medir(lambda i: crud.read_all_users(), 3, aquecimento=0)
+        operacoes["paginate_users"] = medir(
+            lambda i: crud.paginate_users(sort_key="idade", page_size=50), iteracoes)
+        operacoes["count_users"] = medir(lambda i: crud.count_users(), iteracoes)
+        operacoes["update_user"] = medir(
+            lambda i: crud.update_user(rng.choice(ids), {"idade": rng.randint(18, 80)}), iteracoes)
+        operacoes["update_multiple_users"] = medir(
+            lambda i: crud.update_multiple_users({"cidade": rng.choice(CIDADES),
+                                                  "idade": rng.randint(18, 80)},
+                                                 {"status": "bench"}), iteracoes)
+        removiveis = list(ids)
+        rng.shuffle(removiveis)
+        operacoes["delete_user"] = medir(
+            lambda i: crud.delete_user(removiveis.pop()), min(iteracoes, len(removiveis) // 2))
+        # Mesmas chaves (medição e aquecimento) criadas em create_user
+        operacoes["delete_users_by_filter"] = medir(
+            lambda i: crud.delete_users_by_filter({"email": f"bench{i}@exemplo.com"}),
+            iteracoes)
+
+        vendas = db.vendas
+        data_limite = datetime.now() - timedelta(days=7)
+        operacoes["agregacao_vendas_por_produto"] = medir(
+            lambda i: list(vendas.aggregate(pipeline_vendas_por_produto())), max(1, iteracoes // 10))
+        operacoes["agregacao_vendas_por_vendedor"] = medir(
+            lambda i: list(vendas.aggregate(pipeline_vendas_por_vendedor())), max(1, iteracoes // 10))
+        operacoes["agregacao_vendas_por_dia"] = medir(
+            lambda i: list(vendas.aggregate(pipeline_vendas_por_dia(data_limite))),
+            max(1, iteracoes // 10))
+        if backend == "mongod":
+            # Mesmos relatórios lidos dos resumos incrementais ($merge não existe no mongomock)
+            rollup = VendasRollup(db, atraso_s=0)
+            inicio = time.perf_counter()
+            rollup.backfill()
+            carga["backfill_rollups"] = round(time.perf_counter() - inicio, 3)
+            operacoes["rollup_vendas_por_produto"] = medir(
+                lambda i: rollup.vendas_por_produto(), iteracoes)
+            operacoes["rollup_vendas_por_vendedor"] = medir(
+                lambda i: rollup.vendas_por_vendedor(), iteracoes)
+            operacoes["rollup_vendas_por_dia"] = medir(
+                lambda i: rollup.vendas_por_dia(data_limite), iteracoes)
+
+        crud.disconnect()
+        return {
+            "metadados": {
+                "data": datetime.now().isoformat(timespec="seconds"),
+                "backend": backend,
+                "escala": escala,
+                "iteracoes": iteracoes,
+                "python": platform.python_version(),
+                "plataforma": platform.platform(),
+                "rss_pico_mb": round(rss_pico_mb(), 1),
+            },
+            "carga_s": carga,
+            "operacoes": operacoes,
+        }
+
+
+def comparar(atual, baseline, tolerancia=0.2, metrica="p95"):
+    """
+    Compara duas execuções e lista as operações que pioraram além da tolerância
+
+    Returns:
+        list: (operacao, valor_baseline, valor_atual, variacao) das regressões
+    """
+    regressoes = []
+    for operacao, medidas in atual["operacoes"].items():
+        anterior = baseline.get("operacoes", {}).get(operacao)
+        if not anterior or not anterior.get(metrica) or medidas.get(metrica) is None:
+            continue
+        variacao = medidas[metrica] / anterior[metrica] - 1
+        if variacao > tolerancia:
+            regressoes.append((operacao, anterior[metrica], medidas[metrica], variacao))
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das operações CRUD no MongoDB")
+    parser.add_argument("--escala", type=int, default=10000,
+                        help="Documentos por coleção (ex.: 10000 a 10000000)")
+    parser.add_argument("--iteracoes", type=int, default=200, help="Repetições por operação")
+    parser.add_argument("--mongod", help="Caminho do binário mongod (padrão: PATH)")
+    parser.add_argument("--saida", default="benchmark_resultado.json", help="Arquivo JSON de saída")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparação")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="Piora máxima aceita no p95 em relação ao baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    resultado = executar(args.escala, args.iteracoes, mongod=args.mongod)
+    with open(args.saida, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+    print(f"Backend: {resultado['metadados']['backend']}  Escala: {args.escala}")
+    print(f"{'operação':<32}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>12}")
+    for operacao, m in resultado["operacoes"].items():
+        print(f"{operacao:<32}{m['p50']:>10.3f}{m['p95']:>10.3f}{m['p99']:>10.3f}"
+              f"{m['ops_por_segundo']:>12.1f}")
+    print(f"RSS pico: {resultado['metadados']['rss_pico_mb']} MB  →  {args.saida}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as arquivo:
+            regressoes = comparar(resultado, json.load(arquivo), args.tolerancia)
+        for operacao, antes, depois, variacao in regressoes:
+            print(f"⚠️ Regressão em {operacao}: p95 {antes:.3f} → {depois:.3f} ms (+{variacao:.0%})")
+        if regressoes:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de compressão de rede
+Mede, para cada compressor do driver, os bytes trafegados e a latência de
+leitura e escrita dos conjuntos de dados do blog (posts com comentários
+embutidos) e de vendas. Os bytes vêm dos contadores network.bytesIn/bytesOut
+do serverStatus, que contam o que passou pelo socket (já comprimido).
+
+Precisa de um mongod real (o mongomock não tem camada de rede). Compressores
+sem o módulo instalado (zstandard, python-snappy) são ignorados.
+
+Uso:
+    python benchmark_compressao.py --posts 2000 --vendas 20000 --iteracoes 10
+    python benchmark_compressao.py --compressores nenhum,zlib:1,zlib:9,zstd
+"""
+
+import argparse
+import random
+
+from pymongo import MongoClient
+
+from benchmark import SEMENTE, gerar_posts, gerar_vendas, medir, servidor_temporario
+from config import COMPRESSORES, compressor_available, validate_driver_options
+
+
+CENARIOS_PADRAO = "nenhum,snappy,zlib:1,zlib:6,zlib:9,zstd"
+
+
+def opcoes_do_cenario(cenario):
+    """
+    Opções do MongoClient para 'nenhum', 'compressor' ou 'zlib:nível'
+
+    Returns:
+        dict: Opções validadas, ou None se o compressor não está instalado
+    """
+    if cenario == "nenhum":
+        return {}
+    nome, _, nivel = cenario.partition(":")
+    if nome not in COMPRESSORES:
+        raise ValueError(f"Compressor inválido: {nome} (use nenhum, {', '.join(COMPRESSORES)})")
+    if nivel and nome != "zlib":
+        raise ValueError(f"O driver só permite escolher o nível do zlib, não de {nome}")
+    if not compressor_available(nome):
+        return None
+    opcoes = {"compressors": [nome]}
+    if nivel:
+        opcoes["zlibCompressionLevel"] = nivel
+    return validate_driver_options(opcoes)
+
+
+def _bytes_rede(client):
+    rede = client.admin.command("serverStatus")["network"]
+    return int(rede["bytesIn"]), int(rede["bytesOut"])
+
+
+def medir_bytes(client, funcao, repeticoes):
+    """
+    Bytes recebidos e enviados pelo servidor por execução de funcao
+
+    Desconta o tráfego do próprio serverStatus, medido com duas leituras seguidas.
+    """
+    base_antes = _bytes_rede(client)
+    base_depois = _bytes_rede(client)
+    custo = (base_depois[0] - base_antes[0], base_depois[1] - base_antes[1])
+    antes = _bytes_rede(client)
+    for i in range(repeticoes):
+        funcao(i)
+    depois = _bytes_rede(client)
+    return {
+        "bytes_in": max(0, (depois[0] - antes[0] - custo[0]) // repeticoes),
+        "bytes_out": max(0, (depois[1] - antes[1] - custo[1]) // repeticoes),
+    }
+
+
+def executar(posts, vendas, iteracoes, cenarios=CENARIOS_PADRAO, mongod=None,
+             database="bench_compressao"):
+    """
+    Mede leitura e escrita de posts e vendas com cada compressor
+
+    Returns:
+        dict: {conjunto: {cenário: {leitura, escrita, kb_lidos, kb_escritos}}},
+            ou None sem mongod
+    """
+    rng = random.Random(SEMENTE)
+    conjuntos = {
+        "posts": list(gerar_posts(posts, rng)),
+        "vendas": list(gerar_vendas(vendas, rng)),
+    }
+    resultados = {nome: {} for nome in conjuntos}
+    with servidor_temporario(mongod, ("--networkMessageCompressors", "snappy,zstd,zlib")) \
+            as (uri, client, backend):
+        if uri is None:
+            print("ℹ️ mongod não encontrado: o benchmark de compressão precisa de um servidor real")
+            return None
+        for nome, documentos in conjuntos.items():
+            client[database][nome].drop()
+            client[database][nome].insert_many([dict(doc) for doc in documentos])
+
+        for cenario in (c.strip() for c in cenarios.split(",")):
+            opcoes = opcoes_do_cenario(cenario)
+            if opcoes is None:
+                print(f"ℹ️ {cenario}: módulo do compressor não instalado, cenário ignorado")
+                continue
+            cliente = MongoClient(uri, **opcoes)
+            try:
+                db = cliente[database]
+                for nome, documentos in conjuntos.items():
+                    ler = lambda i: list(db[nome].find({}, batch_size=1000))
+                    escrita = db[f"{nome}_escrita"]
+
+                    def escrever(i):
+                        escrita.delete_many({})
+                        escrita.insert_many([dict(doc) for doc in documentos], ordered=False)
+
+                    lidos = medir_bytes(client, ler, iteracoes)
+                    escritos = medir_bytes(client, escrever, iteracoes)
+                    resultados[nome][cenario] = {
+                        "leitura": medir(ler, iteracoes, aquecimento=1),
+                        "escrita": medir(escrever, iteracoes, aquecimento=1),
+                        "kb_lidos": round(lidos["bytes_out"] / 1024, 1),
+                        "kb_escritos": round(escritos["bytes_in"] / 1024, 1),
+                    }
+                    escrita.drop()
+            finally:
+                cliente.close()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara bytes trafegados e latência por compressor")
+    parser.add_argument("--posts", type=int, default=2000, help="Posts no conjunto do blog")
+    parser.add_argument("--vendas", type=int, default=20000, help="Vendas no conjunto de vendas")
+    parser.add_argument("--iteracoes", type=int, default=10, help="Repetições por cenário")
+    parser.add_argument("--compressores", default=CENARIOS_PADRAO,
+                        help="Cenários separados por vírgula (nenhum, snappy, zstd, zlib:nível)")
+    parser.add_argument("--mongod", help="Caminho do binário mongod (padrão: PATH)")
+    args = parser.parse_args()
+
+    resultados = executar(args.posts, args.vendas, args.iteracoes, args.compressores,
+                          mongod=args.mongod)
+    if not resultados:
+        return
+    print(f"{'conjunto':<8}{'cenário':<10}{'KB lidos':>12}{'leitura p50':>13}"
+          f"{'KB escritos':>13}{'escrita p50':>13}{'razão':>8}")
+    for nome, cenarios in resultados.items():
+        referencia = cenarios.get("nenhum", {}).get("kb_lidos")
+        for cenario, m in cenarios.items():
+            razao = f"{referencia / m['kb_lidos']:.2f}x" if referencia and m["kb_lidos"] else "-"
+            print(f"{nome:<8}{cenario:<10}{m['kb_lidos']:>12.1f}{m['leitura']['p50']:>13.2f}"
+                  f"{m['kb_escritos']:>13.1f}{m['escrita']['p50']:>13.2f}{razao:>8}")
+
+
+if __name__ == "__main__":
+    main()
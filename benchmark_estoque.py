@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de concorrência do controle de estoque
+Vários threads (ou processos, com mongod) vendem o mesmo produto ao mesmo tempo
+e o script confere se o estoque final bate com as vendas confirmadas. Compara a
+baixa condicional de inventory.py com a leitura seguida de $inc (sujeita a
+vender além do estoque) e com pedidos de dois itens via place_order.
+
+Uso:
+    python benchmark_estoque.py --estoque 1000 --trabalhadores 16 --vendas 200
+    python benchmark_estoque.py --processos      # requer mongod no PATH ou --mongod
+"""
+
+import argparse
+import json
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pymongo import MongoClient
+
+from benchmark import servidor_temporario
+from inventory import Inventory
+
+
+MODOS = ("condicional", "ingenuo", "pedido")
+
+
+def _vender(colecao, modo, produto_id, outro_id, vendas, quantidade, barreira=None):
+    """Executa `vendas` tentativas de venda e retorna (confirmadas, recusadas)"""
+    inventario = Inventory(colecao)
+    confirmadas = recusadas = 0
+    if barreira is not None:
+        barreira.wait()
+    for _ in range(vendas):
+        if modo == "condicional":
+            ok = inventario.decrement(produto_id, quantidade, projecao={"_id": 1}) is not None
+        elif modo == "pedido":
+            ok = inventario.place_order({produto_id: quantidade, outro_id: 1})["ok"]
+        else:
+            # Leitura e escrita separadas: outro trabalhador pode vender no intervalo
+            produto = colecao.find_one({"_id": produto_id}, {"estoque": 1})
+            ok = produto["estoque"] >= quantidade
+            if ok:
+                colecao.update_one({"_id": produto_id}, {"$inc": {"estoque": -quantidade}})
+        if ok:
+            confirmadas += 1
+        else:
+            recusadas += 1
+    return confirmadas, recusadas
+
+
+def _vender_em_processo(uri, database, *argumentos):
+    client = MongoClient(uri)
+    try:
+        return _vender(client[database]["produtos"], *argumentos)
+    finally:
+        client.close()
+
+
+def executar(modo, estoque, trabalhadores, vendas, quantidade=1, processos=False,
+             mongod=None, database="bench_estoque"):
+    """
+    Roda um cenário e confere o resultado
+
+    Returns:
+        dict: Vendas confirmadas/recusadas, estoque final e esperado, correto e vendas/s
+    """
+    with servidor_temporario(mongod) as (uri, client, backend):
+        if processos and uri is None:
+            raise RuntimeError("--processos requer um mongod real (mongomock é local ao processo)")
+        colecao = client[database]["produtos"]
+        colecao.drop()
+        produto_id, outro_id = colecao.insert_many([
+            {"nome": "Produto disputado", "estoque": estoque},
+            {"nome": "Brinde", "estoque": estoque * 10},
+        ]).inserted_ids
+
+        argumentos = (modo, produto_id, outro_id, vendas, quantidade)
+        inicio = time.perf_counter()
+        if processos:
+            with ProcessPoolExecutor(trabalhadores) as executor:
+                futuros = [executor.submit(_vender_em_processo, uri, database, *argumentos)
+                           for _ in range(trabalhadores)]
+                resultados = [f.result() for f in futuros]
+        else:
+            barreira = threading.Barrier(trabalhadores)
+            with ThreadPoolExecutor(trabalhadores) as executor:
+                futuros = [executor.submit(_vender, colecao, *argumentos, barreira)
+                           for _ in range(trabalhadores)]
+                resultados = [f.result() for f in futuros]
+        duracao = time.perf_counter() - inicio
+
+        confirmadas = sum(r[0] for r in resultados)
+        final = colecao.find_one({"_id": produto_id})["estoque"]
+        esperado = estoque - confirmadas * quantidade
+        return {
+            "modo": modo,
+            "backend": backend,
+            "paralelismo": f"{trabalhadores} {'processos' if processos else 'threads'}",
+            "tentativas": trabalhadores * vendas,
+            "confirmadas": confirmadas,
+            "recusadas": sum(r[1] for r in resultados),
+            "estoque_final": final,
+            "estoque_esperado": esperado,
+            "vendido_alem_do_estoque": max(0, confirmadas * quantidade - estoque),
+            "correto": final == esperado and final >= 0,
+            "duracao_s": round(duracao, 3),
+            "vendas_por_segundo": round(trabalhadores * vendas / duracao, 1),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de concorrência do estoque")
+    parser.add_argument("--modo", action="append", choices=MODOS,
+                        help="Cenário (pode repetir; padrão: todos)")
+    parser.add_argument("--estoque", type=int, default=1000, help="Estoque inicial do produto")
+    parser.add_argument("--trabalhadores", type=int, default=16, help="Threads ou processos")
+    parser.add_argument("--vendas", type=int, default=200, help="Vendas tentadas por trabalhador")
+    parser.add_argument("--quantidade", type=int, default=1, help="Unidades por venda")
+    parser.add_argument("--processos", action="store_true", help="Usa processos em vez de threads")
+    parser.add_argument("--mongod", help="Caminho do binário mongod (padrão: PATH)")
+    parser.add_argument("--saida", help="Arquivo JSON de saída")
+    args = parser.parse_args()
+
+    resultados = []
+    if args.mongod is None and shutil.which("mongod") is None:
+        print("⚠️ mongod não encontrado: usando mongomock, que não é atômico entre threads; "
+              "as colunas de correção só valem com um servidor real")
+    print(f"{'modo':<14}{'confirmadas':>12}{'recusadas':>10}{'final':>8}{'esperado':>10}"
+          f"{'vendas/s':>11}  correto")
+    for modo in args.modo or MODOS:
+        r = executar(modo, args.estoque, args.trabalhadores, args.vendas, args.quantidade,
+                     processos=args.processos, mongod=args.mongod)
+        resultados.append(r)
+        print(f"{modo:<14}{r['confirmadas']:>12}{r['recusadas']:>10}{r['estoque_final']:>8}"
+              f"{r['estoque_esperado']:>10}{r['vendas_por_segundo']:>11.1f}  "
+              f"{'✅' if r['correto'] else '❌'}")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
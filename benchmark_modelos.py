@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark dos modelos compactos (models.py) contra dicionários
+Para cada coleção, decodifica o mesmo lote de BSON como dict e como modelo
+com __slots__ e compara:
+  - memória retida pelos documentos decodificados (tracemalloc)
+  - vazão da decodificação (documentos por segundo)
+
+A parte "decodificação" roda em qualquer máquina. A parte "ponta a ponta" lê
+do servidor pelos repositórios (find com modelo=True) e só é executada com um
+mongod real, já que o mongomock não aceita document_class personalizada.
+
+Uso:
+    python benchmark_modelos.py --documentos 100000 --iteracoes 10
+"""
+
+import argparse
+import gc
+import random
+import tracemalloc
+
+import bson
+from bson.codec_options import CodecOptions
+
+from benchmark import GERADORES, SEMENTE, medir, servidor_temporario
+from models import MODELOS, codec_options
+from mongodb_crud import MongoDBCRUD
+
+
+OPCOES_DICT = CodecOptions()
+
+
+def memoria_retida_kb(funcao):
+    """Memória ainda alocada (tracemalloc) pelo resultado de funcao()"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        antes = tracemalloc.get_traced_memory()[0]
+        resultado = funcao()
+        retida = tracemalloc.get_traced_memory()[0] - antes
+        del resultado
+        return round(retida / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def _lote(nome, documentos, rng):
+    docs = list(GERADORES[nome](documentos, rng))
+    for doc in docs:
+        doc["_id"] = bson.ObjectId()
+    return docs, b"".join(bson.encode(doc) for doc in docs)
+
+
+def executar(documentos, iteracoes, mongod=None, database="bench_modelos"):
+    """
+    Mede dict e modelo em cada coleção
+
+    Returns:
+        dict: {coleção: {cenário: métricas de medir() + memória retida e docs/s}}
+    """
+    rng = random.Random(SEMENTE)
+    lotes = {nome: _lote(nome, documentos, rng) for nome in MODELOS}
+    resultados = {}
+    for nome, (docs, lote) in lotes.items():
+        opcoes_modelo = codec_options(nome)
+        # Os dois caminhos precisam representar os mesmos documentos
+        assert [m.to_document() for m in bson.decode_all(lote, opcoes_modelo)] == \
+            bson.decode_all(lote, OPCOES_DICT)
+        resultados[nome] = {}
+        for cenario, opcoes in (("dict", OPCOES_DICT), ("modelo", opcoes_modelo)):
+            metricas = medir(lambda i: bson.decode_all(lote, opcoes), iteracoes, aquecimento=1)
+            metricas["retida_kb"] = memoria_retida_kb(lambda: bson.decode_all(lote, opcoes))
+            metricas["docs_por_segundo"] = round(metricas["ops_por_segundo"] * documentos)
+            resultados[nome][cenario] = metricas
+
+    with servidor_temporario(mongod) as (uri, client, backend):
+        if uri is None:
+            print("ℹ️ mongod não encontrado: parte ponta a ponta ignorada "
+                  "(mongomock não aceita document_class personalizada)")
+            return resultados
+        crud = MongoDBCRUD(uri, database, verbosity="quiet", ensure_indexes=False)
+        crud.connect()
+        try:
+            for nome, (docs, _) in lotes.items():
+                repo = crud.repository(nome)
+                repo.collection.drop()
+                repo.collection.insert_many(docs)
+                for cenario, modelo in (("find_dict", False), ("find_modelo", True)):
+                    metricas = medir(lambda i: repo.find(modelo=modelo), iteracoes, aquecimento=1)
+                    metricas["retida_kb"] = memoria_retida_kb(lambda: repo.find(modelo=modelo))
+                    metricas["docs_por_segundo"] = round(metricas["ops_por_segundo"] * documentos)
+                    resultados[nome][cenario] = metricas
+        finally:
+            crud.disconnect()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara memória e vazão de dict e modelos com __slots__")
+    parser.add_argument("--documentos", type=int, default=20000, help="Documentos por coleção")
+    parser.add_argument("--iteracoes", type=int, default=10, help="Repetições por cenário")
+    parser.add_argument("--mongod", help="Caminho do binário mongod (padrão: PATH)")
+    args = parser.parse_args()
+
+    resultados = executar(args.documentos, args.iteracoes, mongod=args.mongod)
+    print(f"{'coleção':<10}{'cenário':<14}{'p50 ms':>10}{'docs/s':>12}{'retida KB':>12}{'B/doc':>8}")
+    for nome, cenarios in resultados.items():
+        for cenario, m in cenarios.items():
+            por_doc = m["retida_kb"] * 1024 / args.documentos
+            print(f"{nome:<10}{cenario:<14}{m['p50']:>10.2f}{m['docs_por_segundo']:>12}"
+                  f"{m['retida_kb']:>12.1f}{por_doc:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
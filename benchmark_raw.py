@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark do caminho RawBSONDocument → JSON
+Compara duas formas de responder uma lista de usuários em JSON:
+  dict - decodifica o BSON em dicionários e serializa com json.dumps
+  raw  - mantém RawBSONDocument e converte com bson_json.raw_list_to_json
+         (decodifica em blocos e usa o mesmo dumps: menos memória, CPU parecida)
+
+A parte "decodificação" mede só o trabalho do cliente sobre um lote de BSON já
+recebido (roda em qualquer máquina). A parte "ponta a ponta" lê do servidor via
+MongoDBCRUD e só é executada com um mongod real, já que o mongomock não
+suporta RawBSONDocument.
+
+Uso:
+    python benchmark_raw.py --documentos 1000 --iteracoes 50
+"""
+
+import argparse
+import json
+import random
+import tracemalloc
+
+import bson
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+from benchmark import SEMENTE, gerar_usuarios, medir, servidor_temporario
+from bson_json import dumps, raw_list_to_json
+from mongodb_crud import MongoDBCRUD
+
+
+OPCOES_RAW = CodecOptions(document_class=RawBSONDocument)
+
+
+def _json_dicts(documentos):
+    return b"[" + b",".join(dumps(doc) for doc in documentos) + b"]"
+
+
+def pico_memoria_kb(funcao):
+    """Pico de memória alocada (tracemalloc) durante uma execução de funcao"""
+    tracemalloc.start()
+    try:
+        funcao(0)
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def _medir(funcao, iteracoes):
+    return {**medir(funcao, iteracoes), "pico_kb": pico_memoria_kb(funcao)}
+
+
+def executar(documentos, iteracoes, mongod=None, database="bench_raw"):
+    """
+    Mede os dois caminhos
+
+    Returns:
+        dict: Métricas de medir() e pico de memória por cenário
+    """
+    rng = random.Random(SEMENTE)
+    usuarios = list(gerar_usuarios(documentos, rng))
+    for usuario in usuarios:
+        usuario["_id"] = bson.ObjectId()
+        usuario["data_atualizacao"] = usuario["data_criacao"]
+    lote = b"".join(bson.encode(usuario) for usuario in usuarios)
+
+    resultados = {
+        "decodificacao_dict": _medir(lambda i: _json_dicts(bson.decode_all(lote)), iteracoes),
+        "decodificacao_raw": _medir(
+            lambda i: raw_list_to_json(bson.decode_all(lote, OPCOES_RAW)), iteracoes),
+    }
+    # Os dois caminhos precisam gerar o mesmo JSON, byte a byte
+    assert _json_dicts(bson.decode_all(lote)) == \
+        bytes(raw_list_to_json(bson.decode_all(lote, OPCOES_RAW)))
+
+    with servidor_temporario(mongod) as (uri, client, backend):
+        if uri is None:
+            print("ℹ️ mongod não encontrado: parte ponta a ponta ignorada (mongomock não suporta RawBSONDocument)")
+            return resultados
+        client[database].usuarios.drop()
+        client[database].usuarios.insert_many(usuarios)
+        crud = MongoDBCRUD(uri, database, verbosity="quiet", ensure_indexes=False)
+        crud.connect()
+        try:
+            resultados["ponta_a_ponta_dict"] = _medir(
+                lambda i: _json_dicts(crud.read_all_users()), iteracoes)
+            resultados["ponta_a_ponta_raw"] = _medir(
+                lambda i: raw_list_to_json(crud.read_all_users(raw=True)), iteracoes)
+        finally:
+            crud.disconnect()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara a serialização JSON via dict e via BSON bruto")
+    parser.add_argument("--documentos", type=int, default=1000, help="Usuários por resposta")
+    parser.add_argument("--iteracoes", type=int, default=50, help="Repetições por cenário")
+    parser.add_argument("--mongod", help="Caminho do binário mongod (padrão: PATH)")
+    args = parser.parse_args()
+
+    resultados = executar(args.documentos, args.iteracoes, mongod=args.mongod)
+    print(f"{'cenário':<24}{'p50 ms':>10}{'p95 ms':>10}{'ops/s':>10}{'pico KB':>10}")
+    for cenario, m in resultados.items():
+        print(f"{cenario:<24}{m['p50']:>10.3f}{m['p95']:>10.3f}{m['ops_por_segundo']:>10.1f}"
+              f"{m['pico_kb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
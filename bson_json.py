@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Conversão de BSON para JSON
+Este módulo serializa usuários em JSON tanto a partir de dicionários (dumps)
+quanto de documentos BSON (RawBSONDocument), para as leituras que só repassam
+os usuários adiante (ex.: resposta de uma API).
+
+ObjectId vira a string hexadecimal e datetime vira ISO 8601 em UTC
+(2024-01-31T12:00:00.000Z). NaN e infinito não existem em JSON e viram null.
+Os documentos BSON são decodificados pelo bson (em C), em blocos, e passam
+pelo mesmo dumps, de modo que os dois caminhos produzem o mesmo JSON; a lista
+bruta nunca vira uma lista de dicionários inteira na memória.
+
+Um conversor em Python puro, que escrevia o JSON direto dos bytes, ficava mais
+lento que bson + json.dumps (benchmark_raw.py) e foi descartado.
+"""
+
+import base64
+import json
+import math
+import re
+from datetime import datetime, timezone
+from itertools import islice
+import bson
+from bson import ObjectId
+from bson.codec_options import CodecOptions
+from bson.decimal128 import Decimal128
+from bson.max_key import MaxKey
+from bson.min_key import MinKey
+from bson.regex import Regex
+from bson.timestamp import Timestamp
+
+# Decodificação em dict, sem o document_class da coleção (RawBSONDocument, modelos)
+_OPCOES_DICT = CodecOptions()
+# Documentos decodificados por vez em raw_list_to_json (limita a memória)
+_BLOCO = 256
+
+# Opções de regex do BSON, na ordem em que o servidor as grava
+_OPCOES_REGEX = (('i', re.I), ('l', re.L), ('m', re.M), ('s', re.S), ('u', re.U), ('x', re.X))
+
+
+def json_default(valor):
+    """Função default de json.dumps para os tipos do BSON"""
+    if isinstance(valor, ObjectId):
+        return str(valor)
+    if isinstance(valor, datetime):
+        if valor.tzinfo is not None:
+            valor = valor.astimezone(timezone.utc).replace(tzinfo=None)
+        return valor.isoformat(timespec='milliseconds') + 'Z'
+    if isinstance(valor, Decimal128):
+        return str(valor)
+    if isinstance(valor, bytes):
+        return base64.b64encode(valor).decode('ascii')
+    if isinstance(valor, Timestamp):
+        return {'t': valor.time, 'i': valor.inc}
+    if isinstance(valor, Regex):
+        opcoes = ''.join(letra for letra, flag in _OPCOES_REGEX if valor.flags & flag)
+        return f"/{valor.pattern}/{opcoes}"
+    if isinstance(valor, (MinKey, MaxKey)):
+        return None
+    raise TypeError(f"Tipo não serializável em JSON: {type(valor).__name__}")
+
+
+def _sem_nao_finitos(valor):
+    """Cópia do valor com NaN e infinito trocados por None"""
+    if isinstance(valor, float):
+        return valor if math.isfinite(valor) else None
+    if isinstance(valor, dict):
+        return {chave: _sem_nao_finitos(item) for chave, item in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_sem_nao_finitos(item) for item in valor]
+    return valor
+
+
+def dumps(documento):
+    """JSON (bytes) de um documento já decodificado, no mesmo formato de raw_to_json"""
+    try:
+        texto = json.dumps(documento, default=json_default, ensure_ascii=False,
+                           separators=(',', ':'), allow_nan=False)
+    except ValueError:
+        # Raro: só documentos com NaN/infinito pagam a cópia
+        texto = json.dumps(_sem_nao_finitos(documento), default=json_default,
+                           ensure_ascii=False, separators=(',', ':'))
+    return texto.encode('utf-8')
+
+
+def raw_to_json(documento, saida=None):
+    """
+    Converte um documento BSON em JSON
+
+    Args:
+        documento (RawBSONDocument|bytes): Documento BSON
+        saida (bytearray, optional): Buffer onde o JSON é acrescentado
+
+    Returns:
+        bytearray: Buffer com o JSON
+    """
+    dados = documento.raw if hasattr(documento, 'raw') else documento
+    saida = bytearray() if saida is None else saida
+    saida += dumps(bson.decode(dados, _OPCOES_DICT))
+    return saida
+
+
+def raw_list_to_json(documentos, saida=None):
+    """Converte uma sequência de documentos BSON num array JSON, no mesmo buffer"""
+    saida = bytearray() if saida is None else saida
+    saida += b'['
+    iterador = iter(documentos)
+    primeiro = True
+    while True:
+        bloco = list(islice(iterador, _BLOCO))
+        if not bloco:
+            break
+        # Um decode_all por bloco custa bem menos que um bson.decode por documento
+        dados = b''.join(doc.raw if hasattr(doc, 'raw') else doc for doc in bloco)
+        for documento in bson.decode_all(dados, _OPCOES_DICT):
+            if primeiro:
+                primeiro = False
+            else:
+                saida += b','
+            saida += dumps(documento)
+    saida += b']'
+    return saida
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Carga em massa de documentos no MongoDB
+Este módulo divide qualquer iterável em lotes e os insere em paralelo com
+insert_many(ordered=False), coletando os erros de cada documento sem interromper
+a carga.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from itertools import islice
+from pymongo.errors import BulkWriteError, PyMongoError
+
+
+# Códigos de erro mais comuns na carga de usuários
+ERRO_CHAVE_DUPLICADA = 11000
+ERRO_VALIDACAO_SCHEMA = 121
+
+
+def chunked(iteravel, tamanho):
+    """
+    Divide um iterável em listas de até `tamanho` elementos, sob demanda
+
+    Args:
+        iteravel: Qualquer iterável (lista, gerador, cursor, arquivo...)
+        tamanho (int): Tamanho máximo de cada lote
+
+    Yields:
+        list: Próximo lote
+    """
+    iterador = iter(iteravel)
+    while True:
+        lote = list(islice(iterador, tamanho))
+        if not lote:
+            return
+        yield lote
+
+
+class BulkLoader:
+    """Insere grandes volumes de documentos em lotes paralelos"""
+
+    def __init__(self, collection, batch_size=1000, workers=4, max_erros=1000,
+                 preparar=None, validar=None):
+        """
+        Inicializa o carregador
+
+        Args:
+            collection (Collection): Coleção de destino (compartilha o cliente do pool)
+            batch_size (int): Documentos por insert_many
+            workers (int): Número de lotes enviados simultaneamente
+            max_erros (int): Quantidade máxima de erros detalhados guardados
+                (os demais são apenas contados)
+            preparar (callable, optional): Função aplicada a cada documento antes
+                do envio; deve retornar um novo dicionário
+            validar (callable, optional): Função documento -> lista de erros,
+                aplicada depois de preparar; documentos com erros são rejeitados
+                no cliente (ex.: SchemaValidator.errors de schema_validator.py)
+        """
+        self.collection = collection
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_erros = max_erros
+        self.preparar = preparar
+        self.validar = validar
+        self._lock = threading.Lock()
+
+    def _inserir_lote(self, lote, inicio, indices=None):
+        """
+        Insere um lote e devolve (inseridos, erros) com índices globais
+
+        indices traz a posição global de cada documento quando o lote perdeu
+        documentos rejeitados no cliente.
+        """
+        try:
+            resultado = self.collection.insert_many(lote, ordered=False)
+            return len(resultado.inserted_ids), []
+        except BulkWriteError as e:
+            detalhes = e.details or {}
+            erros = [
+                {
+                    'indice': (indices[erro.get('index', 0)] if indices is not None
+                               else inicio + erro.get('index', 0)),
+                    'codigo': erro.get('code'),
+                    'mensagem': erro.get('errmsg'),
+                }
+                for erro in detalhes.get('writeErrors', [])
+            ]
+            return detalhes.get('nInserted', 0), erros
+        except PyMongoError as e:
+            # Falha do lote inteiro (rede, timeout, autenticação...): o restante da
+            # carga continua e o lote é registrado como um único erro
+            return 0, [{
+                'indice': indices[0] if indices is not None else inicio,
+                'documentos': len(lote),
+                'codigo': getattr(e, 'code', None),
+                'mensagem': str(e),
+                'origem': 'lote',
+            }]
+
+    def _filtrar_invalidos(self, lote, inicio, resumo):
+        """Remove do lote os documentos rejeitados por validar; devolve (lote, índices)"""
+        validos, indices = [], []
+        for deslocamento, documento in enumerate(lote):
+            erros = self.validar(documento)
+            if not erros:
+                validos.append(documento)
+                indices.append(inicio + deslocamento)
+                continue
+            with self._lock:
+                resumo['falhas'] += 1
+                resumo['rejeitados_cliente'] += 1
+                if len(resumo['erros']) < self.max_erros:
+                    resumo['erros'].append({
+                        'indice': inicio + deslocamento,
+                        'codigo': ERRO_VALIDACAO_SCHEMA,
+                        'mensagem': '; '.join(erros),
+                        'origem': 'cliente',
+                    })
+        if len(validos) == len(lote):
+            return lote, None
+        return validos, indices
+
+    def load(self, documentos):
+        """
+        Executa a carga
+
+        A memória usada fica limitada a cerca de 2 * workers lotes, qualquer que
+        seja o tamanho da entrada.
+
+        Args:
+            documentos: Iterável de dicionários
+
+        Returns:
+            dict: Resumo com inseridos, falhas, lotes_falhos, erros detalhados,
+                duração e docs/s (documentos efetivamente inseridos por segundo)
+        """
+        resumo = {
+            'processados': 0,
+            'inseridos': 0,
+            'falhas': 0,
+            'duplicados': 0,
+            'rejeitados_schema': 0,
+            'rejeitados_cliente': 0,
+            'lotes_falhos': 0,
+            'erros': [],
+        }
+        inicio_carga = time.perf_counter()
+        max_em_voo = self.workers * 2
+        em_voo = set()
+
+        def consolidar(futuros):
+            for futuro in futuros:
+                inseridos, erros = futuro.result()
+                with self._lock:
+                    resumo['inseridos'] += inseridos
+                    for erro in erros:
+                        resumo['falhas'] += erro.get('documentos', 1)
+                        if erro.get('origem') == 'lote':
+                            resumo['lotes_falhos'] += 1
+                        elif erro['codigo'] == ERRO_CHAVE_DUPLICADA:
+                            resumo['duplicados'] += 1
+                        elif erro['codigo'] == ERRO_VALIDACAO_SCHEMA:
+                            resumo['rejeitados_schema'] += 1
+                        if len(resumo['erros']) < self.max_erros:
+                            resumo['erros'].append(erro)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            posicao = 0
+            for lote in chunked(documentos, self.batch_size):
+                tamanho = len(lote)
+                if self.preparar:
+                    lote = [self.preparar(doc) for doc in lote]
+                indices = None
+                if self.validar:
+                    lote, indices = self._filtrar_invalidos(lote, posicao, resumo)
+                if lote:
+                    em_voo.add(executor.submit(self._inserir_lote, lote, posicao, indices))
+                posicao += tamanho
+                resumo['processados'] = posicao
+
+                # Controle de fluxo: não lê a entrada mais rápido do que o servidor grava
+                if len(em_voo) >= max_em_voo:
+                    concluidos, em_voo = wait(em_voo, return_when=FIRST_COMPLETED)
+                    consolidar(concluidos)
+
+            concluidos, _ = wait(em_voo)
+            consolidar(concluidos)
+
+        duracao = time.perf_counter() - inicio_carga
+        resumo['duracao_s'] = duracao
+        resumo['docs_por_segundo'] = resumo['inseridos'] / duracao if duracao > 0 else 0.0
+        return resumo
+
+
+def preparar_usuario(usuario):
+    """Cópia do usuário com os campos padrão de criação (não altera a entrada)"""
+    return {**usuario, 'data_criacao': datetime.now(), 'ativo': usuario.get('ativo', True)}
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Coerência do cache entre processos via change streams
+Este módulo observa o change stream de uma coleção em uma thread de fundo e
+invalida no DocumentCache local os documentos alterados por qualquer processo.
+
+Change streams exigem replica set (ou cluster shardado). No `mongo` standalone
+do docker-compose.yml o watcher detecta a falta de suporte, entra no modo
+"ttl" e o cache passa a depender apenas do TTL (opcionalmente reduzido com
+ttl_fallback_s). Para habilitar change streams localmente, inicie o mongod com
+`--replSet rs0` e execute `rs.initiate()` uma vez.
+
+Depois de um evento invalidate (drop, rename), o stream é reaberto com
+start_after, já que resume_after não aceita o token de um invalidate. O modo
+informado acompanha a thread: 'iniciando' até o stream abrir, 'change_stream',
+'reconectando' após um erro, 'ttl' sem suporte e 'parado'/'parando' no stop().
+"""
+
+import os
+import threading
+from bson import json_util
+from pymongo.errors import OperationFailure, PyMongoError
+from crud_logging import logger
+
+
+# Códigos do servidor para "change streams não suportados" e "histórico perdido"
+ERROS_SEM_SUPORTE = {40573, 40324}
+ERRO_HISTORICO_PERDIDO = 286
+# Token que não pode ser retomado (InvalidResumeToken, ChangeStreamFatalError):
+# recomeça sem token, limpando o cache
+ERROS_TOKEN_INVALIDO = {260, 280}
+
+# Operações que encerram o stream e exigem limpar o cache inteiro
+OPERACOES_INVALIDANTES = {'drop', 'dropDatabase', 'rename', 'invalidate'}
+
+
+class ChangeStreamCacheWatcher:
+    """Invalida entradas do cache a partir do change stream da coleção"""
+
+    def __init__(self, collection, cache, resume_token_path=None, ttl_fallback_s=None,
+                 salvar_a_cada=100, espera_reconexao_s=1.0):
+        """
+        Inicializa o watcher
+
+        Args:
+            collection (Collection): Coleção observada
+            cache (DocumentCache): Cache a manter coerente
+            resume_token_path (str, optional): Arquivo onde o resume token é persistido
+            ttl_fallback_s (float, optional): TTL aplicado ao cache se change streams
+                não estiverem disponíveis
+            salvar_a_cada (int): Persiste o resume token a cada N eventos
+            espera_reconexao_s (float): Espera antes de reabrir o stream após erro
+        """
+        self.collection = collection
+        self.cache = cache
+        self.resume_token_path = resume_token_path
+        self.ttl_fallback_s = ttl_fallback_s
+        self.salvar_a_cada = salvar_a_cada
+        self.espera_reconexao_s = espera_reconexao_s
+        self.modo = 'parado'
+        self.eventos = 0
+        self.ultimo_erro = None
+        # Após um invalidate o token só pode ser usado em start_after
+        self._start_after = False
+        self._resume_token = self._carregar_token()
+        self._parar = threading.Event()
+        self._pronto = threading.Event()
+        self._thread = None
+
+    # Resume token
+    def _carregar_token(self):
+        if self.resume_token_path and os.path.exists(self.resume_token_path):
+            try:
+                with open(self.resume_token_path, 'r', encoding='utf-8') as arquivo:
+                    salvo = json_util.loads(arquivo.read())
+            except (OSError, ValueError):
+                return None
+            # Formato atual: {'token': ..., 'start_after': bool}; o antigo era só o token
+            if isinstance(salvo, dict) and 'token' in salvo:
+                self._start_after = bool(salvo.get('start_after'))
+                return salvo['token']
+            return salvo
+        return None
+
+    def _salvar_token(self):
+        if not self.resume_token_path or self._resume_token is None:
+            return
+        temporario = self.resume_token_path + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(json_util.dumps({'token': self._resume_token,
+                                           'start_after': self._start_after}))
+        os.replace(temporario, self.resume_token_path)
+
+    # Ciclo de vida
+    def start(self, timeout_s=5.0):
+        """
+        Inicia a thread de observação
+
+        Args:
+            timeout_s (float): Tempo máximo aguardando a abertura do stream
+
+        Returns:
+            str: Modo resultante ('change_stream', 'ttl' ou, se o stream ainda
+                não abriu dentro do timeout, 'iniciando'; a thread continua
+                tentando e o modo muda quando ela conseguir)
+        """
+        if self._thread is None:
+            self._parar.clear()
+            self._pronto.clear()
+            self.modo = 'iniciando'
+            self._thread = threading.Thread(
+                target=self._executar, name='cache-change-stream', daemon=True
+            )
+            self._thread.start()
+        self._pronto.wait(timeout_s)
+        return self.modo
+
+    def stop(self, timeout_s=5.0):
+        """
+        Encerra a thread e persiste o último resume token
+
+        Returns:
+            bool: True se a thread terminou; False se ainda não terminou dentro
+                do timeout (modo 'parando'; ela sai na próxima verificação)
+        """
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout_s)
+            if self._thread.is_alive():
+                self.modo = 'parando'
+                return False
+            self._thread = None
+        self._salvar_token()
+        if self.modo != 'ttl':
+            self.modo = 'parado'
+        return True
+
+    # Processamento
+    def _executar(self):
+        while not self._parar.is_set():
+            if self._start_after:
+                inicio = {'start_after': self._resume_token}
+            else:
+                inicio = {'resume_after': self._resume_token}
+            try:
+                with self.collection.watch(max_await_time_ms=500, **inicio) as stream:
+                    self.modo = 'change_stream'
+                    self._start_after = False
+                    self._pronto.set()
+                    while not self._parar.is_set() and stream.alive:
+                        mudanca = stream.try_next()
+                        if mudanca is not None:
+                            self._aplicar(mudanca)
+                        # O token avança mesmo sem eventos (postBatchResumeToken)
+                        self._resume_token = stream.resume_token
+            except OperationFailure as e:
+                self.ultimo_erro = e
+                if e.code in ERROS_SEM_SUPORTE:
+                    self._ativar_fallback()
+                    return
+                if e.code == ERRO_HISTORICO_PERDIDO or e.code in ERROS_TOKEN_INVALIDO:
+                    # O token salvo não pode ser retomado: recomeça do zero
+                    self._recomecar()
+                    continue
+                self.modo = 'reconectando'
+                self._parar.wait(self.espera_reconexao_s)
+            except PyMongoError as e:
+                self.ultimo_erro = e
+                self.modo = 'reconectando'
+                self._parar.wait(self.espera_reconexao_s)
+            except Exception as e:
+                # Erro fora do driver (ex.: cliente sem watch()): a thread termina,
+                # então o modo passa a ser o do fallback, não 'iniciando'
+                self.ultimo_erro = e
+                logger.exception("Watcher do change stream encerrado", extra={
+                    'colecao': self.collection.name, 'erro': type(e).__name__,
+                })
+                self._ativar_fallback()
+                return
+
+    def _recomecar(self):
+        # Eventos entre o token perdido e o novo stream não serão vistos
+        self._resume_token = None
+        self._start_after = False
+        self.cache.clear()
+
+    def _aplicar(self, mudanca):
+        operacao = mudanca.get('operationType')
+        if operacao in OPERACOES_INVALIDANTES:
+            self.cache.clear()
+            if operacao == 'invalidate':
+                # O stream termina aqui; o próximo só abre com start_after
+                self._resume_token = mudanca['_id']
+                self._start_after = True
+                self._salvar_token()
+        else:
+            chave = mudanca.get('documentKey', {}).get('_id')
+            if chave is not None:
+                self.cache.invalidate(str(chave))
+        self.eventos += 1
+        if self.eventos % self.salvar_a_cada == 0:
+            self._resume_token = mudanca.get('_id', self._resume_token)
+            self._salvar_token()
+
+    def _ativar_fallback(self):
+        self.modo = 'ttl'
+        if self.ttl_fallback_s is not None:
+            self.cache.ttl_s = self.ttl_fallback_s
+        self._pronto.set()
+
+    def stats(self):
+        """
+        Retorna o estado do watcher
+
+        Returns:
+            dict: modo, eventos processados e último erro
+        """
+        return {
+            'modo': self.modo,
+            'eventos': self.eventos,
+            'ultimo_erro': str(self.ultimo_erro) if self.ultimo_erro else None,
+        }
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Registro de clientes MongoDB compartilhados
+Este módulo mantém um MongoClient por combinação de string de conexão e opções
+de pool, reaproveitado por todas as instâncias de MongoDBCRUD do processo.
+
+release() só conta a referência: o cliente continua aberto, com o pool pronto
+para a próxima instância, até close_all() (ou o fim do processo). A versão
+asyncio (mongodb_crud_async.py) segue a mesma política por event loop.
+"""
+
+import os
+import threading
+from pymongo import MongoClient, monitoring
+
+
+# Opções de pool aceitas como parte da chave do registro
+POOL_OPTIONS = ('maxPoolSize', 'minPoolSize', 'maxIdleTimeMS', 'waitQueueTimeoutMS')
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Coleta estatísticas do pool de conexões de um cliente"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {
+            'conexoes_criadas': 0,
+            'conexoes_fechadas': 0,
+            'conexoes_abertas': 0,
+            'checkouts': 0,
+            'checkouts_falhos': 0,
+            'em_uso': 0,
+            'max_em_uso': 0,
+            'pools_limpos': 0,
+        }
+
+    def _inc(self, chave, valor=1):
+        with self._lock:
+            self.stats[chave] += valor
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._inc('pools_limpos')
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.stats['conexoes_criadas'] += 1
+            self.stats['conexoes_abertas'] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.stats['conexoes_fechadas'] += 1
+            self.stats['conexoes_abertas'] -= 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._inc('checkouts_falhos')
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.stats['checkouts'] += 1
+            self.stats['em_uso'] += 1
+            self.stats['max_em_uso'] = max(self.stats['max_em_uso'], self.stats['em_uso'])
+
+    def connection_checked_in(self, event):
+        self._inc('em_uso', -1)
+
+    def snapshot(self):
+        """Retorna uma cópia das estatísticas atuais"""
+        with self._lock:
+            return dict(self.stats)
+
+
+class _Entrada:
+    """Cliente registrado com seu contador de referências"""
+
+    def __init__(self, client, listener, opcoes):
+        self.client = client
+        self.listener = listener
+        self.opcoes = opcoes
+        self.referencias = 0
+
+
+class ClientRegistry:
+    """Registro de MongoClients compartilhados entre threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clientes = {}
+        self._pid = os.getpid()
+
+    @staticmethod
+    def _chave(connection_string, opcoes):
+        # Listas (ex.: compressors) entram na chave como tuplas
+        return (connection_string, tuple(sorted(
+            (nome, tuple(valor) if isinstance(valor, list) else valor)
+            for nome, valor in opcoes.items()
+        )))
+
+    def _verificar_fork(self):
+        # Clientes herdados de um processo pai não podem ser reutilizados
+        if self._pid != os.getpid():
+            self._reset_apos_fork()
+
+    def _reset_apos_fork(self):
+        self._lock = threading.Lock()
+        self._clientes = {}
+        self._pid = os.getpid()
+
+    def acquire(self, connection_string, ping=True, **opcoes):
+        """
+        Obtém (ou cria) o cliente compartilhado para a conexão informada
+
+        Args:
+            connection_string (str): String de conexão do MongoDB
+            ping (bool): Executa um ping na primeira criação do cliente
+            **opcoes: Opções de pool (maxPoolSize, minPoolSize, maxIdleTimeMS,
+                waitQueueTimeoutMS) e demais opções do MongoClient
+
+        Returns:
+            MongoClient: Cliente compartilhado
+        """
+        self._verificar_fork()
+        chave = self._chave(connection_string, opcoes)
+        with self._lock:
+            entrada = self._clientes.get(chave)
+            if entrada is not None:
+                entrada.referencias += 1
+                return entrada.client
+
+        # Criação e ping ficam fora do lock para não bloquear as demais conexões
+        listener = PoolStatsListener()
+        client = MongoClient(
+            connection_string,
+            event_listeners=[listener],
+            **{'serverSelectionTimeoutMS': 5000, **opcoes}
+        )
+        if ping:
+            try:
+                client.admin.command('ping')
+            except Exception:
+                client.close()
+                raise
+
+        with self._lock:
+            entrada = self._clientes.get(chave)
+            if entrada is None:
+                entrada = _Entrada(client, listener, opcoes)
+                self._clientes[chave] = entrada
+                client = None
+            entrada.referencias += 1
+        if client is not None:
+            # Outra thread registrou o cliente primeiro
+            client.close()
+        return entrada.client
+
+    def release(self, client):
+        """
+        Devolve um cliente ao registro sem fechá-lo
+
+        Args:
+            client (MongoClient): Cliente obtido por acquire()
+        """
+        with self._lock:
+            for entrada in self._clientes.values():
+                if entrada.client is client and entrada.referencias > 0:
+                    entrada.referencias -= 1
+                    return
+
+    def close_all(self):
+        """Fecha todos os clientes registrados (ex.: no encerramento do processo)"""
+        with self._lock:
+            entradas = list(self._clientes.values())
+            self._clientes = {}
+        for entrada in entradas:
+            entrada.client.close()
+
+    def stats(self):
+        """
+        Retorna estatísticas de cada pool registrado
+
+        Returns:
+            list: Lista de dicionários com opções, referências e métricas do pool
+        """
+        with self._lock:
+            entradas = list(self._clientes.items())
+        return [
+            {
+                'connection_string': chave[0],
+                'opcoes': dict(entrada.opcoes),
+                'referencias': entrada.referencias,
+                **entrada.listener.snapshot(),
+            }
+            for chave, entrada in entradas
+        ]
+
+
+# Registro padrão do processo
+registry = ClientRegistry()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry._reset_apos_fork)
+
+
+def get_client(connection_string, **opcoes):
+    """Atalho para registry.acquire()"""
+    return registry.acquire(connection_string, **opcoes)
+
+
+def release_client(client):
+    """Atalho para registry.release()"""
+    registry.release(client)
+
+
+def pool_stats():
+    """Atalho para registry.stats()"""
+    return registry.stats()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exportação colunar de coleções (NumPy, Arrow e Parquet)
+Este módulo lê um cursor filtrado e projetado em lotes e monta buffers
+colunares: arrays NumPy contíguos para os campos numéricos e record batches do
+Arrow (ou arquivos Parquet) para o restante. A memória usada pela leitura é
+limitada pelo tamanho do lote, e a análise pode ser feita de forma vetorizada
+fora do banco, sem milhões de dicionários por documento.
+
+numpy e pyarrow são dependências opcionais (pip install numpy pyarrow).
+
+Uso:
+    python columnar_export.py --database vendas_db --saida vendas.parquet
+    python columnar_export.py --database vendas_db --saida vendas.parquet --desde 2024-01-01
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime
+
+
+# Campos exportados de vendas e seus tipos
+ESQUEMA_VENDAS = {
+    '_id': 'objectid',
+    'produto': 'string',
+    'vendedor': 'string',
+    'quantidade': 'int64',
+    'preco_unitario': 'float64',
+    'total': 'float64',
+    'data_venda': 'timestamp',
+}
+CAMPOS_NUMERICOS_VENDAS = ('quantidade', 'preco_unitario', 'total')
+
+TIPOS = ('objectid', 'string', 'int64', 'float64', 'bool', 'timestamp')
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("numpy não instalado (pip install numpy)")
+    return numpy
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("pyarrow não instalado (pip install pyarrow)")
+    return pyarrow
+
+
+def _projecao(campos):
+    projecao = {campo: 1 for campo in campos}
+    if '_id' not in projecao:
+        projecao['_id'] = 0
+    return projecao
+
+
+def _lotes(collection, filtro, campos, batch_size):
+    """Lê o cursor em lotes de até batch_size documentos projetados"""
+    cursor = collection.find(filtro or {}, _projecao(campos), batch_size=batch_size)
+    lote = []
+    for doc in cursor:
+        lote.append(doc)
+        if len(lote) >= batch_size:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def to_numpy(collection, filtro=None, campos=CAMPOS_NUMERICOS_VENDAS, batch_size=65536,
+             dtypes=None):
+    """
+    Lê campos numéricos em arrays NumPy contíguos, um por campo
+
+    Os arrays são alocados uma vez a partir de count_documents e preenchidos
+    lote a lote. Valores ausentes viram NaN em campos float e 0 em campos inteiros.
+
+    Args:
+        collection (Collection): Coleção de origem
+        filtro (dict, optional): Filtro da leitura
+        campos (tuple): Campos numéricos a ler
+        batch_size (int): Documentos por lote do cursor
+        dtypes (dict, optional): dtype por campo (padrão: ESQUEMA_VENDAS ou float64)
+
+    Returns:
+        dict: {campo: numpy.ndarray}
+    """
+    np = _numpy()
+    tipos = {campo: (dtypes or {}).get(campo, ESQUEMA_VENDAS.get(campo, 'float64'))
+             for campo in campos}
+    capacidade = collection.count_documents(filtro or {})
+    arrays = {campo: np.empty(capacidade, dtype=tipo) for campo, tipo in tipos.items()}
+    ausentes = {campo: (np.nan if np.dtype(tipo).kind == 'f' else 0)
+                for campo, tipo in tipos.items()}
+    n = 0
+    for lote in _lotes(collection, filtro, campos, batch_size):
+        fim = n + len(lote)
+        if fim > capacidade:
+            # Inserções durante a leitura: cresce com folga
+            capacidade = max(fim, capacidade * 2)
+            for campo in arrays:
+                arrays[campo] = np.resize(arrays[campo], capacidade)
+        for campo, array in arrays.items():
+            ausente = ausentes[campo]
+            array[n:fim] = [ausente if doc.get(campo) is None else doc[campo] for doc in lote]
+        n = fim
+    return {campo: array[:n] for campo, array in arrays.items()}
+
+
+def arrow_schema(esquema=ESQUEMA_VENDAS):
+    """Esquema do Arrow correspondente a {campo: tipo}"""
+    pa = _pyarrow()
+    conversao = {
+        'objectid': pa.string(),
+        'string': pa.string(),
+        'int64': pa.int64(),
+        'float64': pa.float64(),
+        'bool': pa.bool_(),
+        'timestamp': pa.timestamp('ms'),
+    }
+    for campo, tipo in esquema.items():
+        if tipo not in conversao:
+            raise ValueError(f"Tipo inválido para {campo}: {tipo} (use {', '.join(TIPOS)})")
+    return pa.schema([(campo, conversao[tipo]) for campo, tipo in esquema.items()])
+
+
+def iter_record_batches(collection, filtro=None, esquema=ESQUEMA_VENDAS, batch_size=65536):
+    """
+    Converte o cursor em record batches do Arrow de até batch_size linhas
+
+    Campos ausentes viram nulos; ObjectIds são exportados como texto hexadecimal.
+
+    Yields:
+        pyarrow.RecordBatch: Um lote por vez (memória limitada pelo lote)
+    """
+    pa = _pyarrow()
+    schema = arrow_schema(esquema)
+    campos = list(esquema)
+    for lote in _lotes(collection, filtro, campos, batch_size):
+        colunas = []
+        for campo, tipo in esquema.items():
+            valores = [doc.get(campo) for doc in lote]
+            if tipo == 'objectid':
+                valores = [str(v) if v is not None else None for v in valores]
+            colunas.append(pa.array(valores, type=schema.field(campo).type))
+        yield pa.RecordBatch.from_arrays(colunas, schema=schema)
+
+
+def write_parquet(collection, caminho, filtro=None, esquema=ESQUEMA_VENDAS, batch_size=65536,
+                  compressao='zstd'):
+    """
+    Exporta a coleção para um arquivo Parquet, um row group por lote
+
+    Returns:
+        dict: linhas, lotes, bytes do arquivo e duração em segundos
+    """
+    pa = _pyarrow()
+    inicio = time.perf_counter()
+    linhas = lotes = 0
+    with pa.parquet.ParquetWriter(caminho, arrow_schema(esquema), compression=compressao) as saida:
+        for record_batch in iter_record_batches(collection, filtro, esquema, batch_size):
+            saida.write_batch(record_batch)
+            linhas += record_batch.num_rows
+            lotes += 1
+    return {
+        'linhas': linhas,
+        'lotes': lotes,
+        'bytes': os.path.getsize(caminho),
+        'duracao_s': round(time.perf_counter() - inicio, 3),
+    }
+
+
+def main():
+    from mongodb_crud import MongoDBCRUD
+
+    parser = argparse.ArgumentParser(description="Exporta a coleção de vendas para Parquet")
+    parser.add_argument('--environment', help="Ambiente de config.py (padrão: auto-detectado)")
+    parser.add_argument('--database', help="Banco de dados (padrão: o do ambiente)")
+    parser.add_argument('--saida', default='vendas.parquet', help="Arquivo Parquet de saída")
+    parser.add_argument('--desde', type=datetime.fromisoformat,
+                        help="Exporta só vendas a partir desta data (AAAA-MM-DD)")
+    parser.add_argument('--batch-size', type=int, default=65536, help="Linhas por lote")
+    args = parser.parse_args()
+
+    crud = MongoDBCRUD(database_name=args.database, environment=args.environment,
+                       ensure_indexes=False)
+    if not crud.connect():
+        print("❌ Não foi possível conectar ao MongoDB.")
+        return
+    try:
+        filtro = {'data_venda': {'$gte': args.desde}} if args.desde else None
+        resultado = write_parquet(crud.db['vendas'], args.saida, filtro,
+                                  batch_size=args.batch_size)
+        print(f"✅ {resultado['linhas']} vendas em {resultado['lotes']} lotes "
+              f"({resultado['bytes'] / 1024 / 1024:.1f} MB, {resultado['duracao_s']} s) → {args.saida}")
+    finally:
+        crud.disconnect()
+
+
+if __name__ == "__main__":
+    main()
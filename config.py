@@ -5,15 +5,105 @@ Configuração para conexão com MongoDB
 Este arquivo contém as configurações para diferentes ambientes de MongoDB.
 """
 
+import functools
+import importlib.util
 import os
 from dotenv import load_dotenv
+from crud_logging import logger
+from profiles import build_profiles
 
 # Carregar variáveis de ambiente do arquivo .env (se existir)
 load_dotenv()
 
+# Ajustes do driver lidos do .env: variável -> opção do MongoClient
+DRIVER_ENV = {
+    'MONGODB_COMPRESSORS': 'compressors',
+    'MONGODB_ZLIB_LEVEL': 'zlibCompressionLevel',
+    'MONGODB_MAX_POOL_SIZE': 'maxPoolSize',
+    'MONGODB_CONNECT_TIMEOUT_MS': 'connectTimeoutMS',
+    'MONGODB_SOCKET_TIMEOUT_MS': 'socketTimeoutMS',
+    'MONGODB_HEARTBEAT_FREQUENCY_MS': 'heartbeatFrequencyMS',
+}
+
+# Compressores de rede do driver e o módulo Python que cada um exige
+COMPRESSORES = {
+    'zstd': ('zstandard', 'pip install zstandard'),
+    'snappy': ('snappy', 'pip install python-snappy'),
+    'zlib': ('zlib', None),
+}
+
+# Limites aceitos por opção numérica (mínimo, máximo; None = sem limite)
+_LIMITES_DRIVER = {
+    'zlibCompressionLevel': (-1, 9),
+    'maxPoolSize': (0, None),
+    'connectTimeoutMS': (1, None),
+    'socketTimeoutMS': (0, None),
+    # O driver não aceita monitorar os servidores com intervalo menor que 500 ms
+    'heartbeatFrequencyMS': (500, None),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def compressor_available(nome):
+    """Indica se o módulo do compressor está instalado (avisa uma vez quando não está)"""
+    modulo, instalacao = COMPRESSORES[nome]
+    if importlib.util.find_spec(modulo) is not None:
+        return True
+    logger.warning("Compressor %s indisponível (%s); será ignorado", nome, instalacao)
+    return False
+
+
+def validate_driver_options(opcoes):
+    """
+    Valida e normaliza as opções de ajuste do driver
+    
+    compressors aceita lista ou texto separado por vírgulas, na ordem de
+    preferência; compressores sem o módulo instalado são descartados. Opções
+    fora de DRIVER_ENV (ex.: minPoolSize) passam sem alteração para o MongoClient.
+    
+    Returns:
+        dict: Opções prontas para o MongoClient
+        
+    Raises:
+        ValueError: Compressor desconhecido ou valor fora dos limites
+    """
+    normalizadas = dict(opcoes)
+    if 'compressors' in normalizadas:
+        compressores = normalizadas.pop('compressors')
+        if isinstance(compressores, str):
+            compressores = [c.strip() for c in compressores.split(',') if c.strip()]
+        for nome in compressores:
+            if nome not in COMPRESSORES:
+                raise ValueError(f"Compressor inválido: {nome} (use {', '.join(COMPRESSORES)})")
+        disponiveis = [c for c in dict.fromkeys(compressores) if compressor_available(c)]
+        if disponiveis:
+            normalizadas['compressors'] = disponiveis
+    for opcao, (minimo, maximo) in _LIMITES_DRIVER.items():
+        if opcao not in normalizadas:
+            continue
+        valor = normalizadas[opcao]
+        if isinstance(valor, str):
+            try:
+                valor = int(valor)
+            except ValueError:
+                raise ValueError(f"{opcao} deve ser inteiro: {valor!r}")
+        if isinstance(valor, bool) or not isinstance(valor, int):
+            raise ValueError(f"{opcao} deve ser inteiro: {valor!r}")
+        if valor < minimo or (maximo is not None and valor > maximo):
+            limite = f"entre {minimo} e {maximo}" if maximo is not None else f">= {minimo}"
+            raise ValueError(f"{opcao} deve ser {limite}: {valor}")
+        normalizadas[opcao] = valor
+    if 'zlibCompressionLevel' in normalizadas and 'zlib' not in normalizadas.get('compressors', ()):
+        raise ValueError("zlibCompressionLevel exige zlib em compressors")
+    return normalizadas
+
 class MongoConfig:
     """Configurações para conexão com MongoDB"""
     
+    # Cada ambiente pode ajustar os perfis de desempenho de profiles.PERFIS
+    # (bulk_ingest, critical, analytics) ou criar novos na chave 'profiles', e
+    # definir ajustes do driver (compressão, pool, timeouts) em 'driver_options'
+    
     # Configurações para MongoDB local (sem autenticação)
     LOCAL = {
         'connection_string': 'mongodb://localhost:27017/',
@@ -45,7 +135,11 @@ class MongoConfig:
             'mongodb+srv://<username>:<password>@<cluster>.mongodb.net/'
         ),
         'database_name': os.getenv('MONGODB_DATABASE', 'crud_database'),
-        'description': 'MongoDB Atlas (nuvem)'
+        'description': 'MongoDB Atlas (nuvem)',
+        'profiles': {
+            # Réplicas em outras zonas: falha em 5 s em vez de esperar a maioria indefinidamente
+            'critical': {'wtimeout': 5000},
+        }
     }
     
     # Configuração padrão (Docker container)
@@ -72,6 +166,46 @@ class MongoConfig:
         
         return configs.get(environment.lower(), cls.DEFAULT)
     
+    @classmethod
+    def get_profiles(cls, environment=None, config=None):
+        """
+        Retorna os perfis de desempenho do ambiente, já validados
+        
+        Args:
+            environment (str, optional): Ambiente (padrão: auto-detectado)
+            config (dict, optional): Configuração já obtida (dispensa environment)
+            
+        Returns:
+            dict: {nome: profiles.Profile}
+        """
+        if config is None:
+            config = cls.get_config(environment) if environment else cls.auto_detect_environment()
+        return build_profiles(config.get('profiles'))
+    
+    @classmethod
+    def get_driver_options(cls, environment=None, config=None):
+        """
+        Retorna os ajustes do driver (compressão, pool e timeouts), já validados
+        
+        Os valores de 'driver_options' do ambiente são sobrescritos pelas
+        variáveis de DRIVER_ENV definidas no ambiente ou no .env.
+        
+        Args:
+            environment (str, optional): Ambiente (padrão: auto-detectado)
+            config (dict, optional): Configuração já obtida (dispensa environment)
+            
+        Returns:
+            dict: Opções para o MongoClient (vazio se nada foi configurado)
+        """
+        if config is None:
+            config = cls.get_config(environment) if environment else cls.auto_detect_environment()
+        opcoes = dict(config.get('driver_options', {}))
+        for variavel, opcao in DRIVER_ENV.items():
+            valor = os.getenv(variavel)
+            if valor:
+                opcoes[opcao] = valor
+        return validate_driver_options(opcoes)
+    
     @classmethod
     def list_environments(cls):
         """
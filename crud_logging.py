@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Logging estruturado das operações CRUD
+Este módulo define o logger "mongodb_crud", um formatador JSON e o decorador
+que mede a duração de cada operação. Quando o nível DEBUG está desativado, a
+medição não é feita e não há formatação de mensagens.
+
+Enquanto a aplicação não configura o logging, avisos e erros saem no stderr
+(como o logging.lastResort do Python), inclusive no modo quiet. Para
+silenciá-los, defina CRUD_LOG_STDERR=0 ou chame configure_logging().
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import sys
+import time
+
+
+class _StderrPadrao(logging.StreamHandler):
+    """
+    Avisos e erros no stderr enquanto nenhum outro handler foi configurado
+
+    Usa o sys.stderr do momento da emissão e se cala se a aplicação configurou
+    a raiz do logging (ex.: logging.basicConfig), para não duplicar a saída.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.setLevel(logging.WARNING)
+        self.setFormatter(logging.Formatter('%(levelname)s %(name)s: %(message)s'))
+
+    @property
+    def stream(self):
+        return sys.stderr
+
+    @stream.setter
+    def stream(self, valor):
+        pass
+
+    def emit(self, record):
+        if logger.propagate and logging.getLogger().handlers:
+            return
+        # Erros que o modo demo já imprimiu (_fail) não se repetem
+        if getattr(record, 'exibido', False):
+            return
+        super().emit(record)
+
+
+logger = logging.getLogger('mongodb_crud')
+_saida_padrao = _StderrPadrao()
+if os.getenv('CRUD_LOG_STDERR', '1').lower() in ('0', 'false', 'no', 'nao', 'não'):
+    # Biblioteca silenciosa: nada é impresso se a aplicação não configurar o logging
+    logger.addHandler(logging.NullHandler())
+else:
+    logger.addHandler(_saida_padrao)
+
+# Níveis de verbosidade da saída no terminal:
+#   quiet - nada é impresso; apenas eventos no logger (produção)
+#   demo  - mensagens com emojis a cada operação (demonstrações)
+VERBOSIDADES = ('quiet', 'demo')
+
+# Operação CRUD em andamento (operacao, colecao), lida pela instrumentação de
+# instrumentation.py; só é preenchida quando rastrear_operacoes está ativo
+operacao_atual = contextvars.ContextVar('operacao_atual', default=None)
+rastrear_operacoes = False
+
+# Falha da operação medida por timed: os métodos CRUD tratam as próprias
+# exceções e devolvem None/False/0, então _fail a registra aqui
+_falha_atual = contextvars.ContextVar('falha_atual', default=None)
+
+
+def marcar_falha(erro):
+    """Marca a operação em medição (se houver) como falha; chamado por _fail"""
+    falha = _falha_atual.get()
+    if falha is not None and not falha:
+        falha.append(type(erro).__name__)
+
+# Atributos padrão de LogRecord, ignorados ao serializar campos extras
+_ATRIBUTOS_PADRAO = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registro como uma linha JSON, incluindo os campos passados em extra"""
+
+    def format(self, record):
+        dados = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensagem': record.getMessage(),
+        }
+        for chave, valor in vars(record).items():
+            if chave not in _ATRIBUTOS_PADRAO:
+                dados[chave] = valor
+        if record.exc_info:
+            dados['excecao'] = self.formatException(record.exc_info)
+        return json.dumps(dados, default=str, ensure_ascii=False)
+
+
+def configure_logging(level='INFO', json_format=True, stream=None):
+    """
+    Configura a saída do logger "mongodb_crud" (substitui a saída padrão no stderr)
+
+    Args:
+        level (str|int): Nível mínimo (use 'DEBUG' para registrar a duração das operações)
+        json_format (bool): Emite uma linha JSON por evento
+        stream: Destino (padrão: sys.stderr)
+
+    Returns:
+        logging.Logger: Logger configurado
+    """
+    handler = logging.StreamHandler(stream or sys.stderr)
+    if json_format:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s'))
+    for antigo in [h for h in logger.handlers if not isinstance(h, logging.NullHandler)]:
+        logger.removeHandler(antigo)
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    return logger
+
+
+def timed(operacao):
+    """
+    Decorador que registra a duração de um método CRUD em nível DEBUG
+
+    Os campos operacao, colecao, duracao_ms e ok são enviados como extra. ok é
+    False se o método levantou exceção ou registrou um erro com _fail (que
+    chama marcar_falha); nesse caso o campo erro traz o tipo da exceção.
+    """
+    def decorador(metodo):
+        @functools.wraps(metodo)
+        def wrapper(self, *args, **kwargs):
+            if rastrear_operacoes:
+                token = operacao_atual.set((operacao, getattr(self.collection, 'name', None)))
+                try:
+                    return _medir(self, operacao, metodo, args, kwargs)
+                finally:
+                    operacao_atual.reset(token)
+            return _medir(self, operacao, metodo, args, kwargs)
+        return wrapper
+    return decorador
+
+
+def _medir(self, operacao, metodo, args, kwargs):
+    if not logger.isEnabledFor(logging.DEBUG):
+        return metodo(self, *args, **kwargs)
+    falha = []
+    token = _falha_atual.set(falha)
+    inicio = time.perf_counter()
+    try:
+        return metodo(self, *args, **kwargs)
+    except BaseException as e:
+        marcar_falha(e)
+        raise
+    finally:
+        _falha_atual.reset(token)
+        extra = {
+            'operacao': operacao,
+            'colecao': getattr(self.collection, 'name', None),
+            'duracao_ms': round((time.perf_counter() - inicio) * 1000, 3),
+            'ok': not falha,
+        }
+        if falha:
+            extra['erro'] = falha[0]
+        logger.debug('operacao', extra=extra)
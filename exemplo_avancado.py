@@ -7,10 +7,64 @@ Este arquivo demonstra cenários mais complexos de uso do MongoDB com pymongo.
 
 from mongodb_crud import MongoDBCRUD
 from config import MongoConfig
+from index_manager import ensure_indexes
+from vendas_rollup import VendasRollup
+from post_counters import CounterBuffer
+from inventory import Inventory
+from bson import ObjectId
 from datetime import datetime, timedelta
 import random
 
 
+# Pipelines de agregação da coleção de vendas (reutilizados pelo benchmark)
+def pipeline_vendas_por_produto():
+    """Total vendido e quantidade por produto, do maior para o menor"""
+    return [
+        {
+            "$group": {
+                "_id": "$produto",
+                "total_vendas": {"$sum": "$total"},
+                "quantidade_vendida": {"$sum": "$quantidade"}
+            }
+        },
+        {"$sort": {"total_vendas": -1}}
+    ]
+
+
+def pipeline_vendas_por_vendedor():
+    """Total vendido e número de vendas por vendedor, do maior para o menor"""
+    return [
+        {
+            "$group": {
+                "_id": "$vendedor",
+                "total_vendas": {"$sum": "$total"},
+                "numero_vendas": {"$sum": 1}
+            }
+        },
+        {"$sort": {"total_vendas": -1}}
+    ]
+
+
+def pipeline_vendas_por_dia(data_limite):
+    """Total e número de vendas por dia a partir de data_limite"""
+    return [
+        {"$match": {"data_venda": {"$gte": data_limite}}},
+        {
+            "$group": {
+                "_id": {
+                    "$dateToString": {
+                        "format": "%Y-%m-%d",
+                        "date": "$data_venda"
+                    }
+                },
+                "total_dia": {"$sum": "$total"},
+                "vendas_dia": {"$sum": 1}
+            }
+        },
+        {"$sort": {"_id": 1}}
+    ]
+
+
 def exemplo_ecommerce():
     """
     Exemplo simulando um sistema de e-commerce simples
@@ -22,7 +76,9 @@ def exemplo_ecommerce():
     config = MongoConfig.get_config('docker')
     crud = MongoDBCRUD(
         connection_string=config['connection_string'],
-        database_name='ecommerce_db'
+        database_name='ecommerce_db',
+        verbosity='demo',
+        ensure_indexes=False
     )
     
     if not crud.connect():
@@ -30,11 +86,12 @@ def exemplo_ecommerce():
         return
     
     try:
-        # Usar coleção de produtos
-        crud.collection = crud.db['produtos']
+        # Repositório de produtos (mesmo cliente da conexão)
+        produtos_repo = crud.repository('produtos')
+        ensure_indexes(crud.db, ['produtos'])
         
         # Limpar dados anteriores
-        crud.collection.delete_many({})
+        produtos_repo.delete_many({})
         
         # Criar produtos
         produtos = [
@@ -76,42 +133,50 @@ def exemplo_ecommerce():
             }
         ]
         
-        resultado = crud.collection.insert_many(produtos)
-        print(f"✅ {len(resultado.inserted_ids)} produtos criados")
+        ids = produtos_repo.insert_many(produtos)
+        print(f"✅ {len(ids)} produtos criados")
         
         # Buscar produtos por categoria
         print("\n📱 Produtos da categoria 'Eletrônicos':")
-        eletronicos = list(crud.collection.find({"categoria": "Eletrônicos"}))
+        eletronicos = produtos_repo.find("categoria", view="vitrine", categoria="Eletrônicos")
         for produto in eletronicos:
             print(f"  - {produto['nome']}: R$ {produto['preco']}")
         
         # Buscar produtos com preço entre R$ 100 e R$ 500
         print("\n💰 Produtos entre R$ 100 e R$ 500:")
-        produtos_faixa = list(crud.collection.find({
-            "preco": {"$gte": 100, "$lte": 500}
-        }))
+        produtos_faixa = produtos_repo.find("faixa_preco", view="vitrine", minimo=100, maximo=500)
         for produto in produtos_faixa:
             print(f"  - {produto['nome']}: R$ {produto['preco']}")
         
-        # Atualizar estoque (simular venda)
+        # Atualizar estoque (simular venda): baixa condicional por _id, nunca negativa
         print("\n📦 Simulando venda - atualizando estoque:")
-        crud.collection.update_one(
-            {"nome": "Smartphone Samsung Galaxy"},
-            {"$inc": {"estoque": -5}, "$set": {"ultima_venda": datetime.now()}}
-        )
-        print("  - 5 smartphones vendidos")
+        inventario = Inventory(produtos_repo.collection)
+        smartphone_id, notebook_id, fone_id = (ObjectId(i) for i in ids[:3])
+        produto = inventario.decrement(smartphone_id, 5)
+        if produto:
+            print(f"  - 5 smartphones vendidos ({produto['estoque']} em estoque)")
+        
+        pedido = inventario.place_order({notebook_id: 1, fone_id: 2})
+        if pedido["ok"]:
+            print("  - Pedido com 1 notebook e 2 fones confirmado")
+        
+        pedido = inventario.place_order({notebook_id: 100, fone_id: 1})
+        if not pedido["ok"]:
+            print(f"  - Pedido com 100 notebooks recusado: estoque insuficiente "
+                  f"({pedido['faltantes'][notebook_id]} disponíveis)")
         
         # Aplicar desconto em produtos com estoque alto
         print("\n🏷️ Aplicando desconto em produtos com estoque > 50:")
-        resultado = crud.collection.update_many(
-            {"estoque": {"$gt": 50}},
-            {"$set": {"desconto": 10, "promocao": True}}
+        modificados = produtos_repo.update_many(
+            "estoque_acima",
+            {"desconto": 10, "promocao": True},
+            minimo=50
         )
-        print(f"  - {resultado.modified_count} produtos em promoção")
+        print(f"  - {modificados} produtos em promoção")
         
         # Buscar produtos em promoção
         print("\n🎉 Produtos em promoção:")
-        promocoes = list(crud.collection.find({"promocao": True}))
+        promocoes = produtos_repo.find("em_promocao", view="promocao")
         for produto in promocoes:
             preco_original = produto['preco']
             preco_desconto = preco_original * (1 - produto['desconto'] / 100)
@@ -119,7 +184,7 @@ def exemplo_ecommerce():
         
         # Relatório de estoque baixo
         print("\n⚠️ Produtos com estoque baixo (< 30):")
-        estoque_baixo = list(crud.collection.find({"estoque": {"$lt": 30}}))
+        estoque_baixo = produtos_repo.find("estoque_baixo", view="estoque")
         for produto in estoque_baixo:
             print(f"  - {produto['nome']}: {produto['estoque']} unidades")
         
@@ -137,7 +202,9 @@ def exemplo_blog():
     config = MongoConfig.get_config('docker')
     crud = MongoDBCRUD(
         connection_string=config['connection_string'],
-        database_name='blog_db'
+        database_name='blog_db',
+        verbosity='demo',
+        ensure_indexes=False
     )
     
     if not crud.connect():
@@ -145,9 +212,10 @@ def exemplo_blog():
         return
     
     try:
-        # Usar coleção de posts
-        crud.collection = crud.db['posts']
-        crud.collection.delete_many({})
+        # Repositório de posts
+        posts_repo = crud.repository('posts')
+        ensure_indexes(crud.db, ['posts'])
+        posts_repo.delete_many({})
         
         # Criar posts
         posts = [
@@ -186,22 +254,22 @@ def exemplo_blog():
             }
         ]
         
-        resultado = crud.collection.insert_many(posts)
-        print(f"✅ {len(resultado.inserted_ids)} posts criados")
+        ids = posts_repo.insert_many(posts)
+        print(f"✅ {len(ids)} posts criados")
         
-        # Simular visualizações
+        # Simular visualizações: os incrementos são agrupados em memória e enviados
+        # como um $inc por post (post_counters.py)
         print("\n👀 Simulando visualizações:")
+        contadores = CounterBuffer(posts_repo.collection, max_intervalo_s=1.0)
+        publicados = [post["_id"] for post in posts_repo.iter("publicados", {"_id": 1})]
         for _ in range(10):
-            post_aleatorio = crud.collection.find_one({"publicado": True})
-            if post_aleatorio:
-                crud.collection.update_one(
-                    {"_id": post_aleatorio["_id"]},
-                    {"$inc": {"visualizacoes": random.randint(1, 5)}}
-                )
+            if publicados:
+                contadores.increment(random.choice(publicados), "visualizacoes",
+                                     random.randint(1, 5))
         
         # Adicionar comentários
         print("\n💬 Adicionando comentários:")
-        post_mongodb = crud.collection.find_one({"titulo": "Introdução ao MongoDB"})
+        post_mongodb = posts_repo.find_one("titulo", titulo="Introdução ao MongoDB")
         if post_mongodb:
             comentarios = [
                 {
@@ -216,47 +284,46 @@ def exemplo_blog():
                 }
             ]
             
-            crud.collection.update_one(
-                {"_id": post_mongodb["_id"]},
+            posts_repo.update_by_id(
+                post_mongodb["_id"],
                 {"$push": {"comentarios": {"$each": comentarios}}}
             )
             print(f"  - {len(comentarios)} comentários adicionados")
         
         # Buscar posts por tag
         print("\n🏷️ Posts com tag 'mongodb':")
-        posts_mongodb = list(crud.collection.find({"tags": "mongodb"}))
+        posts_mongodb = posts_repo.find("tag", view="resumo", tag="mongodb")
         for post in posts_mongodb:
             print(f"  - {post['titulo']} por {post['autor']}")
         
         # Posts mais visualizados
         print("\n📊 Posts mais visualizados:")
-        posts_populares = list(crud.collection.find(
-            {"publicado": True}
-        ).sort("visualizacoes", -1).limit(3))
+        posts_populares = contadores.top({"publicado": True}, "visualizacoes", limite=3)
         
         for i, post in enumerate(posts_populares, 1):
             print(f"  {i}. {post['titulo']}: {post['visualizacoes']} visualizações")
         
         # Publicar post em rascunho
         print("\n📤 Publicando post em rascunho:")
-        crud.collection.update_one(
-            {"publicado": False},
+        posts_repo.update_one(
+            "rascunhos",
             {
-                "$set": {
-                    "publicado": True,
-                    "data_publicacao": datetime.now()
-                }
+                "publicado": True,
+                "data_publicacao": datetime.now()
             }
         )
         print("  - Post publicado com sucesso")
         
         # Estatísticas do blog
         print("\n📈 Estatísticas do blog:")
-        total_posts = crud.collection.count_documents({})
-        posts_publicados = crud.collection.count_documents({"publicado": True})
-        total_visualizacoes = list(crud.collection.aggregate([
+        contadores.close()
+        print(f"  - Visualizações: {contadores.stats['incrementos']} incrementos em "
+              f"{contadores.stats['escritas']} escritas")
+        total_posts = posts_repo.count()
+        posts_publicados = posts_repo.count("publicados")
+        total_visualizacoes = posts_repo.aggregate([
             {"$group": {"_id": None, "total": {"$sum": "$visualizacoes"}}}
-        ]))
+        ])
         
         print(f"  - Total de posts: {total_posts}")
         print(f"  - Posts publicados: {posts_publicados}")
@@ -277,7 +344,9 @@ def exemplo_agregacao():
     config = MongoConfig.get_config('docker')
     crud = MongoDBCRUD(
         connection_string=config['connection_string'],
-        database_name='vendas_db'
+        database_name='vendas_db',
+        verbosity='demo',
+        ensure_indexes=False
     )
     
     if not crud.connect():
@@ -285,9 +354,13 @@ def exemplo_agregacao():
         return
     
     try:
-        # Usar coleção de vendas
-        crud.collection = crud.db['vendas']
-        crud.collection.delete_many({})
+        # Repositório de vendas
+        vendas_repo = crud.repository('vendas')
+        ensure_indexes(crud.db, ['vendas'])
+        vendas_repo.delete_many({})
+        # Relatórios leem os resumos incrementais (vendas_rollup.py) + vendas recentes
+        rollup = VendasRollup(crud.db)
+        rollup.backfill()
         
         # Gerar dados de vendas
         vendas = []
@@ -305,40 +378,18 @@ def exemplo_agregacao():
             venda["total"] = venda["quantidade"] * venda["preco_unitario"]
             vendas.append(venda)
         
-        crud.collection.insert_many(vendas)
+        rollup.insert_sales(vendas)
         print(f"✅ {len(vendas)} vendas geradas")
         
         # Agregação: Vendas por produto
         print("\n📦 Vendas por produto:")
-        pipeline_produto = [
-            {
-                "$group": {
-                    "_id": "$produto",
-                    "total_vendas": {"$sum": "$total"},
-                    "quantidade_vendida": {"$sum": "$quantidade"}
-                }
-            },
-            {"$sort": {"total_vendas": -1}}
-        ]
-        
-        resultado = list(crud.collection.aggregate(pipeline_produto))
+        resultado = rollup.vendas_por_produto()
         for item in resultado:
             print(f"  - {item['_id']}: R$ {item['total_vendas']:.2f} ({item['quantidade_vendida']} unidades)")
         
         # Agregação: Vendas por vendedor
         print("\n👤 Vendas por vendedor:")
-        pipeline_vendedor = [
-            {
-                "$group": {
-                    "_id": "$vendedor",
-                    "total_vendas": {"$sum": "$total"},
-                    "numero_vendas": {"$sum": 1}
-                }
-            },
-            {"$sort": {"total_vendas": -1}}
-        ]
-        
-        resultado = list(crud.collection.aggregate(pipeline_vendedor))
+        resultado = rollup.vendas_por_vendedor()
         for item in resultado:
             media = item['total_vendas'] / item['numero_vendas']
             print(f"  - {item['_id']}: R$ {item['total_vendas']:.2f} ({item['numero_vendas']} vendas, média: R$ {media:.2f})")
@@ -346,24 +397,7 @@ def exemplo_agregacao():
         # Agregação: Vendas por período
         print("\n📅 Vendas dos últimos 7 dias:")
         data_limite = datetime.now() - timedelta(days=7)
-        pipeline_periodo = [
-            {"$match": {"data_venda": {"$gte": data_limite}}},
-            {
-                "$group": {
-                    "_id": {
-                        "$dateToString": {
-                            "format": "%Y-%m-%d",
-                            "date": "$data_venda"
-                        }
-                    },
-                    "total_dia": {"$sum": "$total"},
-                    "vendas_dia": {"$sum": 1}
-                }
-            },
-            {"$sort": {"_id": 1}}
-        ]
-        
-        resultado = list(crud.collection.aggregate(pipeline_periodo))
+        resultado = rollup.vendas_por_dia(data_limite)
         for item in resultado:
             print(f"  - {item['_id']}: R$ {item['total_dia']:.2f} ({item['vendas_dia']} vendas)")
         
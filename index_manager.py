@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gerenciamento declarativo de índices
+Este módulo descreve os índices de cada coleção (usuarios, produtos, posts,
+vendas e pedidos_estoque), compara a especificação com list_indexes(), cria os que faltam e,
+opcionalmente, remove índices fora da especificação que não são usados segundo
+$indexStats. A execução é idempotente e pode ser feita a cada inicialização.
+
+Uso:
+    python index_manager.py                      # cria os índices que faltam
+    python index_manager.py --dry-run            # apenas mostra o plano
+    python index_manager.py --drop-unused        # remove índices extras sem uso
+"""
+
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+
+# Opções que diferenciam dois índices com as mesmas chaves
+OPCOES_RELEVANTES = ('unique', 'sparse', 'partialFilterExpression', 'expireAfterSeconds')
+
+# Especificação dos índices por coleção: chaves e opções (name é gerado pelo
+# pymongo a partir das chaves quando omitido)
+INDEX_SPECS = {
+    'usuarios': [
+        {'keys': [('email', ASCENDING)], 'unique': True},
+        {'keys': [('nome', ASCENDING)]},
+        {'keys': [('idade', ASCENDING)]},
+        {'keys': [('cidade', ASCENDING)]},
+        {'keys': [('ativo', ASCENDING)]},
+        # Paginação por intervalo de chave (paginate_users)
+        {'keys': [('idade', ASCENDING), ('_id', ASCENDING)]},
+        {'keys': [('nome', ASCENDING), ('_id', ASCENDING)]},
+    ],
+    'produtos': [
+        {'keys': [('nome', ASCENDING)]},
+        {'keys': [('categoria', ASCENDING)]},
+        {'keys': [('preco', ASCENDING)]},
+        {'keys': [('ativo', ASCENDING)]},
+        # Faixa de preço dentro de uma categoria (exemplo_ecommerce)
+        {'keys': [('categoria', ASCENDING), ('preco', ASCENDING)]},
+        # Relatório de estoque baixo: índice parcial, só com os produtos relevantes
+        {'keys': [('estoque', ASCENDING)],
+         'partialFilterExpression': {'estoque': {'$lt': 30}}},
+        # Reservas abandonadas (Inventory.sweep_reservations)
+        {'keys': [('reservas.em', ASCENDING)], 'sparse': True},
+    ],
+    'posts': [
+        {'keys': [('titulo', ASCENDING)]},
+        {'keys': [('autor', ASCENDING)]},
+        {'keys': [('tags', ASCENDING)]},
+        {'keys': [('publicado', ASCENDING)]},
+        {'keys': [('data_publicacao', DESCENDING)]},
+        # "Posts mais visualizados" (exemplo_blog): filtro + ordenação no mesmo índice
+        {'keys': [('publicado', ASCENDING), ('visualizacoes', DESCENDING)]},
+    ],
+    # Destino dos pedidos de Inventory; só precisa durar mais que o sweep de reservas
+    'pedidos_estoque': [
+        {'keys': [('em', ASCENDING)], 'expireAfterSeconds': 7 * 24 * 3600},
+    ],
+    'vendas': [
+        {'keys': [('produto', ASCENDING)]},
+        {'keys': [('vendedor', ASCENDING)]},
+        {'keys': [('data_venda', DESCENDING)]},
+    ],
+}
+
+
+def index_name(spec):
+    """Nome do índice: o informado na especificação ou o padrão do MongoDB (campo_1_...)"""
+    if spec.get('name'):
+        return spec['name']
+    return '_'.join(f"{campo}_{direcao}" for campo, direcao in spec['keys'])
+
+
+def _opcoes(info):
+    return {opcao: info[opcao] for opcao in OPCOES_RELEVANTES if opcao in info}
+
+
+def _chaves(info):
+    chaves = info['key']
+    return [(campo, int(direcao) if isinstance(direcao, (int, float)) else direcao)
+            for campo, direcao in chaves.items()]
+
+
+def plan(collection, specs):
+    """
+    Compara a especificação com os índices existentes
+
+    Returns:
+        dict: criar (especificações faltantes), recriar (mesmo nome, opções ou chaves
+            diferentes), ok (nomes conferidos) e extras (existentes fora da especificação)
+    """
+    existentes = {info['name']: info for info in collection.list_indexes()}
+    plano = {'criar': [], 'recriar': [], 'ok': [], 'extras': []}
+    esperados = set()
+    for spec in specs:
+        nome = index_name(spec)
+        esperados.add(nome)
+        atual = existentes.get(nome)
+        if atual is None:
+            plano['criar'].append(spec)
+        elif (_chaves(atual) != [(c, d) for c, d in spec['keys']]
+              or _opcoes(atual) != _opcoes(spec)):
+            plano['recriar'].append(spec)
+        else:
+            plano['ok'].append(nome)
+    plano['extras'] = [nome for nome in existentes if nome not in esperados and nome != '_id_']
+    return plano
+
+
+def unused_indexes(collection, nomes, idade_minima=timedelta(days=7)):
+    """
+    Filtra, entre os nomes informados, os índices sem nenhum uso segundo $indexStats
+
+    Só considera índices cujas estatísticas cobrem pelo menos idade_minima (as
+    contagens são zeradas quando o mongod reinicia).
+    """
+    limite = datetime.now(timezone.utc) - idade_minima
+    sem_uso = []
+    for stats in collection.aggregate([{'$indexStats': {}}]):
+        if stats['name'] not in nomes:
+            continue
+        acessos = stats.get('accesses', {})
+        desde = acessos.get('since')
+        if desde is not None and desde.tzinfo is None:
+            desde = desde.replace(tzinfo=timezone.utc)
+        if acessos.get('ops', 0) == 0 and desde is not None and desde <= limite:
+            sem_uso.append(stats['name'])
+    return sem_uso
+
+
+def ensure_indexes(db, colecoes=None, drop_unused=False, recriar=False, dry_run=False,
+                   idade_minima=timedelta(days=7)):
+    """
+    Garante os índices especificados em INDEX_SPECS
+
+    Args:
+        db (Database): Banco de dados
+        colecoes (list, optional): Coleções a tratar (padrão: todas de INDEX_SPECS)
+        drop_unused (bool): Remove índices fora da especificação sem uso em $indexStats
+        recriar (bool): Remove e recria índices com o mesmo nome e definição diferente
+        dry_run (bool): Apenas calcula o plano, sem alterar nada
+        idade_minima (timedelta): Janela mínima de estatísticas para considerar um índice sem uso
+
+    Returns:
+        dict: Por coleção, os índices criados, recriados, conflitos, extras, removidos e erros
+    """
+    relatorio = {}
+    for nome_colecao in colecoes or INDEX_SPECS:
+        specs = INDEX_SPECS[nome_colecao]
+        collection = db[nome_colecao]
+        plano = plan(collection, specs)
+        resultado = {
+            'criados': [],
+            'recriados': [],
+            'conflitos': [],
+            'ok': plano['ok'],
+            'extras': plano['extras'],
+            'removidos': [],
+            'erros': [],
+        }
+        relatorio[nome_colecao] = resultado
+
+        a_criar = list(plano['criar'])
+        for spec in plano['recriar']:
+            if recriar:
+                if not dry_run:
+                    collection.drop_index(index_name(spec))
+                a_criar.append(spec)
+                resultado['recriados'].append(index_name(spec))
+            else:
+                resultado['conflitos'].append(index_name(spec))
+
+        if a_criar and not dry_run:
+            modelos = [
+                IndexModel(spec['keys'], name=index_name(spec),
+                           **{k: v for k, v in spec.items() if k not in ('keys', 'name')})
+                for spec in a_criar
+            ]
+            try:
+                collection.create_indexes(modelos)
+            except OperationFailure:
+                # Um índice inválido (ex.: unique com duplicatas) não impede os demais
+                for modelo in modelos:
+                    try:
+                        collection.create_indexes([modelo])
+                    except OperationFailure as e:
+                        resultado['erros'].append({'indice': modelo.document['name'],
+                                                   'mensagem': str(e)})
+        resultado['criados'] = [index_name(spec) for spec in plano['criar']
+                                if index_name(spec) not in {e['indice'] for e in resultado['erros']}]
+
+        if drop_unused and plano['extras']:
+            try:
+                sem_uso = unused_indexes(collection, plano['extras'], idade_minima)
+            except OperationFailure as e:
+                resultado['erros'].append({'indice': '$indexStats', 'mensagem': str(e)})
+                sem_uso = []
+            for nome in sem_uso:
+                if not dry_run:
+                    collection.drop_index(nome)
+                resultado['removidos'].append(nome)
+    return relatorio
+
+
+def ensure_indexes_in_background(db, colecoes=None, **opcoes):
+    """
+    Executa ensure_indexes numa thread, sem bloquear a inicialização da aplicação
+
+    Returns:
+        threading.Thread: Thread iniciada; o relatório fica em thread.relatorio
+    """
+    def _executar():
+        thread.relatorio = ensure_indexes(db, colecoes, **opcoes)
+
+    thread = threading.Thread(target=_executar, name='index-manager', daemon=True)
+    thread.relatorio = None
+    thread.start()
+    return thread
+
+
+def print_report(relatorio):
+    """Imprime o relatório de ensure_indexes de forma legível"""
+    for colecao, resultado in relatorio.items():
+        print(f"\n📚 {colecao}")
+        for chave, rotulo in (('criados', '✅ Criados'), ('recriados', '♻️ Recriados'),
+                              ('conflitos', '⚠️ Definição diferente (use --recriar)'),
+                              ('extras', 'ℹ️ Fora da especificação'),
+                              ('removidos', '🗑️ Removidos (sem uso)')):
+            if resultado[chave]:
+                print(f"   {rotulo}: {', '.join(resultado[chave])}")
+        for erro in resultado['erros']:
+            print(f"   ❌ {erro['indice']}: {erro['mensagem']}")
+        if not any(resultado[k] for k in ('criados', 'recriados', 'conflitos', 'removidos', 'erros')):
+            print(f"   ✅ {len(resultado['ok'])} índices em dia")
+
+
+def main():
+    from mongodb_crud import MongoDBCRUD
+
+    parser = argparse.ArgumentParser(description="Sincroniza os índices do MongoDB com INDEX_SPECS")
+    parser.add_argument('--environment', help="Ambiente de config.py (padrão: auto-detectado)")
+    parser.add_argument('--database', help="Banco de dados (padrão: o do ambiente)")
+    parser.add_argument('--colecao', action='append', choices=sorted(INDEX_SPECS),
+                        help="Coleção a tratar (pode repetir; padrão: todas)")
+    parser.add_argument('--drop-unused', action='store_true',
+                        help="Remove índices fora da especificação sem uso em $indexStats")
+    parser.add_argument('--recriar', action='store_true',
+                        help="Recria índices cuja definição mudou")
+    parser.add_argument('--dry-run', action='store_true', help="Apenas mostra o plano")
+    args = parser.parse_args()
+
+    crud = MongoDBCRUD(database_name=args.database, environment=args.environment,
+                       ensure_indexes=False)
+    if not crud.connect():
+        print("❌ Não foi possível conectar ao MongoDB.")
+        return
+    try:
+        relatorio = ensure_indexes(crud.db, args.colecao, drop_unused=args.drop_unused,
+                                   recriar=args.recriar, dry_run=args.dry_run)
+        print_report(relatorio)
+    finally:
+        crud.disconnect()
+
+
+if __name__ == "__main__":
+    main()
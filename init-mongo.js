@@ -41,15 +41,21 @@ db.createCollection('usuarios', {
   }
 });
 
-// Criar índice único para email
+// Os índices seguem index_manager.py (INDEX_SPECS), que é a referência: ao
+// mudar um índice, altere os dois. Aqui eles são criados na primeira subida do
+// container, para a aplicação não começar com COLLSCANs; `python index_manager.py`
+// sincroniza bancos já existentes. O índice único de email vem antes dos dados
+// de exemplo, para garantir a unicidade.
 db.usuarios.createIndex({ 'email': 1 }, { unique: true });
-
-// Criar índices para melhor performance
 db.usuarios.createIndex({ 'nome': 1 });
 db.usuarios.createIndex({ 'idade': 1 });
 db.usuarios.createIndex({ 'cidade': 1 });
 db.usuarios.createIndex({ 'ativo': 1 });
 
+// Índices compostos para paginação por intervalo de chave (paginate_users)
+db.usuarios.createIndex({ 'idade': 1, '_id': 1 });
+db.usuarios.createIndex({ 'nome': 1, '_id': 1 });
+
 // Inserir alguns dados de exemplo
 db.usuarios.insertMany([
   {
@@ -77,25 +83,32 @@ db.createCollection('produtos');
 db.createCollection('posts');
 db.createCollection('vendas');
 
-// Criar índices para a coleção de produtos
+// Índices da coleção de produtos
 db.produtos.createIndex({ 'nome': 1 });
 db.produtos.createIndex({ 'categoria': 1 });
 db.produtos.createIndex({ 'preco': 1 });
 db.produtos.createIndex({ 'ativo': 1 });
+db.produtos.createIndex({ 'categoria': 1, 'preco': 1 });
+db.produtos.createIndex({ 'estoque': 1 }, { partialFilterExpression: { 'estoque': { $lt: 30 } } });
+db.produtos.createIndex({ 'reservas.em': 1 }, { sparse: true });
+
+// Destino dos pedidos de estoque (inventory.py), descartado após 7 dias
+db.pedidos_estoque.createIndex({ 'em': 1 }, { expireAfterSeconds: 604800 });
 
-// Criar índices para a coleção de posts
+// Índices da coleção de posts
 db.posts.createIndex({ 'titulo': 1 });
 db.posts.createIndex({ 'autor': 1 });
 db.posts.createIndex({ 'tags': 1 });
 db.posts.createIndex({ 'publicado': 1 });
 db.posts.createIndex({ 'data_publicacao': -1 });
+db.posts.createIndex({ 'publicado': 1, 'visualizacoes': -1 });
 
-// Criar índices para a coleção de vendas
+// Índices da coleção de vendas
 db.vendas.createIndex({ 'produto': 1 });
 db.vendas.createIndex({ 'vendedor': 1 });
 db.vendas.createIndex({ 'data_venda': -1 });
 
 print('Configuração do MongoDB concluída com sucesso!');
 print('Coleções criadas: usuarios, produtos, posts, vendas');
-print('Índices criados para melhor performance');
+print('Índices criados conforme index_manager.py (INDEX_SPECS)');
 print('Dados de exemplo inseridos na coleção usuarios');
\ No newline at end of file
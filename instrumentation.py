@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Instrumentação de latência por operação CRUD
+Este módulo registra listeners de monitoramento do pymongo (comandos, pool de
+conexões e servidor) e acumula, por método CRUD e por coleção, histogramas do
+tempo de ida e volta ao servidor, da espera por uma conexão do pool, dos
+documentos retornados e do tamanho lógico (BSON não comprimido) de comandos e
+respostas. Os histogramas podem ser consultados em código ou exportados no
+formato texto do Prometheus.
+
+O monitoramento do pymongo não informa os bytes que passaram pelo socket: com
+compressão de rede (MONGODB_COMPRESSORS) eles são menores que o tamanho
+lógico. Para medir o tráfego real, use os contadores network.bytesIn/bytesOut
+do serverStatus (ver benchmark_compressao.py).
+
+Uso:
+    import instrumentation
+    inst = instrumentation.install()      # antes de criar os clientes (connect)
+    crud.connect(); crud.read_user_by_id(...)
+    inst.histogram('server_rtt_seconds', 'read_user_by_id', 'usuarios').percentile(99)
+    inst.write_prometheus('metrics.prom')
+"""
+
+import math
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import bson
+from pymongo import monitoring
+
+import crud_logging
+
+
+class Histogram:
+    """
+    Histograma log-linear no estilo HDR
+
+    Cada potência de 2 é dividida em `subdivisoes` faixas lineares, o que limita
+    o erro relativo de qualquer percentil a cerca de 1/subdivisoes, com memória
+    proporcional ao número de faixas ocupadas. Com `limites`, também conta cada
+    amostra no bucket exato do Prometheus (o primeiro limite >= valor).
+    """
+
+    def __init__(self, subdivisoes=32, limites=None):
+        self.subdivisoes = subdivisoes
+        self.limites = tuple(sorted(limites)) if limites else ()
+        # Contagem por bucket do Prometheus; a última posição é o +Inf
+        self._buckets = [0] * (len(self.limites) + 1)
+        self._faixas = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self._lock = threading.Lock()
+
+    def _indice(self, valor):
+        if valor <= 0:
+            return (-1075, 0)
+        mantissa, expoente = math.frexp(valor)  # valor = mantissa * 2**expoente, 0.5 <= m < 1
+        return (expoente, int((mantissa - 0.5) * 2 * self.subdivisoes))
+
+    def _limite_superior(self, indice):
+        expoente, faixa = indice
+        if expoente == -1075:
+            return 0.0
+        return math.ldexp(0.5 + (faixa + 1) / (2 * self.subdivisoes), expoente)
+
+    def record(self, valor):
+        """Registra uma amostra"""
+        indice = self._indice(valor)
+        with self._lock:
+            self._faixas[indice] = self._faixas.get(indice, 0) + 1
+            if self.limites:
+                self._buckets[bisect_left(self.limites, valor)] += 1
+            self.count += 1
+            self.sum += valor
+            self.min = valor if self.min is None else min(self.min, valor)
+            self.max = valor if self.max is None else max(self.max, valor)
+
+    def percentile(self, p):
+        """
+        Valor aproximado do percentil p (0-100)
+
+        Returns:
+            float: Limite superior da faixa que contém o percentil, ou None se vazio
+        """
+        with self._lock:
+            if not self.count:
+                return None
+            alvo = max(1, math.ceil(p / 100 * self.count))
+            acumulado = 0
+            for indice in sorted(self._faixas):
+                acumulado += self._faixas[indice]
+                if acumulado >= alvo:
+                    return min(self._limite_superior(indice), self.max)
+            return self.max
+
+    def cumulative(self, limites):
+        """
+        Contagens acumuladas (<= limite) para cada limite informado, como no Prometheus
+
+        Exatas para os limites do construtor. Para outros limites, uma faixa só
+        é contada quando está inteira abaixo do limite (limite superior <=
+        limite), então o resultado nunca excede o valor real.
+        """
+        with self._lock:
+            if self.limites and tuple(limites) == self.limites:
+                return list(accumulate(self._buckets[:-1]))
+            faixas = sorted((self._limite_superior(i), n) for i, n in self._faixas.items())
+        superiores = [superior for superior, _ in faixas]
+        acumulados = list(accumulate(n for _, n in faixas))
+        resultado = []
+        for limite in limites:
+            # Faixas [inferior, superior) com superior <= limite
+            j = bisect_right(superiores, limite)
+            resultado.append(acumulados[j - 1] if j else 0)
+        return resultado
+
+    def summary(self):
+        """Resumo com contagem, soma, mínimo, máximo e p50/p90/p99/p999"""
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'p999': self.percentile(99.9),
+        }
+
+
+# Limites dos buckets exportados para o Prometheus, por unidade da métrica
+BUCKETS_SEGUNDOS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+BUCKETS_CONTAGEM = [0, 1, 10, 100, 1000, 10000, 100000]
+BUCKETS_BYTES = [256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216]
+
+METRICAS = {
+    'server_rtt_seconds': ('Tempo de ida e volta do comando ao servidor', BUCKETS_SEGUNDOS),
+    'pool_wait_seconds': ('Espera por uma conexão do pool', BUCKETS_SEGUNDOS),
+    'documents_returned': ('Documentos retornados por comando de leitura (lotes de cursor e '
+                           'findAndModify)', BUCKETS_CONTAGEM),
+    'request_document_bytes': ('Tamanho BSON do comando, sem compressão (não são os bytes '
+                               'na rede)', BUCKETS_BYTES),
+    'reply_document_bytes': ('Tamanho BSON da resposta, sem compressão (não são os bytes '
+                             'na rede)', BUCKETS_BYTES),
+    'server_heartbeat_seconds': ('Duração dos heartbeats de monitoramento do servidor', BUCKETS_SEGUNDOS),
+}
+
+# Comandos cujo primeiro campo é o nome da coleção
+_COMANDOS_COM_COLECAO = {'find', 'insert', 'update', 'delete', 'aggregate', 'count',
+                         'distinct', 'findAndModify', 'createIndexes', 'listIndexes'}
+
+
+def _rotulo(valor):
+    """Valor de rótulo do Prometheus, com \\, aspas e quebras de linha escapados"""
+    if valor is None:
+        return ''
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _HeartbeatListener(monitoring.ServerHeartbeatListener):
+    """Repassa a duração dos heartbeats (mesmos nomes de método do CommandListener)"""
+
+    def __init__(self, instrumentacao):
+        self.instrumentacao = instrumentacao
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.instrumentacao.histogram('server_heartbeat_seconds').record(event.duration)
+
+    def failed(self, event):
+        self.instrumentacao.histogram('server_heartbeat_seconds').record(event.duration)
+
+
+class Instrumentation(monitoring.CommandListener, monitoring.ConnectionPoolListener):
+    """Listener de comandos e do pool de conexões que alimenta os histogramas"""
+
+    def __init__(self, medir_bytes=True):
+        """
+        Args:
+            medir_bytes (bool): Calcula o tamanho lógico (BSON não comprimido) de
+                comandos e respostas (custo de uma serialização extra por comando)
+        """
+        self.medir_bytes = medir_bytes
+        self._histogramas = {}
+        self._lock = threading.Lock()
+        # Comandos em andamento: os eventos chegam das threads de todos os pools
+        self._em_andamento = {}
+        self._checkout = threading.local()
+        self.falhas = {}
+        self.heartbeats = _HeartbeatListener(self)
+
+    # Consulta
+    def histogram(self, metrica, metodo=None, colecao=None):
+        """
+        Retorna (criando se preciso) o histograma de uma métrica
+
+        Args:
+            metrica (str): Uma das chaves de METRICAS
+            metodo (str, optional): Método CRUD (None = fora de um método CRUD)
+            colecao (str, optional): Nome da coleção
+        """
+        chave = (metrica, metodo, colecao)
+        histograma = self._histogramas.get(chave)
+        if histograma is None:
+            with self._lock:
+                histograma = self._histogramas.setdefault(
+                    chave, Histogram(limites=METRICAS[metrica][1]))
+        return histograma
+
+    def snapshot(self):
+        """
+        Resumo de todos os histogramas
+
+        Returns:
+            dict: {(metrica, metodo, colecao): resumo}
+        """
+        with self._lock:
+            itens = list(self._histogramas.items())
+        return {chave: histograma.summary() for chave, histograma in itens}
+
+    def reset(self):
+        """Descarta todas as amostras"""
+        with self._lock:
+            self._histogramas = {}
+            self.falhas = {}
+
+    # Contexto
+    @staticmethod
+    def _operacao():
+        atual = crud_logging.operacao_atual.get()
+        return atual if atual is not None else (None, None)
+
+    @staticmethod
+    def _colecao(comando, nome):
+        if nome == 'getMore':
+            return comando.get('collection')
+        if nome in _COMANDOS_COM_COLECAO:
+            valor = comando.get(nome)
+            return valor if isinstance(valor, str) else None
+        return None
+
+    # CommandListener
+    def started(self, event):
+        metodo, colecao_op = self._operacao()
+        colecao = self._colecao(event.command, event.command_name) or colecao_op
+        with self._lock:
+            self._em_andamento[(event.request_id, event.connection_id)] = (metodo, colecao)
+        if self.medir_bytes:
+            self.histogram('request_document_bytes', metodo, colecao).record(
+                len(bson.encode(event.command)))
+
+    def _finalizar(self, event):
+        with self._lock:
+            inicio = self._em_andamento.pop((event.request_id, event.connection_id), None)
+        return inicio if inicio is not None else self._operacao()
+
+    def succeeded(self, event):
+        metodo, colecao = self._finalizar(event)
+        self.histogram('server_rtt_seconds', metodo, colecao).record(event.duration_micros / 1e6)
+        resposta = event.reply
+        cursor = resposta.get('cursor')
+        # Escritas informam em n os documentos afetados, não retornados: ficam de fora
+        documentos = None
+        if isinstance(cursor, dict):
+            lote = cursor.get('firstBatch', cursor.get('nextBatch'))
+            documentos = len(lote) if lote is not None else 0
+        elif event.command_name == 'findAndModify':
+            documentos = 0 if resposta.get('value') is None else 1
+        if documentos is not None:
+            self.histogram('documents_returned', metodo, colecao).record(documentos)
+        if self.medir_bytes:
+            self.histogram('reply_document_bytes', metodo, colecao).record(
+                len(bson.encode(resposta)))
+
+    def failed(self, event):
+        metodo, colecao = self._finalizar(event)
+        self.histogram('server_rtt_seconds', metodo, colecao).record(event.duration_micros / 1e6)
+        with self._lock:
+            chave = (metodo, colecao, event.command_name)
+            self.falhas[chave] = self.falhas.get(chave, 0) + 1
+
+    # ConnectionPoolListener
+    def connection_check_out_started(self, event):
+        # Os eventos de checkout são emitidos na thread que pediu a conexão
+        self._checkout.inicio = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        inicio = getattr(self._checkout, 'inicio', None)
+        if inicio is not None:
+            metodo, colecao = self._operacao()
+            self.histogram('pool_wait_seconds', metodo, colecao).record(time.perf_counter() - inicio)
+            self._checkout.inicio = None
+
+    def connection_check_out_failed(self, event):
+        self.connection_checked_out(event)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+    # Exportação
+    def to_prometheus(self, prefixo='mongodb_crud'):
+        """
+        Gera as métricas no formato texto de exposição do Prometheus
+
+        Returns:
+            str: Conteúdo pronto para /metrics ou para o textfile collector
+        """
+        with self._lock:
+            itens = sorted(self._histogramas.items(), key=lambda item: tuple(str(x) for x in item[0]))
+            falhas = dict(self.falhas)
+        linhas = []
+        declaradas = set()
+        for (metrica, metodo, colecao), histograma in itens:
+            nome = f"{prefixo}_{metrica}"
+            descricao, limites = METRICAS[metrica]
+            if nome not in declaradas:
+                linhas.append(f"# HELP {nome} {descricao}")
+                linhas.append(f"# TYPE {nome} histogram")
+                declaradas.add(nome)
+            rotulos = f'metodo="{_rotulo(metodo)}",colecao="{_rotulo(colecao)}"'
+            for limite, acumulado in zip(limites, histograma.cumulative(limites)):
+                linhas.append(f'{nome}_bucket{{{rotulos},le="{limite}"}} {acumulado}')
+            linhas.append(f'{nome}_bucket{{{rotulos},le="+Inf"}} {histograma.count}')
+            linhas.append(f'{nome}_sum{{{rotulos}}} {histograma.sum}')
+            linhas.append(f'{nome}_count{{{rotulos}}} {histograma.count}')
+        if falhas:
+            nome = f"{prefixo}_command_failures_total"
+            linhas.append(f"# HELP {nome} Comandos que falharam no servidor")
+            linhas.append(f"# TYPE {nome} counter")
+            for (metodo, colecao, comando), total in sorted(falhas.items(), key=str):
+                linhas.append(f'{nome}{{metodo="{_rotulo(metodo)}",colecao="{_rotulo(colecao)}",'
+                              f'comando="{_rotulo(comando)}"}} {total}')
+        return "\n".join(linhas) + "\n"
+
+    def write_prometheus(self, caminho, prefixo='mongodb_crud'):
+        """Grava as métricas em arquivo (escrita atômica, para o textfile collector)"""
+        temporario = caminho + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(self.to_prometheus(prefixo))
+        os.replace(temporario, caminho)
+
+    def serve_prometheus(self, porta=9216, endereco='127.0.0.1'):
+        """
+        Expõe as métricas em http://endereco:porta/metrics numa thread de fundo
+
+        Returns:
+            ThreadingHTTPServer: Servidor iniciado (use shutdown() para parar)
+        """
+        instrumentacao = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                corpo = instrumentacao.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass
+
+        servidor = ThreadingHTTPServer((endereco, porta), _Handler)
+        threading.Thread(target=servidor.serve_forever, name='prometheus-metrics',
+                         daemon=True).start()
+        return servidor
+
+
+_instalada = None
+
+
+def install(medir_bytes=True):
+    """
+    Registra a instrumentação globalmente no pymongo (uma vez por processo)
+
+    Só clientes criados depois desta chamada são monitorados, então chame antes
+    de MongoDBCRUD.connect().
+
+    Returns:
+        Instrumentation: Instância ativa
+    """
+    global _instalada
+    if _instalada is None:
+        _instalada = Instrumentation(medir_bytes=medir_bytes)
+        monitoring.register(_instalada)
+        monitoring.register(_instalada.heartbeats)
+        crud_logging.rastrear_operacoes = True
+    return _instalada
+
+
+def get():
+    """Retorna a instrumentação instalada, ou None"""
+    return _instalada
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Controle de estoque seguro sob concorrência
+Este módulo baixa o estoque de produtos com atualizações condicionais
+(estoque >= quantidade) por _id, de modo que vendas simultâneas nunca deixam o
+estoque negativo nem vendem a mesma unidade duas vezes.
+
+Pedidos com vários itens são aplicados num único bulk_write. Cada item
+registra no produto uma reserva ({pedido, quantidade, em}, campo reservas). Se
+algum item falhar (ou o bulk_write levantar exceção), os itens já aplicados
+são devolvidos pela reserva, e o pedido é tentado de novo enquanto a falha vier
+de concorrência e não de falta de estoque.
+
+Com todos os itens reservados, o destino do pedido é decidido num único
+documento da coleção de decisões ({_id: pedido, estado}), inserido uma vez:
+'confirmado' por place_order() ou 'cancelado' por sweep_reservations(), que
+devolve ao estoque as reservas de processos que morreram no meio do pedido.
+Quem insere primeiro decide; o outro lado lê a decisão. Assim um pedido nunca
+fica confirmado em parte, mesmo que o sweep corra junto ou que a resposta de
+uma escrita se perca na rede. Remover as reservas de um pedido confirmado é só
+limpeza: se falhar, o sweep as remove depois sem mexer no estoque.
+"""
+
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from crud_logging import logger
+
+
+def _object_id(doc_id):
+    return ObjectId(doc_id) if isinstance(doc_id, str) else doc_id
+
+
+def _quantidade(quantidade):
+    if not isinstance(quantidade, int) or isinstance(quantidade, bool) or quantidade <= 0:
+        raise ValueError(f"Quantidade inválida: {quantidade!r} (use um inteiro positivo)")
+    return quantidade
+
+
+class Inventory:
+    """Operações de estoque atômicas sobre a coleção de produtos"""
+
+    def __init__(self, collection, tentativas=5, espera_base_s=0.005, decisoes=None):
+        """
+        Args:
+            collection (Collection): Coleção de produtos
+            tentativas (int): Máximo de tentativas de um pedido com vários itens
+            espera_base_s (float): Espera inicial entre tentativas (dobra a cada uma,
+                com variação aleatória)
+            decisoes (Collection, optional): Coleção com o destino de cada pedido
+                (padrão: pedidos_estoque, no mesmo banco; os documentos expiram
+                pelo índice TTL de index_manager.py)
+        """
+        self.collection = collection
+        self.tentativas = tentativas
+        self.espera_base_s = espera_base_s
+        self.decisoes = (decisoes if decisoes is not None
+                         else collection.database['pedidos_estoque'])
+
+    def decrement(self, produto_id, quantidade=1, projecao=None):
+        """
+        Baixa o estoque de um produto se houver unidades suficientes
+
+        Args:
+            produto_id (str|ObjectId): _id do produto
+            quantidade (int): Unidades vendidas
+            projecao (dict, optional): Campos do documento retornado
+
+        Returns:
+            dict: Produto após a baixa, ou None se não existir ou não houver estoque
+        """
+        return self.collection.find_one_and_update(
+            {'_id': _object_id(produto_id), 'estoque': {'$gte': _quantidade(quantidade)}},
+            {'$inc': {'estoque': -quantidade}, '$currentDate': {'ultima_venda': True}},
+            projection=projecao,
+            return_document=ReturnDocument.AFTER
+        )
+
+    def restock(self, produto_id, quantidade):
+        """
+        Devolve unidades ao estoque
+
+        Returns:
+            dict: Produto após a reposição, ou None se não existir
+        """
+        return self.collection.find_one_and_update(
+            {'_id': _object_id(produto_id)},
+            {'$inc': {'estoque': _quantidade(quantidade)}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    def available(self, produto_ids):
+        """Estoque atual por _id (produtos inexistentes ficam de fora)"""
+        ids = [_object_id(pid) for pid in produto_ids]
+        return {doc['_id']: doc.get('estoque', 0)
+                for doc in self.collection.find({'_id': {'$in': ids}}, {'estoque': 1})}
+
+    def place_order(self, itens):
+        """
+        Baixa o estoque de todos os itens de um pedido ou de nenhum
+
+        Args:
+            itens (dict|list): {produto_id: quantidade} ou [(produto_id, quantidade), ...]
+
+        Returns:
+            dict: ok, pedido, tentativas e, se falhar, faltantes
+                ({produto_id: estoque disponível}) dos itens sem estoque suficiente
+
+        Raises:
+            PyMongoError: Se não foi possível registrar nem ler a decisão do
+                pedido. O estoque continua reservado e sweep_reservations()
+                resolve o pedido de forma consistente; o destino pode ser
+                consultado com order_status(exc.pedido).
+        """
+        pares = itens.items() if isinstance(itens, dict) else itens
+        quantidades = {}
+        for produto_id, quantidade in pares:
+            produto_id = _object_id(produto_id)
+            quantidades[produto_id] = quantidades.get(produto_id, 0) + _quantidade(quantidade)
+
+        ids = list(quantidades)
+        for tentativa in range(1, self.tentativas + 1):
+            pedido = ObjectId()
+            if self._aplicar(pedido, quantidades):
+                return {'ok': True, 'pedido': pedido, 'tentativas': tentativa, 'faltantes': {}}
+
+            disponivel = self.available(ids)
+            faltantes = {pid: disponivel.get(pid, 0) for pid, qtd in quantidades.items()
+                         if disponivel.get(pid, 0) < qtd}
+            if faltantes:
+                return {'ok': False, 'pedido': pedido, 'tentativas': tentativa,
+                        'faltantes': faltantes}
+            # Falhou por concorrência (o estoque voltou a ser suficiente): tenta de novo
+            time.sleep(self.espera_base_s * (2 ** (tentativa - 1)) * random.uniform(0.5, 1.5))
+
+        logger.warning('pedido abandonado após tentativas', extra={
+            'colecao': self.collection.name, 'itens': len(quantidades),
+            'tentativas': self.tentativas,
+        })
+        return {'ok': False, 'pedido': pedido, 'tentativas': self.tentativas, 'faltantes': {}}
+
+    def _aplicar(self, pedido, quantidades):
+        """
+        Reserva todos os itens de um pedido e decide o seu destino
+
+        Returns:
+            bool: True se confirmado; False se algum item não foi reservado ou
+                se o sweep cancelou o pedido antes (o estoque reservado já foi
+                devolvido)
+        """
+        agora = datetime.now(timezone.utc)
+        operacoes = [
+            UpdateOne(
+                {'_id': pid, 'estoque': {'$gte': qtd}, 'reservas.pedido': {'$ne': pedido}},
+                {'$inc': {'estoque': -qtd},
+                 '$push': {'reservas': {'pedido': pedido, 'quantidade': qtd, 'em': agora}},
+                 '$currentDate': {'ultima_venda': True}}
+            )
+            for pid, qtd in quantidades.items()
+        ]
+        reservado = False
+        try:
+            resultado = self.collection.bulk_write(operacoes, ordered=False)
+            reservado = resultado.modified_count == len(operacoes)
+        finally:
+            # Nada foi decidido ainda: as reservas presentes são exatamente o
+            # estoque tirado por este pedido
+            if not reservado:
+                self._desfazer(pedido, quantidades)
+        if not reservado:
+            return False
+
+        try:
+            estado = self._decidir(pedido, 'confirmado')
+        except PyMongoError as e:
+            e.pedido = pedido
+            raise
+        if estado != 'confirmado':
+            self._desfazer(pedido, quantidades)
+            return False
+
+        try:
+            self.collection.update_many(
+                # Filtro por _id: reservas não tem índice, e só estes produtos têm a marca
+                {'_id': {'$in': list(quantidades)}, 'reservas.pedido': pedido},
+                {'$pull': {'reservas': {'pedido': pedido}}}
+            )
+        except PyMongoError as e:
+            # O pedido já está confirmado: o sweep remove as reservas sem devolver estoque
+            logger.warning('falha ao limpar reservas de pedido confirmado', extra={
+                'colecao': self.collection.name, 'pedido': str(pedido), 'erro': str(e),
+            })
+        return True
+
+    def _decidir(self, pedido, estado, tentativas=3):
+        """
+        Registra o destino do pedido, se ainda não houver um
+
+        Returns:
+            str: Estado vencedor ('confirmado' ou 'cancelado')
+        """
+        for tentativa in range(1, tentativas + 1):
+            try:
+                self.decisoes.insert_one({'_id': pedido, 'estado': estado,
+                                          'em': datetime.now(timezone.utc)})
+                return estado
+            except DuplicateKeyError:
+                pass
+            except PyMongoError:
+                # A inserção pode ter chegado ao servidor: a leitura abaixo confirma
+                if tentativa == tentativas:
+                    raise
+            try:
+                decisao = self.decisoes.find_one({'_id': pedido}, {'estado': 1})
+            except PyMongoError:
+                if tentativa == tentativas:
+                    raise
+                continue
+            if decisao is not None:
+                return decisao['estado']
+        raise RuntimeError(f"Decisão do pedido {pedido} não registrada")
+
+    def order_status(self, pedido):
+        """Destino registrado do pedido: 'confirmado', 'cancelado' ou None (não decidido)"""
+        decisao = self.decisoes.find_one({'_id': _object_id(pedido)}, {'estado': 1})
+        return decisao['estado'] if decisao else None
+
+    def _desfazer(self, pedido, quantidades):
+        """Devolve o estoque dos itens ainda reservados pelo pedido (idempotente)"""
+        operacoes = [
+            UpdateOne({'_id': pid, 'reservas.pedido': pedido},
+                      {'$inc': {'estoque': qtd}, '$pull': {'reservas': {'pedido': pedido}}})
+            for pid, qtd in quantidades.items()
+        ]
+        try:
+            self.collection.bulk_write(operacoes, ordered=False)
+        except PyMongoError as e:
+            # As reservas continuam marcadas: sweep_reservations() devolve o estoque depois
+            logger.warning('falha ao devolver reservas do pedido', extra={
+                'colecao': self.collection.name, 'pedido': str(pedido), 'erro': str(e),
+            })
+
+    def sweep_reservations(self, idade_maxima_s=300):
+        """
+        Devolve ao estoque reservas não confirmadas há mais de idade_maxima_s
+
+        Cobre pedidos interrompidos entre a reserva e a confirmação (processo
+        encerrado, falha de rede). Antes de devolver, o pedido é marcado como
+        cancelado; se place_order() já o confirmou, a reserva é só removida e o
+        estoque continua baixado. idade_maxima_s deve ser bem maior que a
+        duração de um pedido, para não cancelar pedidos ainda em andamento.
+
+        Returns:
+            int: Reservas devolvidas
+        """
+        limite = datetime.now(timezone.utc) - timedelta(seconds=idade_maxima_s)
+        devolvidas = 0
+        for produto in self.collection.find({'reservas.em': {'$lt': limite}}, {'reservas': 1}):
+            for reserva in produto['reservas']:
+                em = reserva['em']
+                if em.tzinfo is None:
+                    em = em.replace(tzinfo=timezone.utc)
+                if em >= limite:
+                    continue
+                atualizacao = {'$pull': {'reservas': {'pedido': reserva['pedido']}}}
+                cancelado = self._decidir(reserva['pedido'], 'cancelado') == 'cancelado'
+                if cancelado:
+                    atualizacao['$inc'] = {'estoque': reserva['quantidade']}
+                resultado = self.collection.update_one(
+                    {'_id': produto['_id'], 'reservas.pedido': reserva['pedido']},
+                    atualizacao
+                )
+                if cancelado:
+                    devolvidas += resultado.modified_count
+        if devolvidas:
+            logger.warning('reservas abandonadas devolvidas ao estoque', extra={
+                'colecao': self.collection.name, 'reservas': devolvidas,
+            })
+        return devolvidas
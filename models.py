@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modelos compactos de documentos
+Classes com __slots__ para usuarios, produtos, posts e vendas, com os campos do
+$jsonSchema de init-mongo.js (usuarios) e dos documentos criados pela
+aplicação (demais coleções). Cada instância guarda só os valores, sem o
+dicionário por objeto, o que reduz bastante a memória de jobs que mantêm
+milhões de documentos carregados.
+
+Os modelos são MutableMapping: servem como document_class do driver (o cursor
+decodifica o BSON direto no modelo, ver codec_options()), podem ser passados a
+insert_one/insert_many e aceitam o acesso doc['campo'] do código existente.
+Campos fora do layout ficam num dicionário de extras criado sob demanda.
+
+O uso é opcional e por chamada (modelo=True nas leituras de mongodb_crud.py e
+repository.py); o document_class padrão continua dict. A troca: cerca de
+metade da memória retida por documento, mas decodificação 1,5–4x mais lenta,
+porque cada campo é atribuído em Python em vez de pelo decodificador em C
+(benchmark_modelos.py). Compensa em jobs que mantêm muitos documentos na
+memória; em leituras curtas, ou que só repassam os documentos, dict ou
+raw=True são mais rápidos.
+"""
+
+from collections.abc import MutableMapping
+from decimal import Decimal
+from bson.codec_options import CodecOptions, TypeCodec, TypeRegistry
+from bson.decimal128 import Decimal128
+
+
+# Marca de campo ausente (diferente de um campo presente com valor None)
+_AUSENTE = object()
+
+
+class Modelo(MutableMapping):
+    """Documento com layout fixo de campos em __slots__"""
+
+    __slots__ = ('_extras',)
+
+    # Campos do layout, na ordem em que são serializados
+    CAMPOS = ()
+    # Campos obrigatórios (mesma lista do required do $jsonSchema)
+    OBRIGATORIOS = ()
+    # Subdocumentos com modelo próprio: {campo: classe}
+    ANINHADOS = {}
+
+    def __init__(self, documento=None, **campos):
+        # Slots não atribuídos representam campos ausentes: o driver cria o
+        # modelo sem argumentos e só preenche os campos presentes no BSON
+        if documento is not None:
+            for chave, valor in (documento.items() if hasattr(documento, 'items') else documento):
+                self[chave] = valor
+        for chave, valor in campos.items():
+            self[chave] = valor
+
+    @classmethod
+    def from_document(cls, documento):
+        """Cria o modelo a partir de um dicionário (ou outro mapeamento)"""
+        return cls(documento)
+
+    def to_document(self):
+        """Dicionário com os campos presentes (subdocumentos também convertidos)"""
+        return {chave: _para_dict(valor) for chave, valor in self._pares()}
+
+    def _pares(self):
+        # Mesmo conteúdo de items(), sem passar pelo ItemsView e __getitem__
+        for campo in self.CAMPOS:
+            valor = getattr(self, campo, _AUSENTE)
+            if valor is not _AUSENTE:
+                yield campo, valor
+        extras = getattr(self, '_extras', None)
+        if extras:
+            yield from extras.items()
+
+    def missing(self):
+        """Campos obrigatórios ausentes"""
+        return [campo for campo in self.OBRIGATORIOS if getattr(self, campo, _AUSENTE) is _AUSENTE]
+
+    def _converter(self, chave, valor):
+        # O driver decodifica subdocumentos com a mesma document_class do
+        # documento: aqui eles viram o modelo aninhado declarado ou um dict
+        tipo = type(valor)
+        if tipo in _TIPOS_MODELO:
+            return _aninhado(self.ANINHADOS.get(chave), valor)
+        if tipo is list and valor and type(valor[0]) in _TIPOS_MODELO:
+            classe = self.ANINHADOS.get(chave)
+            return [_aninhado(classe, item) if type(item) in _TIPOS_MODELO else item
+                    for item in valor]
+        return valor
+
+    # Protocolo de MutableMapping
+    def __getitem__(self, chave):
+        if chave in self._indice:
+            valor = getattr(self, chave, _AUSENTE)
+            if valor is not _AUSENTE:
+                return valor
+        else:
+            extras = getattr(self, '_extras', None)
+            if extras is not None and chave in extras:
+                return extras[chave]
+        raise KeyError(chave)
+
+    def __setitem__(self, chave, valor):
+        # Caminho do driver: um __setitem__ por campo decodificado
+        tipo = type(valor)
+        if tipo is list or tipo in _TIPOS_MODELO:
+            valor = self._converter(chave, valor)
+        slot = self._slots.get(chave)
+        if slot is not None:
+            slot(self, valor)
+        else:
+            extras = getattr(self, '_extras', None)
+            if extras is None:
+                extras = self._extras = {}
+            extras[chave] = valor
+
+    def __delitem__(self, chave):
+        if chave in self._indice:
+            if getattr(self, chave, _AUSENTE) is _AUSENTE:
+                raise KeyError(chave)
+            delattr(self, chave)
+        else:
+            extras = getattr(self, '_extras', None)
+            if extras is None or chave not in extras:
+                raise KeyError(chave)
+            del extras[chave]
+
+    def __iter__(self):
+        for campo in self.CAMPOS:
+            if getattr(self, campo, _AUSENTE) is not _AUSENTE:
+                yield campo
+        yield from getattr(self, '_extras', None) or ()
+
+    def __len__(self):
+        presentes = sum(1 for campo in self.CAMPOS if getattr(self, campo, _AUSENTE) is not _AUSENTE)
+        return presentes + len(getattr(self, '_extras', None) or ())
+
+    def __contains__(self, chave):
+        if chave in self._indice:
+            return getattr(self, chave, _AUSENTE) is not _AUSENTE
+        extras = getattr(self, '_extras', None)
+        return extras is not None and chave in extras
+
+    def __eq__(self, outro):
+        if isinstance(outro, MutableMapping):
+            return dict(self._pares()) == dict(outro.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self._pares())!r})"
+
+    def __getstate__(self):
+        return dict(self._pares())
+
+    def __setstate__(self, estado):
+        self.__init__(estado)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if '__slots__' not in cls.__dict__:
+            raise TypeError(f"{cls.__name__} precisa declarar __slots__")
+        cls._indice = frozenset(cls.CAMPOS)
+        cls._slots = {campo: getattr(cls, campo).__set__ for campo in cls.CAMPOS}
+        _TIPOS_MODELO.add(cls)
+
+
+Modelo._indice = frozenset()
+Modelo._slots = {}
+# Classes de modelo (comparação por type(), mais barata que isinstance com ABC)
+_TIPOS_MODELO = set()
+
+
+def _aninhado(classe, valor):
+    if classe is None:
+        return valor.to_document()
+    if type(valor) is classe:
+        return valor
+    novo = classe()
+    for chave, item in valor._pares():
+        novo[chave] = item
+    return novo
+
+
+def _para_dict(valor):
+    if isinstance(valor, Modelo):
+        return valor.to_document()
+    if type(valor) is list:
+        return [_para_dict(item) for item in valor]
+    return valor
+
+
+class Usuario(Modelo):
+    """Documento de usuarios ($jsonSchema de init-mongo.js)"""
+
+    CAMPOS = ('_id', 'nome', 'email', 'idade', 'cidade', 'ativo', 'data_criacao',
+              'data_atualizacao')
+    OBRIGATORIOS = ('nome', 'email', 'idade')
+    __slots__ = CAMPOS
+
+
+class Produto(Modelo):
+    """Documento de produtos (exemplo_avancado.py e inventory.py)"""
+
+    CAMPOS = ('_id', 'nome', 'categoria', 'preco', 'estoque', 'descricao', 'ativo',
+              'data_criacao', 'desconto', 'promocao', 'reservas', 'ultima_venda')
+    OBRIGATORIOS = ('nome', 'preco', 'estoque')
+    __slots__ = CAMPOS
+
+
+class Comentario(Modelo):
+    """Comentário embutido em posts.comentarios"""
+
+    CAMPOS = ('autor', 'texto', 'data')
+    OBRIGATORIOS = ('autor', 'texto')
+    __slots__ = CAMPOS
+
+
+class Post(Modelo):
+    """Documento de posts (comentários como Comentario)"""
+
+    CAMPOS = ('_id', 'titulo', 'autor', 'conteudo', 'tags', 'visualizacoes', 'likes',
+              'comentarios', 'publicado', 'data_publicacao', 'data_criacao')
+    OBRIGATORIOS = ('titulo', 'autor')
+    ANINHADOS = {'comentarios': Comentario}
+    __slots__ = CAMPOS
+
+
+class Venda(Modelo):
+    """Documento de vendas"""
+
+    CAMPOS = ('_id', 'produto', 'vendedor', 'quantidade', 'preco_unitario', 'total',
+              'data_venda')
+    OBRIGATORIOS = ('produto', 'quantidade', 'preco_unitario', 'total')
+    __slots__ = CAMPOS
+
+
+MODELOS = {
+    'usuarios': Usuario,
+    'produtos': Produto,
+    'posts': Post,
+    'vendas': Venda,
+}
+
+
+class DecimalCodec(TypeCodec):
+    """Decimal do Python ↔ Decimal128 do BSON (valores monetários exatos)"""
+
+    python_type = Decimal
+    bson_type = Decimal128
+
+    def transform_python(self, valor):
+        return Decimal128(valor)
+
+    def transform_bson(self, valor):
+        return valor.to_decimal()
+
+
+TYPE_REGISTRY = TypeRegistry([DecimalCodec()])
+
+
+def codec_options(modelo, base=None):
+    """
+    CodecOptions que decodificam os documentos direto em modelo
+
+    O TypeCodec do driver só se aplica a valores (aqui Decimal ↔ Decimal128);
+    documentos inteiros são montados pela document_class. Aplique só aos
+    handles das leituras que pediram o modelo, nunca ao cliente ou à coleção
+    padrão: a decodificação fica mais lenta que em dict.
+
+    Args:
+        modelo (type|str): Classe de modelo ou nome da coleção em MODELOS
+        base (CodecOptions, optional): Opções a preservar (tz_aware, etc.)
+
+    Returns:
+        CodecOptions: Opções para get_collection/with_options/bson.decode_all
+    """
+    if isinstance(modelo, str):
+        if modelo not in MODELOS:
+            raise ValueError(f"Coleção sem modelo: {modelo} (use {', '.join(MODELOS)})")
+        modelo = MODELOS[modelo]
+    if not (isinstance(modelo, type) and issubclass(modelo, Modelo)):
+        raise ValueError(f"Modelo inválido: {modelo!r}")
+    base = base or CodecOptions()
+    return base.with_options(document_class=modelo, type_registry=TYPE_REGISTRY)
@@ -10,17 +10,45 @@ Data: 2024
 """
 
 import os
+from contextlib import contextmanager
 from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, DuplicateKeyError
+from pymongo.errors import ConnectionFailure, CursorNotFound, DuplicateKeyError
+from bson.raw_bson import RawBSONDocument
 from datetime import datetime
 import json
-from config import MongoConfig
+from config import MongoConfig, validate_driver_options
+from profiles import build_profiles
+from client_pool import registry as client_registry
+from bulk_loader import BulkLoader, preparar_usuario
+from write_batch import WriteBatch
+from user_cache import DocumentCache
+from cache_watcher import ChangeStreamCacheWatcher
+from crud_logging import VERBOSIDADES, logger, marcar_falha, timed
+from query_analyzer import QueryAnalyzer
+from repository import REPOSITORIOS, Repository, UsuariosRepository
+from models import Usuario, codec_options as opcoes_do_modelo
+from schema_validator import validator_for
+import index_manager
+
+
+# Bancos cujos índices de usuarios já foram conferidos neste processo
+_indices_conferidos = set()
 
 
 class MongoDBCRUD:
     """Classe para realizar operações CRUD no MongoDB"""
     
-    def __init__(self, connection_string=None, database_name=None, environment=None):
+    # Projeções nomeadas aceitas pelos métodos de leitura (parâmetro view),
+    # as mesmas do repositório de usuarios
+    VIEWS = UsuariosRepository.VIEWS
+    
+    # Campos com índice simples em init-mongo.js: consultas filtradas e projetadas
+    # apenas no próprio campo (sem _id) são respondidas só pelo índice (covered query)
+    COVERED_FIELDS = ("email", "nome", "idade", "cidade")
+    
+    def __init__(self, connection_string=None, database_name=None, environment=None,
+                 pool_options=None, verbosity=None, ensure_indexes=True, validate_schema=True,
+                 profiles=None, default_profile=None):
         """
         Inicializa a conexão com o MongoDB
         
@@ -28,6 +56,23 @@ class MongoDBCRUD:
             connection_string (str, optional): String de conexão do MongoDB
             database_name (str, optional): Nome do banco de dados
             environment (str, optional): Ambiente específico ('local', 'docker_host', 'docker_container', 'atlas')
+            pool_options (dict, optional): Opções do pool compartilhado (maxPoolSize,
+                minPoolSize, maxIdleTimeMS, waitQueueTimeoutMS) e ajustes do driver
+                (compressors, connectTimeoutMS...); têm precedência sobre os do
+                ambiente e do .env (ver MongoConfig.get_driver_options)
+            verbosity (str, optional): 'quiet' (padrão, sem saída no terminal) ou
+                'demo' (mensagens a cada operação); padrão lido de CRUD_VERBOSITY
+            ensure_indexes (bool): Garante, uma vez por processo, os índices de
+                usuarios definidos em index_manager.INDEX_SPECS ao conectar, se a
+                coleção já existir (bancos usados só para outras coleções não
+                ganham uma coleção usuarios vazia)
+            validate_schema (bool): Valida os usuários no cliente, com o $jsonSchema
+                de init-mongo.js, antes de create_user, create_multiple_users e
+                bulk_load_users enviarem os documentos
+            profiles (dict, optional): Ajustes dos perfis de desempenho
+                ({nome: opções}, ver profiles.py), aplicados sobre os do ambiente
+            default_profile (str, optional): Perfil usado quando a chamada não
+                informa profile (padrão: opções do driver)
         """
         # Auto-detectar configuração se não fornecida
         if connection_string is None or database_name is None:
@@ -39,10 +84,31 @@ class MongoDBCRUD:
             self.connection_string = connection_string or config['connection_string']
             self.database_name = database_name or config['database_name']
             self.environment_description = config['description']
+            self.profiles = build_profiles(config.get('profiles'), profiles)
+            ajustes = MongoConfig.get_driver_options(config=config)
         else:
             self.connection_string = connection_string
             self.database_name = database_name
             self.environment_description = "Configuração personalizada"
+            self.profiles = build_profiles(profiles)
+            ajustes = MongoConfig.get_driver_options(config={})
+        if default_profile is not None and default_profile not in self.profiles:
+            raise ValueError(f"Perfil desconhecido: {default_profile} (use {', '.join(self.profiles)})")
+        self.default_profile = default_profile
+        # Ajustes do ambiente/.env, sobrescritos pelas opções passadas aqui
+        self.pool_options = validate_driver_options({**ajustes, **(pool_options or {})})
+        self.ensure_indexes = ensure_indexes
+        self.validate_schema = validate_schema
+        self.verbosity = verbosity or os.getenv('CRUD_VERBOSITY', 'quiet')
+        if self.verbosity not in VERBOSIDADES:
+            raise ValueError(f"Verbosidade inválida: {self.verbosity} (use {', '.join(VERBOSIDADES)})")
+        self._demo = self.verbosity == 'demo'
+        self.cache = None
+        self.cache_watcher = None
+        self.query_analyzer = None
+        # Handles da coleção atual por (perfil, raw, modelo)
+        self._handles = (None, {})
+        self._repositorios = {}
         self.client = None
         self.db = None
         self.collection = None
@@ -50,33 +116,254 @@ class MongoDBCRUD:
     def connect(self):
         """Estabelece conexão com o MongoDB"""
         try:
-            print(f"🔌 Conectando ao MongoDB...")
-            print(f"   Ambiente: {self.environment_description}")
-            print(f"   Database: {self.database_name}")
+            self._say("🔌 Conectando ao MongoDB...\n   Ambiente: %s\n   Database: %s",
+                      self.environment_description, self.database_name)
             
-            self.client = MongoClient(self.connection_string, serverSelectionTimeoutMS=5000)
-            # Testa a conexão
-            self.client.admin.command('ping')
+            # Reutiliza o cliente compartilhado (o ping só ocorre na criação)
+            self.client = client_registry.acquire(self.connection_string, **self.pool_options)
             self.db = self.client[self.database_name]
             self.collection = self.db['usuarios']
-            print("✅ Conexão com MongoDB estabelecida com sucesso!")
+            if self.ensure_indexes:
+                self._ensure_user_indexes()
+            self._say("✅ Conexão com MongoDB estabelecida com sucesso!")
             return True
         except ConnectionFailure as e:
-            print(f"❌ Erro ao conectar com MongoDB: {e}")
-            print(f"   Verifique se o MongoDB está rodando e acessível")
+            self._fail("Erro ao conectar com MongoDB", e)
+            self._say("   Verifique se o MongoDB está rodando e acessível")
             return False
         except Exception as e:
-            print(f"❌ Erro inesperado: {e}")
+            self._fail("Erro inesperado", e)
             return False
     
+    def _ensure_user_indexes(self):
+        """Cria os índices de usuarios que faltarem (idempotente, uma vez por banco)"""
+        chave = (self.connection_string, self.database_name)
+        if chave in _indices_conferidos:
+            return
+        try:
+            if not self.db.list_collection_names(filter={'name': 'usuarios'}):
+                # create_indexes criaria a coleção; ela é indexada quando existir
+                # (init-mongo.js ou python index_manager.py)
+                return
+            relatorio = index_manager.ensure_indexes(self.db, ['usuarios'])['usuarios']
+            _indices_conferidos.add(chave)
+            if relatorio['criados']:
+                self._say("📚 Índices criados: %s", ', '.join(relatorio['criados']))
+            for erro in relatorio['erros']:
+                logger.warning("Falha ao criar índice %s: %s", erro['indice'], erro['mensagem'],
+                               extra={'colecao': 'usuarios'})
+        except Exception as e:
+            # Sem permissão de createIndex (ex.: usuário só leitura) a conexão segue válida
+            logger.warning("Não foi possível conferir os índices: %s", e,
+                           extra={'colecao': 'usuarios'})
+    
+    def _schema_validator(self):
+        """Validador de usuarios compilado de init-mongo.js (None se desativado ou indisponível)"""
+        if not self.validate_schema:
+            return None
+        try:
+            return validator_for('usuarios')
+        except (OSError, ValueError) as e:
+            # Sem o script o servidor continua validando; o aviso sai uma vez por instância
+            logger.warning("Validação de schema no cliente desativada: %s", e,
+                           extra={'colecao': 'usuarios'})
+            self.validate_schema = False
+            return None
+    
+    def _say(self, mensagem, *args):
+        """Imprime a mensagem apenas no modo demo (formatação adiada até lá)"""
+        if self._demo:
+            print(mensagem % args if args else mensagem)
+    
+    def _fail(self, mensagem, erro):
+        """Registra um erro no logger e, no modo demo, também no terminal"""
+        logger.error("%s: %s", mensagem, erro, extra={
+            'colecao': getattr(self.collection, 'name', None),
+            'erro': type(erro).__name__,
+            # No modo demo a mensagem já sai no terminal abaixo
+            'exibido': self._demo,
+        })
+        marcar_falha(erro)
+        if self._demo:
+            print(f"❌ {mensagem}: {erro}")
+    
     def disconnect(self):
-        """Fecha a conexão com o MongoDB"""
+        """Libera a conexão com o MongoDB (o cliente compartilhado permanece aberto)"""
+        if self.cache_watcher is not None:
+            self.cache_watcher.stop()
+            self.cache_watcher = None
         if self.client:
-            self.client.close()
-            print("🔌 Conexão com MongoDB fechada.")
+            client_registry.release(self.client)
+            self.client = None
+            self.db = None
+            self.collection = None
+            self._repositorios = {}
+            self._say("🔌 Conexão com MongoDB liberada.")
+    
+    def pool_stats(self):
+        """
+        Retorna as estatísticas dos pools de conexão compartilhados
+        
+        Returns:
+            list: Estatísticas por cliente registrado
+        """
+        return client_registry.stats()
+    
+    # Cache de leituras por ID
+    def enable_cache(self, max_itens=10000, ttl_s=60.0, max_bytes=64 * 1024 * 1024,
+                     watch_changes=False, resume_token_path=None, ttl_fallback_s=None):
+        """
+        Ativa o cache em processo de read_user_by_id
+        
+        O cache é invalidado automaticamente por update_user, update_multiple_users,
+        delete_user, delete_users_by_filter e delete_all_users. Com watch_changes,
+        um change stream invalida também as escritas feitas por outros processos;
+        se o servidor não suportar change streams (ex.: standalone), o cache
+        continua valendo apenas pelo TTL (ttl_fallback_s, se informado).
+        
+        Args:
+            max_itens (int): Número máximo de usuários em cache (LRU)
+            ttl_s (float): Tempo de vida de cada entrada, em segundos
+            max_bytes (int): Orçamento de memória do cache
+            watch_changes (bool): Observa o change stream da coleção
+            resume_token_path (str, optional): Arquivo para persistir o resume token
+            ttl_fallback_s (float, optional): TTL usado quando não há change streams
+            
+        Returns:
+            DocumentCache: Cache ativado
+        """
+        self.disable_cache()
+        self.cache = DocumentCache(max_itens=max_itens, ttl_s=ttl_s, max_bytes=max_bytes)
+        if watch_changes:
+            self.cache_watcher = ChangeStreamCacheWatcher(
+                self.collection,
+                self.cache,
+                resume_token_path=resume_token_path,
+                ttl_fallback_s=ttl_fallback_s
+            )
+            modo = self.cache_watcher.start()
+            if modo == 'change_stream':
+                self._say("👀 Cache sincronizado via change stream")
+            elif modo == 'iniciando':
+                # A thread continua tentando abrir o stream; até lá vale o TTL
+                logger.warning("Change stream ainda não aberto: cache apenas com TTL até conectar",
+                               extra={'colecao': self.collection.name})
+                self._say("⚠️ Change stream ainda não aberto: cache com TTL até conectar")
+            else:
+                logger.warning("Change streams indisponíveis: cache apenas com TTL",
+                               extra={'colecao': self.collection.name})
+                self._say("⚠️ Change streams indisponíveis: cache apenas com TTL")
+        return self.cache
+    
+    def disable_cache(self):
+        """Desativa e descarta o cache de leituras"""
+        if self.cache_watcher is not None:
+            self.cache_watcher.stop()
+            self.cache_watcher = None
+        self.cache = None
+    
+    def cache_stats(self):
+        """
+        Retorna os contadores do cache (hits, misses, evictions...)
+        
+        Returns:
+            dict: Estatísticas do cache ou None se desativado
+        """
+        if self.cache is None:
+            return None
+        stats = self.cache.stats()
+        if self.cache_watcher is not None:
+            stats['watcher'] = self.cache_watcher.stats()
+        return stats
+    
+    @contextmanager
+    def _invalidating(self, chaves=(), filtro=None, tudo=False):
+        """Envolve uma escrita, invalidando as entradas de cache afetadas ao final"""
+        if self.cache is None:
+            yield
+            return
+        self.cache.begin_write()
+        afetados = [str(chave) for chave in chaves]
+        try:
+            if filtro is not None and not tudo:
+                afetados.extend(self._cached_ids_matching(filtro))
+            yield
+        finally:
+            self.cache.end_write(afetados, tudo=tudo)
+    
+    def _cached_ids_matching(self, filtro):
+        """IDs em cache que atendem ao filtro (consulta limitada ao tamanho do cache)"""
+        from bson import ObjectId
+        chaves = self.cache.keys()
+        if not chaves:
+            return []
+        consulta = {"$and": [filtro, {"_id": {"$in": [ObjectId(c) for c in chaves]}}]}
+        return [str(doc["_id"]) for doc in self.collection.find(consulta, {"_id": 1})]
+    
+    # Análise de consultas
+    def enable_query_analyzer(self, taxa_amostragem=0.01, limiar_razao=10.0, min_examinados=100):
+        """
+        Ativa a análise por explain() dos filtros de read_users_by_filter,
+        update_multiple_users e delete_users_by_filter
+        
+        Args:
+            taxa_amostragem (float): Fração dos filtros analisados (a primeira
+                ocorrência de cada forma de filtro é sempre analisada)
+            limiar_razao (float): Razão examinados/retornados considerada ruim
+            min_examinados (int): Ignora consultas que examinam poucos documentos
+            
+        Returns:
+            QueryAnalyzer: Analisador ativo (use report() ou print_report())
+        """
+        # Um analisador por instância: o anterior encerra a própria thread
+        if self.query_analyzer is not None:
+            self.query_analyzer.close()
+        self.query_analyzer = QueryAnalyzer(
+            taxa_amostragem=taxa_amostragem,
+            limiar_razao=limiar_razao,
+            min_examinados=min_examinados
+        )
+        return self.query_analyzer
+    
+    # Repositórios por coleção
+    def repository(self, nome):
+        """
+        Repositório de uma coleção sobre o mesmo cliente e banco desta instância
+        
+        As coleções de repository.REPOSITORIOS (usuarios, produtos, posts, vendas)
+        têm filtros e views próprios; qualquer outro nome usa o Repository genérico.
+        O repositório é criado uma vez por conexão e herda a verbosidade, os
+        perfis de desempenho (profile= em cada método, padrão: default_profile)
+        e o analisador de consultas ativos. O de usuarios invalida o cache de
+        read_user_by_id nas escritas e valida os documentos inseridos com o
+        $jsonSchema, como os métodos desta classe.
+        
+        Args:
+            nome (str): Nome da coleção
+            
+        Returns:
+            Repository: Repositório da coleção
+        """
+        if self.db is None:
+            raise RuntimeError("Conecte ao MongoDB antes de pedir um repositório")
+        repositorio = self._repositorios.get(nome)
+        if repositorio is None:
+            classe = REPOSITORIOS.get(nome)
+            opcoes = {'verbosity': self.verbosity, 'profiles': self.profiles,
+                      'default_profile': self.default_profile}
+            if nome == self.collection.name:
+                opcoes.update(invalidar=self._invalidating, validador=self._schema_validator())
+            if classe is not None:
+                repositorio = classe(self.db, **opcoes)
+            else:
+                repositorio = Repository(self.db, nome, **opcoes)
+            self._repositorios[nome] = repositorio
+        repositorio.query_analyzer = self.query_analyzer
+        return repositorio
     
     # CREATE - Inserir documentos
-    def create_user(self, nome, email, idade, cidade=None):
+    @timed('create_user')
+    def create_user(self, nome, email, idade, cidade=None, profile=None):
         """
         Cria um novo usuário no banco de dados
         
@@ -85,6 +372,7 @@ class MongoDBCRUD:
             email (str): Email do usuário
             idade (int): Idade do usuário
             cidade (str, optional): Cidade do usuário
+            profile (str, optional): Perfil de desempenho (ex.: 'critical')
             
         Returns:
             str: ID do documento inserido ou None se houver erro
@@ -94,109 +382,573 @@ class MongoDBCRUD:
                 "nome": nome,
                 "email": email,
                 "idade": idade,
-                "cidade": cidade,
                 "data_criacao": datetime.now(),
                 "ativo": True
             }
+            # O validador exige string em cidade: sem cidade, o campo fica ausente
+            if cidade is not None:
+                documento["cidade"] = cidade
             
-            resultado = self.collection.insert_one(documento)
-            print(f"✅ Usuário criado com sucesso! ID: {resultado.inserted_id}")
+            validador = self._schema_validator()
+            erros = validador.errors(documento) if validador else None
+            if erros:
+                logger.warning("Usuário rejeitado pelo schema: %s", '; '.join(erros),
+                               extra={'operacao': 'create_user'})
+                self._say("❌ Dados inválidos: %s", '; '.join(erros))
+                return None
+            
+            resultado = self._collection_for(profile).insert_one(documento)
+            self._say("✅ Usuário criado com sucesso! ID: %s", resultado.inserted_id)
             return str(resultado.inserted_id)
             
         except DuplicateKeyError:
-            print("❌ Erro: Email já existe no banco de dados")
+            logger.warning("Email já existe no banco de dados", extra={'operacao': 'create_user'})
+            self._say("❌ Erro: Email já existe no banco de dados")
             return None
         except Exception as e:
-            print(f"❌ Erro ao criar usuário: {e}")
+            self._fail("Erro ao criar usuário", e)
             return None
     
-    def create_multiple_users(self, usuarios):
+    @timed('create_multiple_users')
+    def create_multiple_users(self, usuarios, profile=None):
         """
         Cria múltiplos usuários de uma vez
         
+        Usuários que não passam no $jsonSchema são descartados no cliente (e
+        registrados no logger); os demais são inseridos normalmente.
+        
         Args:
             usuarios (list): Lista de dicionários com dados dos usuários
+            profile (str, optional): Perfil de desempenho (ex.: 'bulk_ingest',
+                que também insere sem ordem)
             
         Returns:
             list: Lista de IDs dos documentos inseridos
         """
         try:
+            perfil = self._profile(profile)
             for usuario in usuarios:
                 usuario['data_criacao'] = datetime.now()
                 usuario['ativo'] = True
+            
+            validador = self._schema_validator()
+            if validador:
+                usuarios, invalidos = validador.split(usuarios)
+                for indice, _, erros in invalidos:
+                    logger.warning("Usuário %d rejeitado pelo schema: %s", indice, '; '.join(erros),
+                                   extra={'operacao': 'create_multiple_users'})
+                if invalidos:
+                    self._say("❌ %d usuários inválidos descartados", len(invalidos))
+                if not usuarios:
+                    return []
                 
-            resultado = self.collection.insert_many(usuarios)
-            print(f"✅ {len(resultado.inserted_ids)} usuários criados com sucesso!")
+            ordered = perfil.ordered if perfil and perfil.ordered is not None else True
+            resultado = self._collection_for(profile).insert_many(usuarios, ordered=ordered)
+            self._say("✅ %d usuários criados com sucesso!", len(resultado.inserted_ids))
             return [str(id) for id in resultado.inserted_ids]
             
         except Exception as e:
-            print(f"❌ Erro ao criar usuários: {e}")
+            self._fail("Erro ao criar usuários", e)
             return []
     
+    @timed('bulk_load_users')
+    def bulk_load_users(self, usuarios, batch_size=1000, workers=4, max_erros=1000,
+                        profile='bulk_ingest'):
+        """
+        Carga em massa de usuários a partir de qualquer iterável
+        
+        Os documentos são enviados em lotes paralelos com ordered=False; emails
+        duplicados e rejeições do validador de schema são registrados sem
+        interromper a carga. Com validate_schema, os usuários inválidos são
+        rejeitados no cliente (resumo['rejeitados_cliente']) e nem entram nos
+        lotes. Os dicionários de entrada não são alterados.
+        
+        Args:
+            usuarios: Iterável de dicionários com dados dos usuários
+            batch_size (int): Documentos por lote
+            workers (int): Lotes enviados simultaneamente
+            max_erros (int): Máximo de erros detalhados guardados no resumo
+            profile (str, optional): Perfil de desempenho (padrão: 'bulk_ingest',
+                w=1 sem journal; use None para as opções do driver)
+            
+        Returns:
+            dict: Resumo da carga (inseridos, falhas, erros, docs_por_segundo...)
+        """
+        loader = BulkLoader(
+            self._collection_for(profile),
+            batch_size=batch_size,
+            workers=workers,
+            max_erros=max_erros,
+            preparar=preparar_usuario,
+            validar=getattr(self._schema_validator(), 'errors', None)
+        )
+        resumo = loader.load(usuarios)
+        logger.info("carga em massa concluída", extra={
+            'operacao': 'bulk_load_users',
+            'inseridos': resumo['inseridos'],
+            'falhas': resumo['falhas'],
+            'lotes_falhos': resumo['lotes_falhos'],
+            'docs_por_segundo': round(resumo['docs_por_segundo'], 1),
+        })
+        self._say("✅ %d usuários carregados, %d falhas (%.0f docs/s)",
+                  resumo['inseridos'], resumo['falhas'], resumo['docs_por_segundo'])
+        return resumo
+    
     # READ - Ler documentos
-    def read_all_users(self):
+    def iter_users(self, filtro=None, projecao=None, batch_size=1000,
+                   no_cursor_timeout=False, apos_id=None, limite=None, view=None, raw=False,
+                   modelo=False, profile=None, ordenar_por_id=False, hint=None):
+        """
+        Percorre usuários sob demanda, sem carregar o resultado inteiro na memória
+        
+        Os documentos são lidos em lotes de batch_size, na ordem em que o plano
+        da consulta os encontra (o filtro usa o próprio índice, sem ordenação).
+        Com ordenar_por_id (ou apos_id), a leitura é ordenada por _id, o que
+        permite retomá-la a partir do último _id recebido; nesse modo, se o
+        cursor expirar no servidor (CursorNotFound), ela é reiniciada
+        automaticamente a partir do último _id entregue. Sem ordem não há como
+        retomar, e o CursorNotFound é repassado (use no_cursor_timeout ou
+        ordenar_por_id em leituras longas).
+        
+        Args:
+            filtro (dict, optional): Filtro para busca
+            projecao (dict, optional): Campos a retornar
+            batch_size (int): Quantidade de documentos por lote do cursor
+            no_cursor_timeout (bool): Impede que o servidor expire o cursor ocioso
+            apos_id (str|ObjectId, optional): Retoma a partir deste _id (exclusivo)
+            limite (int, optional): Número máximo de documentos a retornar
+            view (str, optional): Projeção nomeada de VIEWS (alternativa a projecao)
+            raw (bool): Entrega RawBSONDocument, sem decodificar para dict
+            modelo (bool): Decodifica direto em models.Usuario (__slots__, bem
+                menos memória por documento que dict)
+            profile (str, optional): Perfil de desempenho (ex.: 'analytics')
+            ordenar_por_id (bool): Ordena por _id para poder retomar a leitura
+                (ordenação bloqueante ou percurso do índice de _id em vez do
+                índice do filtro)
+            hint (str|list, optional): Índice a usar (nome ou [(campo, direção)])
+            
+        Yields:
+            dict: Documentos de usuários
+        """
+        from bson import ObjectId
+        if limite is not None and limite <= 0:
+            return
+        filtro = dict(filtro or {})
+        projecao = self._resolve_projection(projecao, view)
+        ultimo_id = ObjectId(apos_id) if isinstance(apos_id, str) else apos_id
+        ordenar_por_id = ordenar_por_id or ultimo_id is not None
+        entregues = 0
+        
+        while True:
+            consulta = filtro
+            if ultimo_id is not None:
+                consulta = {"$and": [filtro, {"_id": {"$gt": ultimo_id}}]}
+            
+            cursor = self._collection_for(profile, raw, modelo).find(
+                consulta,
+                projecao,
+                no_cursor_timeout=no_cursor_timeout,
+                batch_size=batch_size
+            )
+            if ordenar_por_id:
+                cursor = cursor.sort("_id", 1)
+            if hint is not None:
+                cursor = cursor.hint(hint)
+            if limite is not None:
+                cursor = cursor.limit(limite - entregues)
+            
+            try:
+                for documento in cursor:
+                    ultimo_id = documento.get("_id", ultimo_id)
+                    entregues += 1
+                    yield documento
+                return
+            except CursorNotFound:
+                # Cursor expirou no servidor: retoma do último _id entregue
+                if limite is not None and entregues >= limite:
+                    return
+                if not ordenar_por_id or (projecao and projecao.get("_id") == 0):
+                    raise
+                continue
+            finally:
+                cursor.close()
+    
+    @timed('read_all_users')
+    def read_all_users(self, limite=None, projecao=None, view=None, raw=False, modelo=False,
+                       profile=None):
         """
         Lê todos os usuários do banco de dados
         
+        Args:
+            limite (int, optional): Número máximo de usuários a retornar
+            projecao (dict, optional): Campos a retornar
+            view (str, optional): Projeção nomeada de VIEWS ('summary', 'full', ...)
+            raw (bool): Retorna RawBSONDocument (ver bson_json.raw_list_to_json)
+            modelo (bool): Retorna models.Usuario em vez de dict
+            profile (str, optional): Perfil de desempenho (ex.: 'analytics')
+            
         Returns:
             list: Lista de todos os usuários
         """
         try:
-            usuarios = list(self.collection.find())
-            print(f"📖 Encontrados {len(usuarios)} usuários")
+            usuarios = list(self.iter_users(limite=limite, projecao=projecao, view=view, raw=raw,
+                                            modelo=modelo, profile=profile))
+            self._say("📖 Encontrados %d usuários", len(usuarios))
             return usuarios
         except Exception as e:
-            print(f"❌ Erro ao ler usuários: {e}")
+            self._fail("Erro ao ler usuários", e)
             return []
     
-    def read_user_by_id(self, user_id):
+    def scan_users_parallel(self, filtro=None, projecao=None, view=None, processos=None,
+                            funcao=None, batch_size=1000):
+        """
+        Lê os usuários em vários processos, cada um com uma faixa de _id
+        
+        Indicado para exportações e análises da coleção inteira, em que a
+        decodificação de BSON num único processo é o gargalo. Não há ordem
+        garantida entre faixas.
+        
+        Args:
+            filtro (dict, optional): Filtro aplicado em todas as faixas
+            projecao (dict, optional): Campos a retornar
+            view (str, optional): Projeção nomeada de VIEWS ('summary', 'full', ...)
+            processos (int, optional): Processos de leitura (padrão: núcleos)
+            funcao (callable, optional): Transformação aplicada nos processos de
+                leitura (função de módulo; retorno None descarta o documento)
+            batch_size (int): Documentos por lote
+        
+        Yields:
+            dict: Usuários (ou resultados de funcao)
+        """
+        from parallel_scan import parallel_scan
+        return parallel_scan(
+            self.connection_string,
+            self.database_name,
+            self.collection.name,
+            processos=processos,
+            filtro=filtro,
+            projecao=self._resolve_projection(projecao, view),
+            funcao=funcao,
+            batch_size=batch_size,
+            opcoes_cliente=self.pool_options
+        )
+    
+    @timed('read_user_by_id')
+    def read_user_by_id(self, user_id, projecao=None, view=None, raw=False, profile=None):
         """
         Lê um usuário específico pelo ID
         
+        O cache (se ativo) guarda apenas documentos completos; leituras com
+        projeção vão direto ao servidor.
+        
         Args:
             user_id (str): ID do usuário
+            projecao (dict, optional): Campos a retornar
+            view (str, optional): Projeção nomeada de VIEWS ('summary', 'full', ...)
+            raw (bool): Retorna RawBSONDocument (o cache devolve os bytes guardados)
+            profile (str, optional): Perfil de desempenho das leituras no servidor
             
         Returns:
             dict: Dados do usuário ou None se não encontrado
         """
         try:
             from bson import ObjectId
-            usuario = self.collection.find_one({"_id": ObjectId(user_id)})
+            projecao = self._resolve_projection(projecao, view)
+            collection = self._collection_for(profile, raw)
+            if projecao is not None:
+                usuario = collection.find_one({"_id": ObjectId(user_id)}, projecao)
+            elif self.cache is not None:
+                usuario, epoca = self.cache.get(str(user_id), raw=raw)
+                if usuario is None:
+                    usuario = collection.find_one({"_id": ObjectId(user_id)})
+                    if usuario is not None:
+                        self.cache.put(str(user_id), usuario, epoca)
+            else:
+                usuario = collection.find_one({"_id": ObjectId(user_id)})
             if usuario:
-                print(f"📖 Usuário encontrado: {usuario['nome']}")
+                self._say("📖 Usuário encontrado: %s", usuario.get('nome'))
             else:
-                print("❌ Usuário não encontrado")
+                self._say("❌ Usuário não encontrado")
             return usuario
         except Exception as e:
-            print(f"❌ Erro ao buscar usuário: {e}")
+            self._fail("Erro ao buscar usuário", e)
             return None
     
-    def read_users_by_filter(self, filtro):
+    @timed('read_users_by_filter')
+    def read_users_by_filter(self, filtro, limite=None, projecao=None, view=None, raw=False,
+                             profile=None):
         """
         Lê usuários com base em um filtro
         
         Args:
             filtro (dict): Filtro para busca
+            limite (int, optional): Número máximo de usuários a retornar
+            projecao (dict, optional): Campos a retornar
+            view (str, optional): Projeção nomeada de VIEWS ('summary', 'full', ...)
+            raw (bool): Retorna RawBSONDocument (ver bson_json.raw_list_to_json)
+            profile (str, optional): Perfil de desempenho (ex.: 'analytics')
             
         Returns:
             list: Lista de usuários que atendem ao filtro
         """
         try:
-            usuarios = list(self.collection.find(filtro))
-            print(f"📖 Encontrados {len(usuarios)} usuários com o filtro aplicado")
+            if self.query_analyzer is not None:
+                self.query_analyzer.observe(self.collection, filtro, 'read_users_by_filter')
+            usuarios = list(self.iter_users(filtro, limite=limite, projecao=projecao, view=view,
+                                            raw=raw, profile=profile))
+            self._say("📖 Encontrados %d usuários com o filtro aplicado", len(usuarios))
             return usuarios
         except Exception as e:
-            print(f"❌ Erro ao buscar usuários: {e}")
+            self._fail("Erro ao buscar usuários", e)
             return []
     
+    @timed('paginate_users')
+    def paginate_users(self, filtro=None, sort_key="_id", page_size=20, after=None,
+                       projecao=None, direcao=1, view=None, raw=False, profile=None):
+        """
+        Pagina usuários por intervalo de chave (keyset), sem usar skip
+        
+        A página seguinte começa logo após a última chave (sort_key, _id) da
+        página anterior, de modo que o custo de cada página independe da sua
+        profundidade. A ordenação é sempre desempatada por _id; use campos
+        obrigatórios e indexados junto com _id (ex.: idade → índice idade_1__id_1).
+        
+        Args:
+            filtro (dict, optional): Filtro para busca
+            sort_key (str): Campo de ordenação ('_id', 'idade', 'nome', ...)
+            page_size (int): Quantidade de usuários por página
+            after (str, optional): Token de continuação retornado pela página anterior
+            projecao (dict, optional): Campos a retornar (sort_key e _id são buscados
+                para o token e retirados se a projeção os excluir)
+            direcao (int): 1 para ordem crescente, -1 para decrescente
+            view (str, optional): Projeção nomeada de VIEWS (alternativa a projecao)
+            raw (bool): Página com RawBSONDocument em vez de dict
+            profile (str, optional): Perfil de desempenho (ex.: 'analytics')
+            
+        Returns:
+            dict: {'usuarios': lista da página, 'proximo': token ou None}
+        """
+        try:
+            consulta, ordenacao = self._consulta_pagina(filtro, sort_key, direcao, after)
+            projecao, remover = self._projecao_pagina(projecao, view, sort_key)
+            
+            # Busca um documento a mais para saber se existe próxima página
+            usuarios = list(
+                self._collection_for(profile, raw).find(consulta, projecao)
+                .sort(ordenacao).limit(page_size + 1)
+            )
+            
+            pagina = self._montar_pagina(usuarios, page_size, sort_key, direcao, remover)
+            self._say("📖 Página com %d usuários", len(pagina["usuarios"]))
+            return pagina
+        except Exception as e:
+            self._fail("Erro ao paginar usuários", e)
+            return {"usuarios": [], "proximo": None}
+    
+    def _consulta_pagina(self, filtro, sort_key, direcao, after):
+        """Filtro e ordenação da página que começa logo após o token after"""
+        filtro = dict(filtro or {})
+        condicoes = [filtro] if filtro else []
+        
+        if after:
+            posicao = self._decode_page_token(after, sort_key, direcao)
+            operador = "$gt" if direcao == 1 else "$lt"
+            if sort_key == "_id":
+                condicoes.append({"_id": {operador: posicao["_id"]}})
+            else:
+                condicoes.append({"$or": [
+                    {sort_key: {operador: posicao["valor"]}},
+                    {sort_key: posicao["valor"], "_id": {operador: posicao["_id"]}}
+                ]})
+        
+        consulta = {"$and": condicoes} if len(condicoes) > 1 else (condicoes[0] if condicoes else {})
+        ordenacao = [("_id", direcao)] if sort_key == "_id" else [(sort_key, direcao), ("_id", direcao)]
+        return consulta, ordenacao
+    
+    def _projecao_pagina(self, projecao, view, sort_key):
+        """
+        Projeção da página, com os campos que o token de continuação precisa,
+        e os campos a retirar dos documentos depois de gerar o token
+        """
+        projecao = self._resolve_projection(projecao, view)
+        if not projecao:
+            return projecao, ()
+        # O token precisa da chave de ordenação e do _id da última linha
+        if any(v for v in projecao.values()):
+            remover = tuple(campo for campo in dict.fromkeys((sort_key, "_id"))
+                            if not projecao.get(campo, campo == "_id"))
+            return {**projecao, sort_key: 1, "_id": 1}, remover
+        remover = tuple(campo for campo in dict.fromkeys((sort_key, "_id")) if campo in projecao)
+        projecao = {campo: v for campo, v in projecao.items() if campo not in remover}
+        return projecao or None, remover
+    
+    def _montar_pagina(self, usuarios, page_size, sort_key, direcao, remover=()):
+        """Corta o documento extra da consulta e gera o token da próxima página"""
+        proximo = None
+        if len(usuarios) > page_size:
+            usuarios = usuarios[:page_size]
+            ultimo = usuarios[-1]
+            proximo = self._encode_page_token(
+                sort_key, direcao, ultimo.get(sort_key), ultimo["_id"]
+            )
+        if remover:
+            usuarios = [self._sem_campos(doc, remover) for doc in usuarios]
+        return {"usuarios": usuarios, "proximo": proximo}
+    
+    @staticmethod
+    def _sem_campos(doc, campos):
+        """Documento sem os campos que só foram buscados para o token"""
+        if isinstance(doc, RawBSONDocument):
+            # RawBSONDocument é imutável: recodifica só os campos pedidos
+            from bson import encode
+            return RawBSONDocument(encode({k: v for k, v in doc.items() if k not in campos}))
+        for campo in campos:
+            doc.pop(campo, None)
+        return doc
+    
+    @staticmethod
+    def _encode_page_token(sort_key, direcao, valor, doc_id):
+        """Gera o token opaco de continuação da paginação"""
+        import base64
+        from bson import json_util
+        conteudo = json_util.dumps({"k": sort_key, "d": direcao, "v": valor, "i": doc_id})
+        return base64.urlsafe_b64encode(conteudo.encode("utf-8")).decode("ascii")
+    
+    @staticmethod
+    def _decode_page_token(token, sort_key, direcao):
+        """Lê o token de continuação e confere se corresponde à ordenação pedida"""
+        import base64
+        from bson import json_util
+        conteudo = json_util.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        if conteudo.get("k") != sort_key or conteudo.get("d") != direcao:
+            raise ValueError("Token de paginação não corresponde à ordenação solicitada")
+        return {"valor": conteudo.get("v"), "_id": conteudo["i"]}
+    
+    @timed('read_covered')
+    def read_covered(self, campo, filtro=None, limite=None, verificar=False):
+        """
+        Lê apenas os valores de um campo indexado, sem buscar os documentos
+        
+        A consulta filtra e projeta somente `campo` (sem _id) e força o índice
+        simples do campo, de modo que o servidor responde só com o índice
+        (totalDocsExamined = 0 no explain). Sem filtro, a condição padrão é
+        {campo: {"$gte": MinKey()}}, uma faixa que cobre todo o índice; $exists
+        não serve, porque exige buscar o documento (FETCH). Documentos sem o
+        campo aparecem como None (o índice guarda null para eles).
+        
+        Args:
+            campo (str): Um dos COVERED_FIELDS ('email', 'nome', 'idade', 'cidade')
+            filtro (dict, optional): Condição sobre o próprio campo (ex.: {"idade": {"$gt": 30}})
+            limite (int, optional): Número máximo de valores a retornar
+            verificar (bool): Confere com explain() se a consulta é coberta
+                (ver covered_stats) e registra um aviso se não for
+            
+        Returns:
+            list: Valores do campo
+        """
+        try:
+            if verificar:
+                stats = self.covered_stats(campo, filtro)
+                if not stats["coberta"]:
+                    logger.warning("Consulta sobre '%s' não é coberta pelo índice: %d documentos "
+                                   "examinados", campo, stats["docs_examinados"],
+                                   extra={'colecao': self.collection.name})
+            cursor = self._consulta_coberta(campo, filtro)
+            if limite:
+                cursor = cursor.limit(limite)
+            valores = [doc.get(campo) for doc in cursor]
+            self._say("📖 %d valores de '%s' lidos do índice", len(valores), campo)
+            return valores
+        except Exception as e:
+            self._fail("Erro na consulta coberta", e)
+            return []
+    
+    def covered_stats(self, campo, filtro=None):
+        """
+        Executa explain() da consulta de read_covered
+        
+        Returns:
+            dict: coberta (totalDocsExamined == 0), docs_examinados,
+                chaves_examinadas e retornados
+        """
+        explicacao = self._consulta_coberta(campo, filtro).explain()
+        stats = explicacao.get("executionStats", {})
+        documentos = stats.get("totalDocsExamined", 0)
+        return {
+            "coberta": documentos == 0,
+            "docs_examinados": documentos,
+            "chaves_examinadas": stats.get("totalKeysExamined", 0),
+            "retornados": stats.get("nReturned", 0),
+        }
+    
+    def _consulta_coberta(self, campo, filtro=None):
+        """Cursor que filtra e projeta só `campo`, usando o índice simples dele"""
+        from bson.min_key import MinKey
+        if campo not in self.COVERED_FIELDS:
+            raise ValueError(f"Campo sem índice simples: {campo}")
+        filtro = dict(filtro or {})
+        if set(filtro) - {campo}:
+            raise ValueError(f"O filtro de uma consulta coberta só pode usar '{campo}'")
+        if campo not in filtro:
+            # Sem condição sobre o campo o planejador não usaria o índice
+            filtro[campo] = {"$gte": MinKey()}
+        return self.collection.find(filtro, {campo: 1, "_id": 0}).hint([(campo, 1)])
+    
+    def _resolve_projection(self, projecao=None, view=None):
+        """Resolve a projeção a partir de um dicionário explícito ou de uma view nomeada"""
+        if view is not None:
+            if projecao is not None:
+                raise ValueError("Informe projecao ou view, não ambos")
+            if view not in self.VIEWS:
+                raise ValueError(f"View desconhecida: {view} (use {', '.join(self.VIEWS)})")
+            projecao = self.VIEWS[view]
+        return dict(projecao) if projecao is not None else None
+    
+    def _profile(self, nome=None):
+        """Perfil de desempenho pedido na chamada (ou o padrão da instância); None = driver"""
+        nome = nome or self.default_profile
+        if nome is None:
+            return None
+        perfil = self.profiles.get(nome)
+        if perfil is None:
+            raise ValueError(f"Perfil desconhecido: {nome} (use {', '.join(self.profiles)})")
+        return perfil
+    
+    def _collection_for(self, profile=None, raw=False, modelo=False):
+        """
+        Coleção atual com as opções de um perfil e/ou decodificando em
+        RawBSONDocument ou Usuario; cada combinação é criada uma vez por coleção
+        """
+        perfil = self._profile(profile)
+        if perfil is None and not raw and not modelo:
+            return self.collection
+        if raw and modelo:
+            raise ValueError("Informe raw ou modelo, não ambos")
+        if self._handles[0] is not self.collection:
+            self._handles = (self.collection, {})
+        chave = (perfil.nome if perfil else None, raw, modelo)
+        collection = self._handles[1].get(chave)
+        if collection is None:
+            collection = perfil.apply(self.collection) if perfil else self.collection
+            if raw:
+                opcoes = collection.codec_options.with_options(document_class=RawBSONDocument)
+                collection = collection.with_options(codec_options=opcoes)
+            elif modelo:
+                opcoes = opcoes_do_modelo(Usuario, collection.codec_options)
+                collection = collection.with_options(codec_options=opcoes)
+            self._handles[1][chave] = collection
+        return collection
+    
     # UPDATE - Atualizar documentos
-    def update_user(self, user_id, novos_dados):
+    @timed('update_user')
+    def update_user(self, user_id, novos_dados, profile=None):
         """
         Atualiza um usuário específico
         
         Args:
             user_id (str): ID do usuário
             novos_dados (dict): Novos dados para atualização
+            profile (str, optional): Perfil de desempenho (ex.: 'critical')
             
         Returns:
             bool: True se atualizado com sucesso, False caso contrário
@@ -205,123 +957,180 @@ class MongoDBCRUD:
             from bson import ObjectId
             novos_dados['data_atualizacao'] = datetime.now()
             
-            resultado = self.collection.update_one(
-                {"_id": ObjectId(user_id)},
-                {"$set": novos_dados}
-            )
+            with self._invalidating(chaves=[user_id]):
+                resultado = self._collection_for(profile).update_one(
+                    {"_id": ObjectId(user_id)},
+                    {"$set": novos_dados}
+                )
             
             if resultado.modified_count > 0:
-                print(f"✅ Usuário atualizado com sucesso!")
+                self._say("✅ Usuário atualizado com sucesso!")
                 return True
             else:
-                print("❌ Nenhum usuário foi atualizado")
+                self._say("❌ Nenhum usuário foi atualizado")
                 return False
                 
         except Exception as e:
-            print(f"❌ Erro ao atualizar usuário: {e}")
+            self._fail("Erro ao atualizar usuário", e)
             return False
     
-    def update_multiple_users(self, filtro, novos_dados):
+    @timed('update_multiple_users')
+    def update_multiple_users(self, filtro, novos_dados, profile=None):
         """
         Atualiza múltiplos usuários com base em um filtro
         
         Args:
             filtro (dict): Filtro para seleção dos usuários
             novos_dados (dict): Novos dados para atualização
+            profile (str, optional): Perfil de desempenho
             
         Returns:
             int: Número de documentos atualizados
         """
         try:
             novos_dados['data_atualizacao'] = datetime.now()
+            if self.query_analyzer is not None:
+                self.query_analyzer.observe(self.collection, filtro, 'update_multiple_users')
             
-            resultado = self.collection.update_many(
-                filtro,
-                {"$set": novos_dados}
-            )
+            with self._invalidating(filtro=filtro):
+                resultado = self._collection_for(profile).update_many(
+                    filtro,
+                    {"$set": novos_dados}
+                )
             
-            print(f"✅ {resultado.modified_count} usuários atualizados")
+            self._say("✅ %d usuários atualizados", resultado.modified_count)
             return resultado.modified_count
             
         except Exception as e:
-            print(f"❌ Erro ao atualizar usuários: {e}")
+            self._fail("Erro ao atualizar usuários", e)
             return 0
     
     # DELETE - Deletar documentos
-    def delete_user(self, user_id):
+    @timed('delete_user')
+    def delete_user(self, user_id, profile=None):
         """
         Deleta um usuário específico
         
         Args:
             user_id (str): ID do usuário
+            profile (str, optional): Perfil de desempenho (ex.: 'critical')
             
         Returns:
             bool: True se deletado com sucesso, False caso contrário
         """
         try:
             from bson import ObjectId
-            resultado = self.collection.delete_one({"_id": ObjectId(user_id)})
+            with self._invalidating(chaves=[user_id]):
+                resultado = self._collection_for(profile).delete_one({"_id": ObjectId(user_id)})
             
             if resultado.deleted_count > 0:
-                print(f"✅ Usuário deletado com sucesso!")
+                self._say("✅ Usuário deletado com sucesso!")
                 return True
             else:
-                print("❌ Nenhum usuário foi deletado")
+                self._say("❌ Nenhum usuário foi deletado")
                 return False
                 
         except Exception as e:
-            print(f"❌ Erro ao deletar usuário: {e}")
+            self._fail("Erro ao deletar usuário", e)
             return False
     
-    def delete_users_by_filter(self, filtro):
+    @timed('delete_users_by_filter')
+    def delete_users_by_filter(self, filtro, profile=None):
         """
         Deleta múltiplos usuários com base em um filtro
         
         Args:
             filtro (dict): Filtro para seleção dos usuários
+            profile (str, optional): Perfil de desempenho
             
         Returns:
             int: Número de documentos deletados
         """
         try:
-            resultado = self.collection.delete_many(filtro)
-            print(f"✅ {resultado.deleted_count} usuários deletados")
+            if self.query_analyzer is not None:
+                self.query_analyzer.observe(self.collection, filtro, 'delete_users_by_filter')
+            with self._invalidating(filtro=filtro):
+                resultado = self._collection_for(profile).delete_many(filtro)
+            self._say("✅ %d usuários deletados", resultado.deleted_count)
             return resultado.deleted_count
             
         except Exception as e:
-            print(f"❌ Erro ao deletar usuários: {e}")
+            self._fail("Erro ao deletar usuários", e)
             return 0
     
-    def delete_all_users(self):
+    @timed('delete_all_users')
+    def delete_all_users(self, profile=None):
         """
         Deleta todos os usuários (usar com cuidado!)
         
+        Args:
+            profile (str, optional): Perfil de desempenho
+        
         Returns:
             int: Número de documentos deletados
         """
         try:
-            resultado = self.collection.delete_many({})
-            print(f"✅ Todos os {resultado.deleted_count} usuários foram deletados")
+            with self._invalidating(tudo=True):
+                resultado = self._collection_for(profile).delete_many({})
+            self._say("✅ Todos os %d usuários foram deletados", resultado.deleted_count)
             return resultado.deleted_count
             
         except Exception as e:
-            print(f"❌ Erro ao deletar todos os usuários: {e}")
+            self._fail("Erro ao deletar todos os usuários", e)
             return 0
     
+    # Escritas em lote
+    def batch(self, max_ops=1000, max_intervalo_s=1.0, ordered=None, profile=None):
+        """
+        Cria um lote de escritas mistas enviado via bulk_write
+        
+        Uso:
+            with crud.batch() as b:
+                b.update(user_id, {"idade": 31})
+                b.delete(outro_id)
+                b.upsert_by_email("ana@email.com", {"nome": "Ana"})
+            print(b.resultado)
+        
+        Args:
+            max_ops (int): Envia o lote ao atingir este número de operações
+            max_intervalo_s (float): Tempo máximo que uma operação espera no lote
+            ordered (bool, optional): Executa em ordem, parando no primeiro erro
+                (padrão: o do perfil, ou False)
+            profile (str, optional): Perfil de desempenho das escritas do lote
+                (ex.: crud.batch(profile='bulk_ingest'))
+            
+        Returns:
+            WriteBatch: Lote associado à coleção atual
+        """
+        perfil = self._profile(profile)
+        if ordered is None:
+            ordered = perfil.ordered if perfil and perfil.ordered is not None else False
+        return WriteBatch(
+            self._collection_for(profile),
+            max_ops=max_ops,
+            max_intervalo_s=max_intervalo_s,
+            ordered=ordered,
+            invalidar=self._invalidating
+        )
+    
     # Métodos auxiliares
-    def count_users(self):
+    @timed('count_users')
+    def count_users(self, profile=None):
         """
         Conta o número total de usuários
         
+        Args:
+            profile (str, optional): Perfil de desempenho (ex.: 'analytics')
+        
         Returns:
             int: Número de usuários
         """
         try:
-            count = self.collection.count_documents({})
-            print(f"📊 Total de usuários: {count}")
+            count = self._collection_for(profile).count_documents({})
+            self._say("📊 Total de usuários: %d", count)
             return count
         except Exception as e:
-            print(f"❌ Erro ao contar usuários: {e}")
+            self._fail("Erro ao contar usuários", e)
             return 0
     
     def print_users(self, usuarios):
@@ -334,23 +1143,21 @@ class MongoDBCRUD:
         if not usuarios:
             print("📝 Nenhum usuário para exibir")
             return
-            
-        print("\n" + "="*80)
-        print("📋 LISTA DE USUÁRIOS")
-        print("="*80)
         
+        # Monta o texto inteiro e escreve de uma vez (uma única escrita no stdout)
+        linhas = ["\n" + "="*80, "📋 LISTA DE USUÁRIOS", "="*80]
         for i, usuario in enumerate(usuarios, 1):
-            print(f"\n{i}. ID: {usuario.get('_id')}")
-            print(f"   Nome: {usuario.get('nome')}")
-            print(f"   Email: {usuario.get('email')}")
-            print(f"   Idade: {usuario.get('idade')}")
-            print(f"   Cidade: {usuario.get('cidade', 'Não informado')}")
-            print(f"   Ativo: {usuario.get('ativo', True)}")
-            print(f"   Criado em: {usuario.get('data_criacao', 'N/A')}")
+            linhas.append(f"\n{i}. ID: {usuario.get('_id')}")
+            linhas.append(f"   Nome: {usuario.get('nome')}")
+            linhas.append(f"   Email: {usuario.get('email')}")
+            linhas.append(f"   Idade: {usuario.get('idade')}")
+            linhas.append(f"   Cidade: {usuario.get('cidade', 'Não informado')}")
+            linhas.append(f"   Ativo: {usuario.get('ativo', True)}")
+            linhas.append(f"   Criado em: {usuario.get('data_criacao', 'N/A')}")
             if 'data_atualizacao' in usuario:
-                print(f"   Atualizado em: {usuario.get('data_atualizacao')}")
-        
-        print("\n" + "="*80)
+                linhas.append(f"   Atualizado em: {usuario.get('data_atualizacao')}")
+        linhas.append("\n" + "="*80)
+        print("\n".join(linhas))
 
 
 def demonstrar_crud():
@@ -360,8 +1167,8 @@ def demonstrar_crud():
     print("🚀 Iniciando demonstração das operações CRUD no MongoDB")
     print("="*60)
     
-    # Inicializar conexão
-    crud = MongoDBCRUD()
+    # Inicializar conexão (modo demo: mensagens a cada operação)
+    crud = MongoDBCRUD(verbosity='demo')
     
     if not crud.connect():
         print("❌ Não foi possível conectar ao MongoDB. Verifique se o serviço está rodando.")
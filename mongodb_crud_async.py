@@ -0,0 +1,538 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MongoDB CRUD Operations (asyncio)
+Versão assíncrona de MongoDBCRUD usando o driver Motor, para servir muitas
+consultas concorrentes no mesmo event loop sem uma thread por requisição.
+
+Os clientes seguem a mesma política do registro síncrono (client_pool.py): um
+cliente por conexão e opções, compartilhado pelas instâncias, que continua
+aberto quando a última instância se desconecta (o pool fica pronto para a
+próxima). Ele é fechado por close_clients() ou quando o event loop é descartado.
+"""
+
+import asyncio
+import os
+import weakref
+from datetime import datetime
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import ConnectionFailure, DuplicateKeyError
+from config import MongoConfig, validate_driver_options
+from crud_logging import VERBOSIDADES, logger, marcar_falha
+from mongodb_crud import MongoDBCRUD
+from schema_validator import validator_for
+
+
+# Clientes Motor compartilhados por event loop: {loop: {(conexão, opções): [cliente,
+# referências]}}. A chave fraca impede que um loop novo herde (pelo id reaproveitado)
+# o cliente de um loop já descartado
+_clientes = weakref.WeakKeyDictionary()
+
+
+def _fechar_clientes(por_loop):
+    # Loop coletado sem disconnect(): fecha os clientes que ficaram nele
+    for client, _ in por_loop.values():
+        client.close()
+    por_loop.clear()
+
+
+def _get_client(connection_string, opcoes):
+    """Obtém (ou cria) o cliente do loop atual e conta mais uma referência"""
+    loop = asyncio.get_running_loop()
+    por_loop = _clientes.get(loop)
+    if por_loop is None:
+        por_loop = _clientes[loop] = {}
+        weakref.finalize(loop, _fechar_clientes, por_loop)
+    chave = (connection_string, tuple(sorted(
+        (nome, tuple(valor) if isinstance(valor, list) else valor) for nome, valor in opcoes.items()
+    )))
+    entrada = por_loop.get(chave)
+    if entrada is None:
+        client = AsyncIOMotorClient(
+            connection_string,
+            **{'serverSelectionTimeoutMS': 5000, **opcoes}
+        )
+        entrada = por_loop[chave] = [client, 0]
+    entrada[1] += 1
+    return entrada[0]
+
+
+def _release_client(client):
+    """Devolve uma referência sem fechar o cliente (como ClientRegistry.release)"""
+    for por_loop in list(_clientes.values()):
+        for entrada in por_loop.values():
+            if entrada[0] is client and entrada[1] > 0:
+                entrada[1] -= 1
+                return
+
+
+def close_clients():
+    """Fecha os clientes do event loop atual (ex.: no encerramento da aplicação)"""
+    por_loop = _clientes.get(asyncio.get_running_loop())
+    if por_loop:
+        _fechar_clientes(por_loop)
+
+
+def pool_refs():
+    """Referências ativas por cliente do event loop atual ({(conexão, opções): n})"""
+    por_loop = _clientes.get(asyncio.get_running_loop(), {})
+    return {chave: entrada[1] for chave, entrada in por_loop.items()}
+
+
+class AsyncMongoDBCRUD:
+    """
+    Classe para realizar operações CRUD assíncronas no MongoDB
+
+    Espelha o CRUD de usuarios de MongoDBCRUD, com as mesmas views, projeções
+    e tokens de paginação (paginate_users). Ficam só na versão síncrona, por
+    dependerem de threads, processos ou de handles do pymongo: repository(),
+    batch(), bulk_load_users(), scan_users_parallel(), o cache (enable_cache) e
+    o analisador de consultas, read_covered()/covered_stats(), as leituras com
+    raw/modelo e os perfis de desempenho (profile=).
+    """
+
+    # Projeções nomeadas e paginação compartilhadas com MongoDBCRUD
+    VIEWS = MongoDBCRUD.VIEWS
+    _resolve_projection = MongoDBCRUD._resolve_projection
+    _consulta_pagina = MongoDBCRUD._consulta_pagina
+    _projecao_pagina = MongoDBCRUD._projecao_pagina
+    _montar_pagina = MongoDBCRUD._montar_pagina
+    _encode_page_token = staticmethod(MongoDBCRUD._encode_page_token)
+    _decode_page_token = staticmethod(MongoDBCRUD._decode_page_token)
+    _sem_campos = staticmethod(MongoDBCRUD._sem_campos)
+
+    def __init__(self, connection_string=None, database_name=None, environment=None,
+                 pool_options=None, verbosity=None, validate_schema=True):
+        """
+        Inicializa a configuração de conexão com o MongoDB
+
+        Args:
+            connection_string (str, optional): String de conexão do MongoDB
+            database_name (str, optional): Nome do banco de dados
+            environment (str, optional): Ambiente específico ('local', 'docker_host', 'docker_container', 'atlas')
+            pool_options (dict, optional): Opções do pool (maxPoolSize, minPoolSize, ...) e
+                ajustes do driver (compressors, timeouts), sobre os do ambiente e do .env
+            verbosity (str, optional): 'quiet' (padrão) ou 'demo'; padrão lido de CRUD_VERBOSITY
+            validate_schema (bool): Valida os usuários no cliente com o $jsonSchema
+                de init-mongo.js antes de enviá-los
+        """
+        if connection_string is None or database_name is None:
+            if environment:
+                config = MongoConfig.get_config(environment)
+            else:
+                config = MongoConfig.auto_detect_environment()
+
+            self.connection_string = connection_string or config['connection_string']
+            self.database_name = database_name or config['database_name']
+            self.environment_description = config['description']
+            ajustes = MongoConfig.get_driver_options(config=config)
+        else:
+            self.connection_string = connection_string
+            self.database_name = database_name
+            self.environment_description = "Configuração personalizada"
+            ajustes = MongoConfig.get_driver_options(config={})
+        # Ajustes do ambiente/.env, sobrescritos pelas opções passadas aqui
+        self.pool_options = validate_driver_options({**ajustes, **(pool_options or {})})
+        self.validate_schema = validate_schema
+        self.verbosity = verbosity or os.getenv('CRUD_VERBOSITY', 'quiet')
+        if self.verbosity not in VERBOSIDADES:
+            raise ValueError(f"Verbosidade inválida: {self.verbosity} (use {', '.join(VERBOSIDADES)})")
+        self._demo = self.verbosity == 'demo'
+        self.client = None
+        self.db = None
+        self.collection = None
+
+    async def connect(self):
+        """Estabelece conexão com o MongoDB"""
+        try:
+            self._say("🔌 Conectando ao MongoDB (async)...")
+            self._say("   Ambiente: %s", self.environment_description)
+            self._say("   Database: %s", self.database_name)
+
+            self.client = _get_client(self.connection_string, self.pool_options)
+            try:
+                await self.client.admin.command('ping')
+            except Exception:
+                _release_client(self.client)
+                self.client = None
+                raise
+            self.db = self.client[self.database_name]
+            self.collection = self.db['usuarios']
+            self._say("✅ Conexão com MongoDB estabelecida com sucesso!")
+            return True
+        except ConnectionFailure as e:
+            self._fail("Erro ao conectar com MongoDB", e)
+            self._say("   Verifique se o MongoDB está rodando e acessível")
+            return False
+        except Exception as e:
+            self._fail("Erro inesperado", e)
+            return False
+
+    def _schema_validator(self):
+        """Validador de usuarios compilado de init-mongo.js (None se desativado ou indisponível)"""
+        if not self.validate_schema:
+            return None
+        try:
+            return validator_for('usuarios')
+        except (OSError, ValueError) as e:
+            logger.warning("Validação de schema no cliente desativada: %s", e,
+                           extra={'colecao': 'usuarios'})
+            self.validate_schema = False
+            return None
+
+    def _say(self, mensagem, *args):
+        """Imprime a mensagem apenas no modo demo (formatação adiada até lá)"""
+        if self._demo:
+            print(mensagem % args if args else mensagem)
+
+    def _fail(self, mensagem, erro):
+        """Registra um erro no logger e, no modo demo, também no terminal"""
+        logger.error("%s: %s", mensagem, erro, extra={
+            'colecao': getattr(self.collection, 'name', None),
+            'erro': type(erro).__name__,
+            # No modo demo a mensagem já sai no terminal abaixo
+            'exibido': self._demo,
+        })
+        marcar_falha(erro)
+        if self._demo:
+            print(f"❌ {mensagem}: {erro}")
+
+    async def disconnect(self):
+        """
+        Libera a conexão com o MongoDB
+
+        O cliente do event loop é compartilhado pelas instâncias conectadas nele
+        e continua aberto para as próximas; close_clients() o fecha.
+        """
+        if self.client:
+            _release_client(self.client)
+            self.client = None
+            self.db = None
+            self.collection = None
+            self._say("🔌 Conexão com MongoDB liberada.")
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.disconnect()
+        return False
+
+    # CREATE - Inserir documentos
+    async def create_user(self, nome, email, idade, cidade=None):
+        """
+        Cria um novo usuário no banco de dados
+
+        Returns:
+            str: ID do documento inserido ou None se houver erro
+        """
+        try:
+            documento = {
+                "nome": nome,
+                "email": email,
+                "idade": idade,
+                "data_criacao": datetime.now(),
+                "ativo": True
+            }
+            if cidade is not None:
+                documento["cidade"] = cidade
+
+            validador = self._schema_validator()
+            erros = validador.errors(documento) if validador else None
+            if erros:
+                logger.warning("Usuário rejeitado pelo schema: %s", '; '.join(erros),
+                               extra={'operacao': 'create_user'})
+                self._say("❌ Dados inválidos: %s", '; '.join(erros))
+                return None
+
+            resultado = await self.collection.insert_one(documento)
+            self._say("✅ Usuário criado com sucesso! ID: %s", resultado.inserted_id)
+            return str(resultado.inserted_id)
+
+        except DuplicateKeyError:
+            logger.warning("Email já existe no banco de dados", extra={'operacao': 'create_user'})
+            self._say("❌ Erro: Email já existe no banco de dados")
+            return None
+        except Exception as e:
+            self._fail("Erro ao criar usuário", e)
+            return None
+
+    async def create_multiple_users(self, usuarios):
+        """
+        Cria múltiplos usuários de uma vez (inválidos pelo $jsonSchema são descartados)
+
+        Returns:
+            list: Lista de IDs dos documentos inseridos
+        """
+        try:
+            documentos = [
+                {**usuario, 'data_criacao': datetime.now(), 'ativo': True}
+                for usuario in usuarios
+            ]
+            validador = self._schema_validator()
+            if validador:
+                documentos, invalidos = validador.split(documentos)
+                for indice, _, erros in invalidos:
+                    logger.warning("Usuário %d rejeitado pelo schema: %s", indice, '; '.join(erros),
+                                   extra={'operacao': 'create_multiple_users'})
+                if invalidos:
+                    self._say("❌ %d usuários inválidos descartados", len(invalidos))
+                if not documentos:
+                    return []
+            resultado = await self.collection.insert_many(documentos)
+            self._say("✅ %s usuários criados com sucesso!", len(resultado.inserted_ids))
+            return [str(id) for id in resultado.inserted_ids]
+
+        except Exception as e:
+            self._fail("Erro ao criar usuários", e)
+            return []
+
+    # READ - Ler documentos
+    async def iter_users(self, filtro=None, projecao=None, batch_size=1000, limite=None,
+                         view=None):
+        """
+        Percorre usuários sob demanda (async for), em lotes de batch_size
+
+        Args:
+            view (str, optional): Projeção nomeada de VIEWS (alternativa a projecao)
+
+        Yields:
+            dict: Documentos de usuários
+        """
+        if limite is not None and limite <= 0:
+            return
+        projecao = self._resolve_projection(projecao, view)
+        cursor = self.collection.find(filtro or {}, projecao, batch_size=batch_size)
+        if limite is not None:
+            cursor = cursor.limit(limite)
+        try:
+            async for documento in cursor:
+                yield documento
+        finally:
+            await cursor.close()
+
+    async def read_all_users(self, limite=None, projecao=None, view=None):
+        """
+        Lê todos os usuários do banco de dados
+
+        Returns:
+            list: Lista de todos os usuários
+        """
+        try:
+            usuarios = [u async for u in self.iter_users(limite=limite, projecao=projecao,
+                                                         view=view)]
+            self._say("📖 Encontrados %s usuários", len(usuarios))
+            return usuarios
+        except Exception as e:
+            self._fail("Erro ao ler usuários", e)
+            return []
+
+    async def read_user_by_id(self, user_id, projecao=None, view=None):
+        """
+        Lê um usuário específico pelo ID
+
+        Returns:
+            dict: Dados do usuário ou None se não encontrado
+        """
+        try:
+            usuario = await self.collection.find_one({"_id": ObjectId(user_id)},
+                                                     self._resolve_projection(projecao, view))
+            if usuario:
+                self._say("📖 Usuário encontrado: %s", usuario.get('nome'))
+            else:
+                self._say("❌ Usuário não encontrado")
+            return usuario
+        except Exception as e:
+            self._fail("Erro ao buscar usuário", e)
+            return None
+
+    async def read_users_by_ids(self, user_ids, projecao=None, view=None):
+        """
+        Busca vários usuários em paralelo com asyncio.gather
+
+        Args:
+            user_ids (list): IDs dos usuários
+
+        Returns:
+            list: Usuários na mesma ordem dos IDs (None para os não encontrados)
+        """
+        return list(await asyncio.gather(*(self.read_user_by_id(i, projecao, view)
+                                           for i in user_ids)))
+
+    async def read_users_by_filter(self, filtro, limite=None, projecao=None, view=None):
+        """
+        Lê usuários com base em um filtro
+
+        Returns:
+            list: Lista de usuários que atendem ao filtro
+        """
+        try:
+            usuarios = [u async for u in self.iter_users(filtro, limite=limite, projecao=projecao,
+                                                         view=view)]
+            self._say("📖 Encontrados %s usuários com o filtro aplicado", len(usuarios))
+            return usuarios
+        except Exception as e:
+            self._fail("Erro ao buscar usuários", e)
+            return []
+
+    async def paginate_users(self, filtro=None, sort_key="_id", page_size=20, after=None,
+                             projecao=None, direcao=1, view=None):
+        """
+        Pagina usuários por intervalo de chave (keyset), sem usar skip
+
+        Mesma consulta e mesmos tokens de MongoDBCRUD.paginate_users: um token
+        gerado por uma versão continua a paginação na outra.
+
+        Returns:
+            dict: {'usuarios': lista da página, 'proximo': token ou None}
+        """
+        try:
+            consulta, ordenacao = self._consulta_pagina(filtro, sort_key, direcao, after)
+            projecao, remover = self._projecao_pagina(projecao, view, sort_key)
+            cursor = self.collection.find(consulta, projecao).sort(ordenacao).limit(page_size + 1)
+            pagina = self._montar_pagina(await cursor.to_list(length=None), page_size,
+                                         sort_key, direcao, remover)
+            self._say("📖 Página com %d usuários", len(pagina["usuarios"]))
+            return pagina
+        except Exception as e:
+            self._fail("Erro ao paginar usuários", e)
+            return {"usuarios": [], "proximo": None}
+
+    # UPDATE - Atualizar documentos
+    async def update_user(self, user_id, novos_dados):
+        """
+        Atualiza um usuário específico
+
+        Returns:
+            bool: True se atualizado com sucesso, False caso contrário
+        """
+        try:
+            novos_dados = {**novos_dados, 'data_atualizacao': datetime.now()}
+            resultado = await self.collection.update_one(
+                {"_id": ObjectId(user_id)},
+                {"$set": novos_dados}
+            )
+
+            if resultado.modified_count > 0:
+                self._say("✅ Usuário atualizado com sucesso!")
+                return True
+            else:
+                self._say("❌ Nenhum usuário foi atualizado")
+                return False
+
+        except Exception as e:
+            self._fail("Erro ao atualizar usuário", e)
+            return False
+
+    async def update_multiple_users(self, filtro, novos_dados):
+        """
+        Atualiza múltiplos usuários com base em um filtro
+
+        Returns:
+            int: Número de documentos atualizados
+        """
+        try:
+            novos_dados = {**novos_dados, 'data_atualizacao': datetime.now()}
+            resultado = await self.collection.update_many(filtro, {"$set": novos_dados})
+            self._say("✅ %s usuários atualizados", resultado.modified_count)
+            return resultado.modified_count
+
+        except Exception as e:
+            self._fail("Erro ao atualizar usuários", e)
+            return 0
+
+    # DELETE - Deletar documentos
+    async def delete_user(self, user_id):
+        """
+        Deleta um usuário específico
+
+        Returns:
+            bool: True se deletado com sucesso, False caso contrário
+        """
+        try:
+            resultado = await self.collection.delete_one({"_id": ObjectId(user_id)})
+
+            if resultado.deleted_count > 0:
+                self._say("✅ Usuário deletado com sucesso!")
+                return True
+            else:
+                self._say("❌ Nenhum usuário foi deletado")
+                return False
+
+        except Exception as e:
+            self._fail("Erro ao deletar usuário", e)
+            return False
+
+    async def delete_users_by_filter(self, filtro):
+        """
+        Deleta múltiplos usuários com base em um filtro
+
+        Returns:
+            int: Número de documentos deletados
+        """
+        try:
+            resultado = await self.collection.delete_many(filtro)
+            self._say("✅ %s usuários deletados", resultado.deleted_count)
+            return resultado.deleted_count
+
+        except Exception as e:
+            self._fail("Erro ao deletar usuários", e)
+            return 0
+
+    async def delete_all_users(self):
+        """
+        Deleta todos os usuários (usar com cuidado!)
+
+        Returns:
+            int: Número de documentos deletados
+        """
+        try:
+            resultado = await self.collection.delete_many({})
+            self._say("✅ Todos os %s usuários foram deletados", resultado.deleted_count)
+            return resultado.deleted_count
+
+        except Exception as e:
+            self._fail("Erro ao deletar todos os usuários", e)
+            return 0
+
+    # Métodos auxiliares
+    async def count_users(self, filtro=None):
+        """
+        Conta o número de usuários
+
+        Returns:
+            int: Número de usuários
+        """
+        try:
+            count = await self.collection.count_documents(filtro or {})
+            self._say("📊 Total de usuários: %s", count)
+            return count
+        except Exception as e:
+            self._fail("Erro ao contar usuários", e)
+            return 0
+
+
+async def demonstrar_crud_async():
+    """
+    Demonstra consultas independentes executadas em paralelo com asyncio.gather
+    """
+    crud = AsyncMongoDBCRUD(verbosity='demo')
+    if not await crud.connect():
+        print("❌ Não foi possível conectar ao MongoDB. Verifique se o serviço está rodando.")
+        return
+
+    try:
+        total, jovens, sp = await asyncio.gather(
+            crud.count_users(),
+            crud.read_users_by_filter({"idade": {"$lt": 30}}),
+            crud.read_users_by_filter({"cidade": "São Paulo"}),
+        )
+        print(f"📊 {total} usuários, {len(jovens)} com menos de 30 anos, {len(sp)} em São Paulo")
+    finally:
+        await crud.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(demonstrar_crud_async())
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Varredura paralela de coleções em vários processos
+Este módulo divide uma coleção em faixas de _id (a partir de uma amostra com
+$sample ou de $bucketAuto) e lê cada faixa num processo separado, com o próprio
+MongoClient. Assim a decodificação de BSON, que num único processo satura um
+núcleo, passa a usar todos.
+
+Os documentos voltam ao processo principal por uma fila (parallel_scan) ou são
+gravados em um arquivo JSON Lines por faixa (parallel_export). Para exportações
+e análises, prefira reduzir os dados no próprio processo de leitura com
+`funcao`: enviar cada documento de volta pela fila custa uma serialização a mais.
+
+Uso:
+    python parallel_scan.py --database vendas_db --colecao vendas --saida exportacao/
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import time
+from datetime import datetime
+from bson import BSON, Binary, Decimal128, ObjectId, Regex, Timestamp, json_util
+from bson.max_key import MaxKey
+from bson.min_key import MinKey
+from pymongo import MongoClient
+
+
+METODOS = ('sample', 'bucketAuto')
+
+# Ordem de comparação entre tipos do BSON (números, string, objeto, array, binário,
+# ObjectId, booleano, data, timestamp, regex), usada quando uma coleção mistura tipos de _id
+_ORDEM_TIPOS = (
+    ((int, float, Decimal128), 3), (str, 4), (dict, 5), ((list, tuple), 6),
+    ((bytes, Binary), 7), (ObjectId, 8), (bool, 9), (datetime, 10), (Timestamp, 11),
+    (Regex, 12),
+)
+
+
+def _tipo_bson(valor):
+    if isinstance(valor, MinKey) or valor is None:
+        return 1 if isinstance(valor, MinKey) else 2
+    if isinstance(valor, MaxKey):
+        return 13
+    # bool antes de int: em Python, bool é subclasse de int
+    if isinstance(valor, bool):
+        return 9
+    for tipos, ordem in _ORDEM_TIPOS:
+        if isinstance(valor, tipos):
+            return ordem
+    return 14
+
+
+def _chave_bson(valor):
+    """Chave de ordenação que segue a ordem do servidor mesmo entre tipos diferentes"""
+    tipo = _tipo_bson(valor)
+    if tipo == 3:
+        return tipo, valor.to_decimal() if isinstance(valor, Decimal128) else valor
+    if tipo in (4, 8, 9, 10):
+        return tipo, valor
+    if tipo == 11:
+        return tipo, (valor.time, valor.inc)
+    # Objetos, arrays e binários: aproximação pelos bytes; só afeta onde cai o limite
+    return tipo, BSON.encode({'v': valor}) if tipo in (5, 6, 7) else b''
+
+
+def split_ranges(collection, partes, filtro=None, metodo='sample', amostras_por_parte=20):
+    """
+    Divide a coleção em faixas de _id com quantidades aproximadamente iguais
+
+    Args:
+        collection (Collection): Coleção a dividir
+        partes (int): Número desejado de faixas
+        filtro (dict, optional): Restringe os documentos considerados
+        metodo (str): 'sample' (amostra aleatória; barato em coleções grandes) ou
+            'bucketAuto' (limites exatos, mas percorre todos os _id)
+        amostras_por_parte (int): Tamanho da amostra por faixa no método 'sample'
+
+    Returns:
+        list: Faixas (inicio, fim), com inicio inclusivo, fim exclusivo e None
+            nas pontas abertas (MinKey/MaxKey quando a coleção mistura tipos de _id)
+    """
+    if metodo not in METODOS:
+        raise ValueError(f"Método inválido: {metodo} (use {', '.join(METODOS)})")
+    pipeline = [{'$match': filtro}] if filtro else []
+    if partes <= 1:
+        return [(None, None)]
+    if metodo == 'sample':
+        pipeline += [{'$sample': {'size': partes * amostras_por_parte}}, {'$project': {'_id': 1}}]
+        ids = sorted((doc['_id'] for doc in collection.aggregate(pipeline)), key=_chave_bson)
+        limites = [ids[len(ids) * i // partes] for i in range(1, partes)] if ids else []
+    else:
+        pipeline += [{'$bucketAuto': {'groupBy': '$_id', 'buckets': partes}}]
+        limites = [bucket['_id']['min'] for bucket in collection.aggregate(pipeline)][1:]
+    # Amostras repetidas geram faixas vazias
+    unicos = {}
+    for limite in limites:
+        unicos.setdefault(_chave_bson(limite), limite)
+    limites = [unicos[chave] for chave in sorted(unicos)]
+    if len({_tipo_bson(limite) for limite in limites}) > 1:
+        # Com tipos misturados, as pontas abertas precisam cobrir os demais tipos
+        pontas = [MinKey()] + limites + [MaxKey()]
+    else:
+        pontas = [None] + limites + [None]
+    return list(zip(pontas[:-1], pontas[1:]))
+
+
+def _filtro_faixa(filtro, inicio, fim):
+    tipos = {_tipo_bson(ponta) for ponta in (inicio, fim) if ponta is not None}
+    if len(tipos) > 1:
+        # $gte/$lt na consulta só comparam valores do mesmo tipo; $expr usa a ordem
+        # completa do BSON (sem o índice, mas só nas faixas que cruzam tipos)
+        condicoes = []
+        if not isinstance(inicio, MinKey):
+            condicoes.append({'$gte': ['$_id', inicio]})
+        if not isinstance(fim, MaxKey):
+            condicoes.append({'$lt': ['$_id', fim]})
+        faixa = {'$expr': {'$and': condicoes}} if condicoes else {}
+        if not faixa or not filtro:
+            return faixa or dict(filtro or {})
+        return {'$and': [filtro, faixa]}
+    faixa = {}
+    if inicio is not None:
+        faixa['$gte'] = inicio
+    if fim is not None:
+        faixa['$lt'] = fim
+    if not faixa:
+        return dict(filtro or {})
+    if not filtro:
+        return {'_id': faixa}
+    return {'$and': [filtro, {'_id': faixa}]}
+
+
+def _varrer(collection, inicio, fim, filtro, projecao, batch_size, funcao, emitir):
+    """Lê uma faixa em ordem de _id, aplica funcao e emite lotes; retorna o total emitido"""
+    cursor = collection.find(_filtro_faixa(filtro, inicio, fim), projecao,
+                             batch_size=batch_size).sort('_id', 1)
+    lote, total = [], 0
+    for doc in cursor:
+        if funcao is not None:
+            doc = funcao(doc)
+            if doc is None:
+                continue
+        lote.append(doc)
+        if len(lote) >= batch_size:
+            emitir(lote)
+            total += len(lote)
+            lote = []
+    if lote:
+        emitir(lote)
+        total += len(lote)
+    return total
+
+
+def _trabalhador(uri, database, colecao, tarefas, resultados, filtro, projecao, batch_size,
+                 funcao, diretorio, opcoes_cliente):
+    """Processo de leitura: consome índices de faixas até receber None"""
+    client = MongoClient(uri, **opcoes_cliente)
+    collection = client[database][colecao]
+    try:
+        while True:
+            tarefa = tarefas.get()
+            if tarefa is None:
+                break
+            indice, (inicio, fim) = tarefa
+            try:
+                if diretorio is None:
+                    total = _varrer(collection, inicio, fim, filtro, projecao, batch_size, funcao,
+                                    lambda lote: resultados.put(('lote', indice, lote)))
+                    resultados.put(('fim', indice, total))
+                else:
+                    caminho = os.path.join(diretorio, f"{colecao}-{indice:04d}.jsonl")
+                    with open(caminho, 'w', encoding='utf-8') as arquivo:
+                        def _gravar(lote):
+                            arquivo.write(''.join(json_util.dumps(doc) + '\n' for doc in lote))
+                        total = _varrer(collection, inicio, fim, filtro, projecao, batch_size,
+                                        funcao, _gravar)
+                    resultados.put(('fim', indice, (caminho, total)))
+            except Exception as e:
+                resultados.put(('erro', indice, f"{type(e).__name__}: {e}"))
+    finally:
+        client.close()
+
+
+def _executar(uri, database, colecao, processos, partes, filtro, projecao, funcao,
+              batch_size, diretorio, metodo, opcoes_cliente):
+    processos = processos or os.cpu_count() or 1
+    # Mais faixas que processos equilibra a carga quando as faixas têm custos diferentes
+    partes = partes or processos * 4
+    opcoes_cliente = dict(opcoes_cliente or {})
+    client = MongoClient(uri, **opcoes_cliente)
+    try:
+        faixas = split_ranges(client[database][colecao], partes, filtro, metodo)
+    finally:
+        client.close()
+
+    # spawn: processos novos não herdam threads nem sockets do MongoClient do pai
+    contexto = multiprocessing.get_context('spawn')
+    tarefas = contexto.Queue()
+    resultados = contexto.Queue(maxsize=processos * 4)
+    for tarefa in enumerate(faixas):
+        tarefas.put(tarefa)
+    processos = min(processos, len(faixas))
+    for _ in range(processos):
+        tarefas.put(None)
+    trabalhadores = [
+        contexto.Process(target=_trabalhador, daemon=True, args=(
+            uri, database, colecao, tarefas, resultados, filtro, projecao, batch_size,
+            funcao, diretorio, opcoes_cliente))
+        for _ in range(processos)
+    ]
+    for trabalhador in trabalhadores:
+        trabalhador.start()
+    try:
+        pendentes = len(faixas)
+        while pendentes:
+            try:
+                tipo, indice, dados = resultados.get(timeout=1.0)
+            except queue.Empty:
+                if not any(t.is_alive() for t in trabalhadores):
+                    raise RuntimeError("Processos de leitura terminaram sem concluir as faixas")
+                continue
+            if tipo == 'erro':
+                raise RuntimeError(f"Falha na faixa {indice}: {dados}")
+            if tipo == 'fim':
+                pendentes -= 1
+            yield tipo, indice, dados
+    finally:
+        for trabalhador in trabalhadores:
+            if trabalhador.is_alive():
+                # Consumidor parou antes do fim ou houve erro: não espera as demais faixas
+                trabalhador.terminate()
+            trabalhador.join()
+
+
+def parallel_scan(uri, database, colecao, processos=None, partes=None, filtro=None,
+                  projecao=None, funcao=None, batch_size=1000, metodo='sample',
+                  opcoes_cliente=None):
+    """
+    Lê a coleção em paralelo e entrega os documentos ao processo atual
+
+    A ordem entre faixas não é garantida (dentro de uma faixa, ordem de _id).
+
+    Args:
+        uri (str): String de conexão (cada processo abre o próprio cliente)
+        database (str): Banco de dados
+        colecao (str): Coleção
+        processos (int, optional): Processos de leitura (padrão: núcleos da máquina)
+        partes (int, optional): Número de faixas de _id (padrão: 4 por processo)
+        filtro (dict, optional): Filtro aplicado em todas as faixas
+        projecao (dict, optional): Campos a retornar
+        funcao (callable, optional): Transformação aplicada a cada documento no
+            processo de leitura; documentos para os quais retorna None são
+            descartados. Precisa ser uma função de módulo (serializável)
+        batch_size (int): Documentos por lote do cursor e da fila
+        metodo (str): Divisão das faixas ('sample' ou 'bucketAuto')
+        opcoes_cliente (dict, optional): Opções extras do MongoClient
+
+    Yields:
+        dict: Documentos (ou resultados de funcao)
+    """
+    for tipo, _, dados in _executar(uri, database, colecao, processos, partes, filtro, projecao,
+                                     funcao, batch_size, None, metodo, opcoes_cliente):
+        if tipo == 'lote':
+            yield from dados
+
+
+def parallel_export(uri, database, colecao, diretorio, processos=None, partes=None, filtro=None,
+                    projecao=None, funcao=None, batch_size=1000, metodo='sample',
+                    opcoes_cliente=None):
+    """
+    Exporta a coleção em paralelo, um arquivo JSON Lines (Extended JSON) por faixa
+
+    Os argumentos são os de parallel_scan, mais o diretório de saída.
+
+    Returns:
+        dict: arquivos gerados, total de documentos e duração em segundos
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    inicio = time.perf_counter()
+    arquivos, total = {}, 0
+    for _, indice, (caminho, quantidade) in _executar(
+            uri, database, colecao, processos, partes, filtro, projecao, funcao, batch_size,
+            diretorio, metodo, opcoes_cliente):
+        arquivos[indice] = caminho
+        total += quantidade
+    return {
+        'arquivos': [arquivos[i] for i in sorted(arquivos)],
+        'documentos': total,
+        'duracao_s': round(time.perf_counter() - inicio, 3),
+    }
+
+
+def main():
+    from mongodb_crud import MongoDBCRUD
+
+    parser = argparse.ArgumentParser(description="Exporta uma coleção lendo faixas de _id em paralelo")
+    parser.add_argument('--environment', help="Ambiente de config.py (padrão: auto-detectado)")
+    parser.add_argument('--database', help="Banco de dados (padrão: o do ambiente)")
+    parser.add_argument('--colecao', default='usuarios', help="Coleção a exportar")
+    parser.add_argument('--saida', default='exportacao', help="Diretório dos arquivos .jsonl")
+    parser.add_argument('--processos', type=int, help="Processos de leitura (padrão: núcleos)")
+    parser.add_argument('--partes', type=int, help="Número de faixas (padrão: 4 por processo)")
+    parser.add_argument('--metodo', choices=METODOS, default='sample',
+                        help="Como calcular os limites das faixas")
+    args = parser.parse_args()
+
+    crud = MongoDBCRUD(database_name=args.database, environment=args.environment,
+                       ensure_indexes=False)
+    resultado = parallel_export(crud.connection_string, crud.database_name, args.colecao,
+                                args.saida, processos=args.processos, partes=args.partes,
+                                metodo=args.metodo, opcoes_cliente=crud.pool_options)
+    taxa = resultado['documentos'] / resultado['duracao_s'] if resultado['duracao_s'] else 0
+    print(f"✅ {resultado['documentos']} documentos em {len(resultado['arquivos'])} arquivos "
+          f"({resultado['duracao_s']} s, {taxa:.0f} docs/s) → {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
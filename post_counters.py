@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Contadores de posts com agregação de escritas
+Este módulo acumula em memória incrementos de visualizacoes/likes por post e os
+envia como um único $inc por post via bulk_write, quando o número de posts
+pendentes atinge um limite ou após um intervalo. Assim um post popular recebe
+uma escrita por lote em vez de uma por visualização.
+
+Com spool_path, cada incremento é também anexado a um arquivo local antes de
+ser confirmado; ao reiniciar, os incrementos não enviados são reaplicados. A
+garantia é "pelo menos uma vez": uma queda entre o bulk_write e a remoção do
+arquivo faz o lote ser reaplicado.
+"""
+
+import glob
+import os
+import threading
+import time
+from collections import defaultdict
+from bson import ObjectId, json_util
+from pymongo import UpdateOne
+from crud_logging import logger
+
+
+def _object_id(doc_id):
+    return ObjectId(doc_id) if isinstance(doc_id, str) else doc_id
+
+
+class CounterBuffer:
+    """Acumula incrementos de contadores por documento e os envia em lote"""
+
+    def __init__(self, collection, campos=('visualizacoes', 'likes'), max_posts=500,
+                 max_intervalo_s=1.0, spool_path=None, fsync=False):
+        """
+        Inicializa o buffer
+
+        Args:
+            collection (Collection): Coleção dos posts
+            campos (tuple): Contadores aceitos por increment()
+            max_posts (int): Envia ao acumular incrementos para este número de posts
+            max_intervalo_s (float): Envia quando o incremento mais antigo pendente
+                tiver esperado este tempo (None desativa)
+            spool_path (str, optional): Arquivo de registro dos incrementos não
+                enviados (um por processo)
+            fsync (bool): Força o spool para o disco a cada incremento (sobrevive a
+                quedas do sistema, não só do processo; bem mais lento)
+        """
+        self.collection = collection
+        self.campos = tuple(campos)
+        self.max_posts = max_posts
+        self.max_intervalo_s = max_intervalo_s
+        self.spool_path = spool_path
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._deltas = defaultdict(lambda: defaultdict(int))
+        self._timer = None
+        self._spool = None
+        self._rotacoes = 0
+        # Arquivos em envio cujos incrementos estão de volta em _deltas
+        self._arquivos = []
+        self.stats = {'incrementos': 0, 'lotes': 0, 'escritas': 0, 'reaplicados': 0,
+                      'falhas': 0}
+        if spool_path:
+            self._recuperar()
+            self._spool = open(spool_path, 'a', encoding='utf-8')
+
+    # Spool
+    def _pendentes_no_disco(self):
+        return sorted(glob.glob(f"{self.spool_path}.*.enviando"))
+
+    def _recuperar(self):
+        """Reaplica os incrementos registrados e não enviados antes de uma queda"""
+        if os.path.exists(self.spool_path):
+            os.replace(self.spool_path,
+                       f"{self.spool_path}.{time.time_ns()}-recuperado.enviando")
+        self._arquivos = self._pendentes_no_disco()
+        for arquivo in self._arquivos:
+            with open(arquivo, encoding='utf-8') as entrada:
+                for linha in entrada:
+                    try:
+                        registro = json_util.loads(linha)
+                    except ValueError:
+                        # Última linha truncada por uma queda no meio da escrita
+                        continue
+                    self._deltas[registro['id']][registro['campo']] += registro['n']
+                    self.stats['reaplicados'] += 1
+        self.flush()
+
+    def _registrar(self, post_id, campo, n):
+        self._spool.write(json_util.dumps({'id': post_id, 'campo': campo, 'n': n}) + '\n')
+        self._spool.flush()
+        if self.fsync:
+            os.fsync(self._spool.fileno())
+
+    def _rotacionar_spool(self):
+        """O spool atual passa a representar o lote em envio; devolve o nome dele"""
+        if self._spool is None or self._spool.tell() == 0:
+            return None
+        self._spool.close()
+        self._rotacoes += 1
+        arquivo = f"{self.spool_path}.{os.getpid()}-{self._rotacoes:06d}.enviando"
+        os.replace(self.spool_path, arquivo)
+        # Novos incrementos vão para um arquivo novo
+        self._spool = open(self.spool_path, 'a', encoding='utf-8')
+        return arquivo
+
+    # Operações
+    def increment(self, post_id, campo='visualizacoes', n=1):
+        """Agenda um incremento no contador do post"""
+        if campo not in self.campos:
+            raise ValueError(f"Contador desconhecido: {campo!r} (aceitos: {', '.join(self.campos)})")
+        post_id = _object_id(post_id)
+        with self._lock:
+            if self._spool is not None:
+                self._registrar(post_id, campo, n)
+            vazio = not self._deltas
+            self._deltas[post_id][campo] += n
+            self.stats['incrementos'] += 1
+            cheio = len(self._deltas) >= self.max_posts
+            if not cheio and vazio and self.max_intervalo_s:
+                self._agendar_envio()
+        # Fora do lock: só a thread que encheu o buffer espera o envio
+        if cheio:
+            self.flush()
+
+    def _agendar_envio(self):
+        self._cancelar_timer()
+        self._timer = threading.Timer(self.max_intervalo_s, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _cancelar_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def flush(self):
+        """
+        Envia um $inc por post com os incrementos acumulados
+
+        O lote é retirado do buffer sob o lock e enviado fora dele, então
+        increment() não espera o bulk_write. Se o envio falhar, os incrementos
+        voltam para o buffer (e continuam no spool) para a próxima tentativa.
+
+        Returns:
+            int: Número de posts atualizados no lote
+        """
+        with self._lock:
+            self._cancelar_timer()
+            if not self._deltas:
+                return 0
+            deltas, self._deltas = self._deltas, defaultdict(lambda: defaultdict(int))
+            arquivos, self._arquivos = self._arquivos, []
+            if self._spool is not None:
+                arquivo = self._rotacionar_spool()
+                if arquivo is not None:
+                    arquivos.append(arquivo)
+
+        operacoes = [UpdateOne({'_id': post_id}, {'$inc': dict(campos)})
+                     for post_id, campos in deltas.items()]
+        inicio = time.perf_counter()
+        try:
+            self.collection.bulk_write(operacoes, ordered=False)
+        except Exception as e:
+            with self._lock:
+                self.stats['falhas'] += 1
+                for post_id, campos in deltas.items():
+                    for campo, n in campos.items():
+                        self._deltas[post_id][campo] += n
+                # Os arquivos só são removidos quando estes incrementos forem aplicados
+                self._arquivos.extend(arquivos)
+                if self.max_intervalo_s and self._timer is None:
+                    self._agendar_envio()
+            logger.warning('falha ao enviar contadores', extra={
+                'colecao': self.collection.name, 'posts': len(deltas), 'erro': str(e),
+            })
+            return 0
+        duracao = time.perf_counter() - inicio
+        with self._lock:
+            self.stats['lotes'] += 1
+            self.stats['escritas'] += len(operacoes)
+            self.stats['duracao_s'] = self.stats.get('duracao_s', 0.0) + duracao
+        # Só os arquivos deste lote: outro flush() pode ter um lote em envio
+        for arquivo in arquivos:
+            os.remove(arquivo)
+        return len(operacoes)
+
+    # Leitura
+    def pending(self, post_id=None):
+        """Incrementos ainda não enviados (de um post ou de todos)"""
+        with self._lock:
+            if post_id is not None:
+                return dict(self._deltas.get(_object_id(post_id), {}))
+            return {pid: dict(campos) for pid, campos in self._deltas.items()}
+
+    def merge(self, documentos):
+        """Soma aos documentos lidos do banco os incrementos ainda em memória"""
+        pendentes = self.pending()
+        for doc in documentos:
+            for campo, n in pendentes.get(doc.get('_id'), {}).items():
+                doc[campo] = doc.get(campo, 0) + n
+        return documentos
+
+    def top(self, filtro=None, campo='visualizacoes', limite=10, projecao=None):
+        """
+        Posts com os maiores valores do contador, incluindo incrementos não enviados
+
+        Lê os `limite` maiores do banco e também os posts com incrementos pendentes
+        que atendem ao filtro, já que estes podem ter ultrapassado os primeiros.
+        """
+        filtro = dict(filtro or {})
+        pendentes = self.pending()
+        documentos = {doc['_id']: doc for doc in
+                      self.collection.find(filtro, projecao).sort(campo, -1).limit(limite)}
+        faltantes = [pid for pid in pendentes if pid not in documentos]
+        if faltantes:
+            for doc in self.collection.find({'$and': [filtro, {'_id': {'$in': faltantes}}]},
+                                            projecao):
+                documentos[doc['_id']] = doc
+        ordenados = self.merge(list(documentos.values()))
+        ordenados.sort(key=lambda doc: doc.get(campo, 0), reverse=True)
+        return ordenados[:limite]
+
+    def close(self):
+        """Envia o que estiver pendente e fecha o spool"""
+        with self._lock:
+            self.flush()
+            if self._spool is not None:
+                self._spool.close()
+                self._spool = None
+                if not self._deltas and os.path.getsize(self.spool_path) == 0:
+                    os.remove(self.spool_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Perfis de desempenho (write concern, read preference e read concern)
+Cada perfil troca durabilidade ou consistência por vazão de um jeito
+diferente e é escolhido por chamada nos métodos de MongoDBCRUD:
+
+  bulk_ingest - w=1, j=false, lotes não ordenados (cargas e reprocessamentos)
+  critical    - w=majority com journal (auditoria, dados que não podem se perder)
+  analytics   - lê de secundários, readConcern local, com atraso máximo tolerado
+
+Sem perfil, valem os padrões do driver e da string de conexão. Os ambientes
+de MongoConfig podem ajustar ou acrescentar perfis (chave 'profiles').
+"""
+
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import (Nearest, Primary, PrimaryPreferred, Secondary,
+                                      SecondaryPreferred)
+from pymongo.write_concern import WriteConcern
+
+
+PERFIS = {
+    'bulk_ingest': {'w': 1, 'j': False, 'ordered': False},
+    'critical': {'w': 'majority', 'j': True, 'wtimeout': 10000},
+    'analytics': {'read_preference': 'secondaryPreferred', 'read_concern': 'local',
+                  'max_staleness_s': 120},
+}
+
+_READ_PREFERENCES = {
+    'primary': Primary,
+    'primaryPreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondaryPreferred': SecondaryPreferred,
+    'nearest': Nearest,
+}
+_READ_CONCERNS = ('local', 'available', 'majority', 'linearizable', 'snapshot')
+CHAVES = ('w', 'j', 'wtimeout', 'ordered', 'read_preference', 'read_concern', 'max_staleness_s')
+# Menor maxStalenessSeconds aceito pelo driver
+MIN_STALENESS_S = 90
+
+
+def validate_profile(nome, opcoes):
+    """
+    Confere as opções de um perfil
+
+    Raises:
+        ValueError: Chave desconhecida ou valor inválido
+    """
+    desconhecidas = set(opcoes) - set(CHAVES)
+    if desconhecidas:
+        raise ValueError(f"Perfil {nome}: opções desconhecidas {', '.join(sorted(desconhecidas))} "
+                         f"(use {', '.join(CHAVES)})")
+    w = opcoes.get('w')
+    # w: número de nós, 'majority' ou o nome de um modo de tags do replica set
+    if w is not None and not ((isinstance(w, str) and w) or
+                              (isinstance(w, int) and not isinstance(w, bool) and w >= 0)):
+        raise ValueError(f"Perfil {nome}: w deve ser um inteiro >= 0, 'majority' ou um modo de tags")
+    for chave in ('j', 'ordered'):
+        if chave in opcoes and not isinstance(opcoes[chave], bool):
+            raise ValueError(f"Perfil {nome}: {chave} deve ser booleano")
+    if w == 0 and opcoes.get('j'):
+        raise ValueError(f"Perfil {nome}: j=True exige w >= 1")
+    wtimeout = opcoes.get('wtimeout')
+    if wtimeout is not None and not (isinstance(wtimeout, int) and wtimeout >= 0):
+        raise ValueError(f"Perfil {nome}: wtimeout deve ser um inteiro >= 0 (ms)")
+    modo = opcoes.get('read_preference')
+    if modo is not None and modo not in _READ_PREFERENCES:
+        raise ValueError(f"Perfil {nome}: read_preference inválida {modo} "
+                         f"(use {', '.join(_READ_PREFERENCES)})")
+    if opcoes.get('read_concern') not in (None, *_READ_CONCERNS):
+        raise ValueError(f"Perfil {nome}: read_concern inválido {opcoes['read_concern']} "
+                         f"(use {', '.join(_READ_CONCERNS)})")
+    staleness = opcoes.get('max_staleness_s')
+    if staleness is not None:
+        if modo in (None, 'primary'):
+            raise ValueError(f"Perfil {nome}: max_staleness_s exige read_preference diferente de primary")
+        if not (isinstance(staleness, int) and staleness >= MIN_STALENESS_S):
+            raise ValueError(f"Perfil {nome}: max_staleness_s deve ser >= {MIN_STALENESS_S}")
+
+
+class Profile:
+    """Perfil validado, com os objetos do driver prontos para with_options"""
+
+    def __init__(self, nome, opcoes):
+        validate_profile(nome, opcoes)
+        self.nome = nome
+        self.opcoes = dict(opcoes)
+        self.ordered = opcoes.get('ordered')
+        escrita = {chave: opcoes[chave] for chave in ('w', 'j', 'wtimeout') if chave in opcoes}
+        self.write_concern = WriteConcern(**escrita) if escrita else None
+        modo = opcoes.get('read_preference')
+        if modo is None:
+            self.read_preference = None
+        elif modo == 'primary':
+            self.read_preference = Primary()
+        else:
+            self.read_preference = _READ_PREFERENCES[modo](
+                max_staleness=opcoes.get('max_staleness_s', -1))
+        nivel = opcoes.get('read_concern')
+        self.read_concern = ReadConcern(nivel) if nivel else None
+
+    def apply(self, collection):
+        """Mesma coleção com as opções do perfil (as demais continuam herdadas)"""
+        return collection.with_options(
+            write_concern=self.write_concern,
+            read_preference=self.read_preference,
+            read_concern=self.read_concern
+        )
+
+    def __repr__(self):
+        return f"Profile({self.nome!r}, {self.opcoes!r})"
+
+
+def build_profiles(*sobrescritas):
+    """
+    Perfis padrão combinados com ajustes (do ambiente, da instância...)
+
+    Cada ajuste é {nome: opções}; as opções são mescladas às do perfil de mesmo
+    nome e um nome novo cria um perfil. Ajustes posteriores têm precedência.
+
+    Returns:
+        dict: {nome: Profile}
+    """
+    opcoes = {nome: dict(valores) for nome, valores in PERFIS.items()}
+    for ajuste in sobrescritas:
+        for nome, valores in (ajuste or {}).items():
+            opcoes[nome] = {**opcoes.get(nome, {}), **valores}
+    return {nome: Profile(nome, valores) for nome, valores in opcoes.items()}
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Analisador de consultas lentas baseado em explain()
+Este módulo amostra os filtros recebidos por read_users_by_filter,
+update_multiple_users e delete_users_by_filter, executa explain("executionStats")
+numa thread de fundo e agrega os resultados por forma do filtro (valores
+removidos), apontando COLLSCANs, razões ruins de chaves/documentos examinados
+por documento retornado e sugerindo índices compostos.
+
+Falhas do explain (permissão, timeout, filtro inválido) são registradas no
+logger e contadas por forma (coluna falhas do relatório).
+"""
+
+import json
+import queue
+import random
+import threading
+from crud_logging import logger
+
+
+# Operadores de comparação por igualdade e por intervalo (regra ESR: Equality, Sort, Range)
+OPERADORES_IGUALDADE = {'$eq', '$in'}
+OPERADORES_INTERVALO = {'$gt', '$gte', '$lt', '$lte', '$ne', '$nin', '$regex', '$exists'}
+
+
+def filter_shape(filtro):
+    """
+    Forma do filtro com os valores trocados por '?'
+
+    Exemplo: {"idade": {"$gt": 30}, "cidade": "SP"} → {"cidade": "?", "idade": {"$gt": "?"}}
+
+    Returns:
+        str: Representação canônica (chaves ordenadas) da forma
+    """
+    def _forma(valor):
+        if isinstance(valor, dict):
+            return {chave: _forma_campo(chave, v) for chave, v in valor.items()}
+        return '?'
+
+    def _forma_campo(chave, valor):
+        if chave in ('$and', '$or', '$nor') and isinstance(valor, list):
+            return sorted((_forma(v) for v in valor), key=lambda f: json.dumps(f, sort_keys=True))
+        if isinstance(valor, dict) and any(str(k).startswith('$') for k in valor):
+            return {k: '?' if k not in ('$not', '$elemMatch') else _forma(v)
+                    for k, v in valor.items()}
+        return '?'
+
+    return json.dumps(_forma(filtro or {}), sort_keys=True, ensure_ascii=False)
+
+
+def suggest_index(filtro):
+    """
+    Sugere um índice composto para o filtro seguindo a regra ESR
+
+    Campos comparados por igualdade vêm primeiro, seguidos dos campos de
+    intervalo. Filtros com $or não recebem sugestão única (cada ramo precisa do
+    próprio índice).
+
+    Returns:
+        list: Especificação [(campo, 1), ...] ou None
+    """
+    igualdade, intervalo = [], []
+
+    def _coletar(condicoes):
+        for campo, valor in condicoes.items():
+            if campo == '$and':
+                for parte in valor:
+                    _coletar(parte)
+            elif campo.startswith('$'):
+                raise ValueError(campo)
+            elif isinstance(valor, dict) and any(str(k).startswith('$') for k in valor):
+                operadores = set(valor)
+                destino = igualdade if operadores <= OPERADORES_IGUALDADE else intervalo
+                if campo not in igualdade and campo not in intervalo:
+                    destino.append(campo)
+            elif campo not in igualdade:
+                igualdade.append(campo)
+
+    try:
+        _coletar(filtro or {})
+    except ValueError:
+        return None
+    campos = igualdade + [c for c in intervalo if c not in igualdade]
+    return [(campo, 1) for campo in campos] or None
+
+
+def _estagios(plano):
+    """Lista os estágios (COLLSCAN, IXSCAN, FETCH...) de um plano de execução"""
+    estagios = []
+    while plano:
+        estagios.append(plano.get('stage'))
+        if plano.get('indexName'):
+            estagios[-1] = f"{plano['stage']}({plano['indexName']})"
+        if 'inputStages' in plano:
+            for filho in plano['inputStages']:
+                estagios.extend(_estagios(filho))
+            break
+        plano = plano.get('inputStage')
+    return estagios
+
+
+class QueryAnalyzer:
+    """Amostra filtros, executa explain e agrega estatísticas por forma do filtro"""
+
+    def __init__(self, taxa_amostragem=0.01, limiar_razao=10.0, min_examinados=100,
+                 tamanho_fila=100):
+        """
+        Inicializa o analisador
+
+        Args:
+            taxa_amostragem (float): Fração dos filtros analisados (a primeira
+                ocorrência de cada forma é sempre analisada)
+            limiar_razao (float): Razão examinados/retornados acima da qual a
+                consulta é sinalizada
+            min_examinados (int): Ignora consultas que examinam menos documentos
+                do que isto (coleções pequenas)
+            tamanho_fila (int): Máximo de explains pendentes; o excedente é descartado
+        """
+        self.taxa_amostragem = taxa_amostragem
+        self.limiar_razao = limiar_razao
+        self.min_examinados = min_examinados
+        self._fila = queue.Queue(maxsize=tamanho_fila)
+        self._lock = threading.Lock()
+        self._formas = {}
+        self.descartados = 0
+        self.falhas = 0
+        self._thread = threading.Thread(target=self._executar, name='query-analyzer', daemon=True)
+        self._thread.start()
+
+    def observe(self, collection, filtro, operacao):
+        """
+        Registra uma consulta e, se amostrada, agenda o explain
+
+        Chamado no caminho da operação: só calcula a forma e enfileira.
+        """
+        forma = filter_shape(filtro)
+        chave = (collection.name, forma)
+        with self._lock:
+            estado = self._formas.get(chave)
+            if estado is None:
+                estado = self._formas[chave] = {
+                    'colecao': collection.name,
+                    'forma': forma,
+                    'operacoes': set(),
+                    'ocorrencias': 0,
+                    'analises': 0,
+                    'keys_examined': 0,
+                    'docs_examined': 0,
+                    'n_returned': 0,
+                    'pior_razao': 0.0,
+                    'collscan': False,
+                    'planos': set(),
+                    'falhas': 0,
+                    'ultimo_erro': None,
+                    'indice_sugerido': suggest_index(filtro),
+                }
+                amostrar = True
+            else:
+                amostrar = random.random() < self.taxa_amostragem
+            estado['ocorrencias'] += 1
+            estado['operacoes'].add(operacao)
+        if amostrar:
+            try:
+                self._fila.put_nowait((collection, dict(filtro or {}), chave))
+            except queue.Full:
+                self.descartados += 1
+
+    def _executar(self):
+        while True:
+            item = self._fila.get()
+            try:
+                if item is None:
+                    return
+                collection, filtro, chave = item
+                try:
+                    self._analisar(collection, filtro, chave)
+                except Exception as e:
+                    self._registrar_falha(chave, e)
+            finally:
+                self._fila.task_done()
+
+    def _registrar_falha(self, chave, erro):
+        with self._lock:
+            self.falhas += 1
+            estado = self._formas[chave]
+            estado['falhas'] += 1
+            estado['ultimo_erro'] = f"{type(erro).__name__}: {erro}"
+        logger.warning("Falha no explain de %s: %s", chave[1], erro, extra={
+            'colecao': chave[0], 'erro': type(erro).__name__,
+        })
+
+    def close(self, timeout_s=5.0):
+        """Encerra a thread de análise depois dos explains já enfileirados"""
+        if self._thread.is_alive():
+            self._fila.put(None)
+            self._thread.join(timeout_s)
+
+    def _analisar(self, collection, filtro, chave):
+        # Escritas são analisadas como find com o mesmo filtro (explain não destrutivo)
+        resultado = collection.database.command({
+            'explain': {'find': collection.name, 'filter': filtro},
+            'verbosity': 'executionStats',
+        })
+        stats = resultado.get('executionStats', {})
+        plano = resultado.get('queryPlanner', {}).get('winningPlan', {})
+        # Servidores recentes (SBE) aninham o plano em queryPlan
+        plano = plano.get('queryPlan', plano)
+        estagios = _estagios(plano)
+        retornados = stats.get('nReturned', 0)
+        chaves = stats.get('totalKeysExamined', 0)
+        documentos = stats.get('totalDocsExamined', 0)
+        razao = max(chaves, documentos) / max(retornados, 1)
+        with self._lock:
+            estado = self._formas[chave]
+            estado['analises'] += 1
+            estado['keys_examined'] += chaves
+            estado['docs_examined'] += documentos
+            estado['n_returned'] += retornados
+            estado['pior_razao'] = max(estado['pior_razao'], razao)
+            estado['collscan'] = estado['collscan'] or 'COLLSCAN' in estagios
+            estado['planos'].add(' > '.join(str(e) for e in estagios))
+
+    def wait(self):
+        """Aguarda o processamento dos explains pendentes"""
+        self._fila.join()
+
+    def report(self, apenas_problemas=False):
+        """
+        Relatório agregado por forma de filtro, das mais problemáticas para as menos
+
+        Args:
+            apenas_problemas (bool): Retorna somente as formas sinalizadas
+
+        Returns:
+            list: Dicionários com contagens, razões, planos, sinalização e índice sugerido
+        """
+        with self._lock:
+            estados = [dict(e) for e in self._formas.values()]
+        linhas = []
+        for estado in estados:
+            analises = estado['analises']
+            razao_media = (
+                max(estado['keys_examined'], estado['docs_examined']) / max(estado['n_returned'], 1)
+                if analises else None
+            )
+            examinados = max(estado['keys_examined'], estado['docs_examined']) / max(analises, 1)
+            problema = bool(analises) and examinados >= self.min_examinados and (
+                estado['collscan'] or (razao_media or 0) > self.limiar_razao
+            )
+            indice = estado['indice_sugerido'] if problema else None
+            linhas.append({
+                'colecao': estado['colecao'],
+                'forma': estado['forma'],
+                'operacoes': sorted(estado['operacoes']),
+                'ocorrencias': estado['ocorrencias'],
+                'analises': analises,
+                'razao_media': razao_media,
+                'pior_razao': estado['pior_razao'],
+                'collscan': estado['collscan'],
+                'planos': sorted(estado['planos']),
+                'falhas': estado['falhas'],
+                'ultimo_erro': estado['ultimo_erro'],
+                'problema': problema,
+                'indice_sugerido': dict(indice) if indice else None,
+            })
+        if apenas_problemas:
+            linhas = [linha for linha in linhas if linha['problema']]
+        linhas.sort(key=lambda l: (l['problema'], l['ocorrencias'] * (l['razao_media'] or 0)),
+                    reverse=True)
+        return linhas
+
+    def print_report(self):
+        """Imprime o relatório de forma legível"""
+        linhas = self.report()
+        if not linhas:
+            print("📝 Nenhuma consulta observada")
+            return
+        print("\n" + "="*80)
+        print("🔍 ANÁLISE DE CONSULTAS")
+        print("="*80)
+        for linha in linhas:
+            marcador = "⚠️" if linha['problema'] else "✅"
+            razao = f"{linha['razao_media']:.1f}" if linha['razao_media'] is not None else "-"
+            print(f"\n{marcador} {linha['colecao']} {linha['forma']}")
+            print(f"   Operações: {', '.join(linha['operacoes'])}")
+            print(f"   Ocorrências: {linha['ocorrencias']}  Analisadas: {linha['analises']}  "
+                  f"Razão examinados/retornados: {razao}")
+            print(f"   Planos: {'; '.join(linha['planos']) or '-'}")
+            if linha['falhas']:
+                print(f"   Falhas no explain: {linha['falhas']} ({linha['ultimo_erro']})")
+            if linha['indice_sugerido']:
+                print(f"   Índice sugerido: {linha['indice_sugerido']}")
+        print("\n" + "="*80)
@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Repositórios por coleção
+Este módulo oferece um repositório genérico (consultas, escritas, agregações,
+lotes e carga em massa) e repositórios específicos para usuarios, produtos,
+posts e vendas. Todos usam o cliente compartilhado do MongoDBCRUD que os cria
+(crud.repository('produtos')) e mantêm, por coleção, filtros preparados,
+projeções nomeadas, codec options e read/write concerns, com o handle da
+coleção configurado uma única vez.
+
+Criados por MongoDBCRUD.repository(), os repositórios usam os perfis de
+desempenho da instância (profiles.py) e, em usuarios, a mesma invalidação de
+cache e validação de schema dos métodos de MongoDBCRUD.
+"""
+
+from contextlib import nullcontext
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from bulk_loader import BulkLoader
+from crud_logging import VERBOSIDADES, logger, marcar_falha, timed
+from models import MODELOS, codec_options as opcoes_do_modelo
+from profiles import build_profiles
+from write_batch import WriteBatch
+
+
+def _object_id(doc_id):
+    return ObjectId(doc_id) if isinstance(doc_id, str) else doc_id
+
+
+class Repository:
+    """Operações genéricas sobre uma coleção"""
+
+    # Nome da coleção (as subclasses definem; o genérico recebe no construtor)
+    colecao = None
+    # Projeções nomeadas aceitas pelo parâmetro view
+    VIEWS = {}
+    # Filtros preparados: dicionário fixo ou função que recebe parâmetros nomeados
+    FILTROS = {}
+    # Configuração do handle da coleção (None = herdada do banco)
+    codec_options = None
+    read_preference = None
+    read_concern = None
+    write_concern = None
+
+    def __init__(self, db, colecao=None, verbosity='quiet', query_analyzer=None, profiles=None,
+                 default_profile=None, invalidar=None, validador=None):
+        """
+        Inicializa o repositório
+
+        Args:
+            db (Database): Banco de dados (cliente compartilhado)
+            colecao (str, optional): Nome da coleção (obrigatório no repositório genérico)
+            verbosity (str): 'quiet' ou 'demo', como em MongoDBCRUD
+            query_analyzer (QueryAnalyzer, optional): Analisador dos filtros de leitura
+            profiles (dict, optional): Perfis disponíveis ({nome: Profile}, padrão:
+                build_profiles())
+            default_profile (str, optional): Perfil das chamadas sem profile
+            invalidar (callable, optional): Fábrica de context manager chamada como
+                invalidar(chaves=..., filtro=..., tudo=...) em volta de cada escrita
+                (ex.: MongoDBCRUD._invalidating)
+            validador (SchemaValidator, optional): Rejeita no cliente os documentos
+                inválidos de insert_one, insert_many e bulk_load
+        """
+        nome = colecao or self.colecao
+        if nome is None:
+            raise ValueError("Informe a coleção do repositório")
+        if verbosity not in VERBOSIDADES:
+            raise ValueError(f"Verbosidade inválida: {verbosity} (use {', '.join(VERBOSIDADES)})")
+        self._demo = verbosity == 'demo'
+        self.query_analyzer = query_analyzer
+        self.invalidar = invalidar
+        self.validador = validador
+        self.profiles = profiles if profiles is not None else build_profiles()
+        self.default_profile = default_profile
+        self._base = db.get_collection(
+            nome,
+            codec_options=self.codec_options,
+            read_preference=self.read_preference,
+            write_concern=self.write_concern,
+            read_concern=self.read_concern
+        )
+        # Modelo de models.py usado pelas leituras com modelo=True
+        self.modelo = MODELOS.get(nome)
+        # Handles por (perfil, raw, modelo), criados sob demanda
+        self._handles = {}
+        # Coleção com o perfil padrão (a usada por quem recebe repo.collection)
+        self.collection = self._colecao()
+
+    @property
+    def name(self):
+        return self.collection.name
+
+    def _say(self, mensagem, *args):
+        """Imprime a mensagem apenas no modo demo (formatação adiada até lá)"""
+        if self._demo:
+            print(mensagem % args if args else mensagem)
+
+    def _fail(self, mensagem, erro):
+        """Registra um erro no logger e, no modo demo, também no terminal"""
+        logger.error("%s: %s", mensagem, erro, extra={
+            'colecao': self.collection.name,
+            'erro': type(erro).__name__,
+            # No modo demo a mensagem já sai no terminal abaixo
+            'exibido': self._demo,
+        })
+        marcar_falha(erro)
+        if self._demo:
+            print(f"❌ {mensagem}: {erro}")
+
+    # Filtros e projeções
+    def resolve_filter(self, filtro=None, **parametros):
+        """
+        Resolve um filtro explícito ou o nome de um filtro preparado
+
+        Exemplo: repo.resolve_filter('faixa_preco', minimo=100, maximo=500)
+        """
+        if isinstance(filtro, str):
+            if filtro not in self.FILTROS:
+                raise ValueError(f"Filtro desconhecido em {self.collection.name}: {filtro} "
+                                 f"(use {', '.join(self.FILTROS) or 'um dicionário'})")
+            preparado = self.FILTROS[filtro]
+            return dict(preparado(**parametros) if callable(preparado) else preparado)
+        if parametros:
+            raise ValueError("Parâmetros só se aplicam a filtros preparados")
+        return dict(filtro or {})
+
+    def resolve_projection(self, projecao=None, view=None):
+        """Resolve a projeção a partir de um dicionário explícito ou de uma view nomeada"""
+        if view is not None:
+            if projecao is not None:
+                raise ValueError("Informe projecao ou view, não ambos")
+            if view not in self.VIEWS:
+                raise ValueError(f"View desconhecida: {view} (use {', '.join(self.VIEWS)})")
+            projecao = self.VIEWS[view]
+        return dict(projecao) if projecao is not None else None
+
+    def _profile(self, nome=None):
+        """Perfil pedido na chamada (ou o padrão do repositório); None = opções da coleção"""
+        nome = nome or self.default_profile
+        if nome is None:
+            return None
+        perfil = self.profiles.get(nome)
+        if perfil is None:
+            raise ValueError(f"Perfil desconhecido: {nome} (use {', '.join(self.profiles)})")
+        return perfil
+
+    def _colecao(self, profile=None, raw=False, modelo=False):
+        """
+        Coleção com as opções de um perfil e/ou decodificando em RawBSONDocument
+        ou no modelo; cada combinação é criada uma vez
+        """
+        if raw and modelo:
+            raise ValueError("Informe raw ou modelo, não ambos")
+        if modelo and self.modelo is None:
+            raise ValueError(f"Coleção sem modelo: {self._base.name}")
+        perfil = self._profile(profile)
+        chave = (perfil.nome if perfil else None, raw, modelo)
+        collection = self._handles.get(chave)
+        if collection is None:
+            collection = perfil.apply(self._base) if perfil else self._base
+            if raw:
+                opcoes = collection.codec_options.with_options(document_class=RawBSONDocument)
+                collection = collection.with_options(codec_options=opcoes)
+            elif modelo:
+                opcoes = opcoes_do_modelo(self.modelo, collection.codec_options)
+                collection = collection.with_options(codec_options=opcoes)
+            self._handles[chave] = collection
+        return collection
+
+    def _invalidando(self, chaves=(), filtro=None):
+        # Escrita envolvida pela invalidação de cache (se houver); filtro vazio = tudo
+        if self.invalidar is None:
+            return nullcontext()
+        if filtro is not None and not filtro:
+            return self.invalidar(tudo=True)
+        return self.invalidar(chaves=chaves, filtro=filtro)
+
+    def _rejeitar(self, documentos, operacao):
+        """Separa os documentos válidos e registra os rejeitados pelo validador"""
+        if self.validador is None:
+            return documentos, []
+        validos, invalidos = self.validador.split(documentos)
+        for indice, _, erros in invalidos:
+            logger.warning("Documento %d rejeitado pelo schema: %s", indice, '; '.join(erros),
+                           extra={'colecao': self.collection.name, 'operacao': operacao})
+        if invalidos:
+            self._say("❌ %d documentos inválidos descartados", len(invalidos))
+        return validos, invalidos
+
+    def _observar(self, filtro, operacao):
+        if self.query_analyzer is not None:
+            self.query_analyzer.observe(self.collection, filtro, operacao)
+
+    # CREATE
+    @timed('insert_one')
+    def insert_one(self, documento, profile=None):
+        """
+        Insere um documento
+
+        Returns:
+            str: ID do documento inserido ou None se houver erro (ou se o
+                documento não passar no validador)
+        """
+        try:
+            validos, _ = self._rejeitar([documento], 'insert_one')
+            if not validos:
+                return None
+            resultado = self._colecao(profile).insert_one(documento)
+            self._say("✅ Documento criado em %s! ID: %s", self.collection.name, resultado.inserted_id)
+            return str(resultado.inserted_id)
+        except Exception as e:
+            self._fail("Erro ao inserir documento", e)
+            return None
+
+    @timed('insert_many')
+    def insert_many(self, documentos, ordered=None, profile=None):
+        """
+        Insere vários documentos de uma vez
+
+        Documentos que não passam no validador são descartados no cliente.
+
+        Args:
+            ordered (bool, optional): Insere em ordem (padrão: o do perfil, ou True)
+
+        Returns:
+            list: IDs dos documentos inseridos
+        """
+        try:
+            perfil = self._profile(profile)
+            if ordered is None:
+                ordered = perfil.ordered if perfil and perfil.ordered is not None else True
+            documentos, _ = self._rejeitar(documentos, 'insert_many')
+            if not documentos:
+                return []
+            resultado = self._colecao(profile).insert_many(documentos, ordered=ordered)
+            self._say("✅ %d documentos criados em %s", len(resultado.inserted_ids),
+                      self.collection.name)
+            return [str(doc_id) for doc_id in resultado.inserted_ids]
+        except Exception as e:
+            self._fail("Erro ao inserir documentos", e)
+            return []
+
+    def bulk_load(self, documentos, batch_size=1000, workers=4, max_erros=1000, preparar=None,
+                  profile='bulk_ingest'):
+        """
+        Carga em massa a partir de qualquer iterável (lotes paralelos, ordered=False)
+
+        Args:
+            profile (str, optional): Perfil das escritas (padrão: 'bulk_ingest',
+                como em MongoDBCRUD.bulk_load_users)
+
+        Returns:
+            dict: Resumo da carga (ver BulkLoader.load)
+        """
+        loader = BulkLoader(self._colecao(profile), batch_size=batch_size, workers=workers,
+                            max_erros=max_erros, preparar=preparar,
+                            validar=getattr(self.validador, 'errors', None))
+        resumo = loader.load(documentos)
+        self._say("✅ %d documentos carregados em %s, %d falhas", resumo['inseridos'],
+                  self.collection.name, resumo['falhas'])
+        return resumo
+
+    def batch(self, max_ops=1000, max_intervalo_s=1.0, ordered=None, profile=None):
+        """Lote de escritas mistas enviado via bulk_write (ver WriteBatch)"""
+        perfil = self._profile(profile)
+        if ordered is None:
+            ordered = perfil.ordered if perfil and perfil.ordered is not None else False
+        return WriteBatch(self._colecao(profile), max_ops=max_ops,
+                          max_intervalo_s=max_intervalo_s, ordered=ordered,
+                          invalidar=self.invalidar)
+
+    # READ
+    def iter(self, filtro=None, projecao=None, view=None, sort=None, limite=None,
+             batch_size=1000, raw=False, modelo=False, profile=None, **parametros):
+        """
+        Percorre os documentos sob demanda, em lotes de batch_size
+
+        Yields:
+            dict: Documentos (RawBSONDocument com raw=True, modelo de models.py
+                com modelo=True)
+        """
+        if limite is not None and limite <= 0:
+            return
+        filtro = self.resolve_filter(filtro, **parametros)
+        cursor = self._colecao(profile, raw, modelo).find(
+            filtro, self.resolve_projection(projecao, view), batch_size=batch_size)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limite is not None:
+            cursor = cursor.limit(limite)
+        with cursor:
+            yield from cursor
+
+    @timed('find')
+    def find(self, filtro=None, projecao=None, view=None, sort=None, limite=None, raw=False,
+             modelo=False, profile=None, **parametros):
+        """
+        Busca documentos
+
+        Args:
+            filtro (dict|str, optional): Filtro ou nome de um filtro preparado (FILTROS)
+            projecao (dict, optional): Campos a retornar
+            view (str, optional): Projeção nomeada de VIEWS
+            sort (list, optional): Ordenação [(campo, direção), ...]
+            limite (int, optional): Número máximo de documentos
+            raw (bool): Retorna RawBSONDocument
+            modelo (bool): Decodifica direto no modelo compacto (models.py)
+            profile (str, optional): Perfil de desempenho (ex.: 'analytics')
+            **parametros: Parâmetros do filtro preparado
+
+        Returns:
+            list: Documentos encontrados
+        """
+        try:
+            filtro_resolvido = self.resolve_filter(filtro, **parametros)
+            self._observar(filtro_resolvido, f'{self.collection.name}.find')
+            documentos = list(self.iter(filtro_resolvido, projecao, view, sort, limite, raw=raw,
+                                        modelo=modelo, profile=profile))
+            self._say("📖 Encontrados %d documentos em %s", len(documentos), self.collection.name)
+            return documentos
+        except Exception as e:
+            self._fail("Erro ao buscar documentos", e)
+            return []
+
+    @timed('find_one')
+    def find_one(self, filtro=None, projecao=None, view=None, sort=None, raw=False, modelo=False,
+                 profile=None, **parametros):
+        """
+        Busca o primeiro documento que atende ao filtro
+
+        Returns:
+            dict: Documento ou None
+        """
+        try:
+            return self._colecao(profile, raw, modelo).find_one(
+                self.resolve_filter(filtro, **parametros),
+                self.resolve_projection(projecao, view),
+                sort=sort
+            )
+        except Exception as e:
+            self._fail("Erro ao buscar documento", e)
+            return None
+
+    def find_by_id(self, doc_id, projecao=None, view=None, raw=False, modelo=False, profile=None):
+        """Busca um documento pelo _id (str ou ObjectId)"""
+        return self.find_one({'_id': _object_id(doc_id)}, projecao, view, raw=raw, modelo=modelo,
+                             profile=profile)
+
+    @timed('count')
+    def count(self, filtro=None, profile=None, **parametros):
+        """Conta os documentos que atendem ao filtro (0 em caso de erro)"""
+        try:
+            filtro = self.resolve_filter(filtro, **parametros)
+            colecao = self._colecao(profile)
+            if not filtro:
+                return colecao.estimated_document_count()
+            return colecao.count_documents(filtro)
+        except Exception as e:
+            self._fail("Erro ao contar documentos", e)
+            return 0
+
+    @timed('aggregate')
+    def aggregate(self, pipeline, raw=False, profile=None, **opcoes):
+        """
+        Executa um pipeline de agregação
+
+        Returns:
+            list: Resultado do pipeline
+        """
+        try:
+            return list(self._colecao(profile, raw).aggregate(pipeline, **opcoes))
+        except Exception as e:
+            self._fail("Erro na agregação", e)
+            return []
+
+    # UPDATE
+    @staticmethod
+    def _alteracao(alteracoes):
+        # Dicionário sem operadores vira $set
+        if any(str(chave).startswith('$') for chave in alteracoes):
+            return alteracoes
+        return {'$set': alteracoes}
+
+    @timed('update_one')
+    def update_one(self, filtro, alteracoes, upsert=False, profile=None, **parametros):
+        """
+        Atualiza o primeiro documento que atende ao filtro
+
+        Args:
+            filtro (dict|str): Filtro ou nome de um filtro preparado
+            alteracoes (dict): Documento de atualização ($set, $inc...) ou campos para $set
+            upsert (bool): Cria o documento se não existir
+            profile (str, optional): Perfil de desempenho (ex.: 'critical')
+
+        Returns:
+            int: Documentos modificados (0 em caso de erro)
+        """
+        try:
+            filtro = self.resolve_filter(filtro, **parametros)
+            chaves = [filtro['_id']] if isinstance(filtro.get('_id'), ObjectId) else ()
+            with self._invalidando(chaves, None if chaves else filtro):
+                resultado = self._colecao(profile).update_one(filtro, self._alteracao(alteracoes),
+                                                              upsert=upsert)
+            return resultado.modified_count
+        except Exception as e:
+            self._fail("Erro ao atualizar documento", e)
+            return 0
+
+    def update_by_id(self, doc_id, alteracoes, profile=None):
+        """Atualiza o documento com o _id informado; retorna True se modificado"""
+        return self.update_one({'_id': _object_id(doc_id)}, alteracoes, profile=profile) > 0
+
+    @timed('update_many')
+    def update_many(self, filtro, alteracoes, profile=None, **parametros):
+        """
+        Atualiza todos os documentos que atendem ao filtro
+
+        Returns:
+            int: Documentos modificados (0 em caso de erro)
+        """
+        try:
+            filtro = self.resolve_filter(filtro, **parametros)
+            self._observar(filtro, f'{self.collection.name}.update_many')
+            with self._invalidando(filtro=filtro):
+                resultado = self._colecao(profile).update_many(filtro, self._alteracao(alteracoes))
+            self._say("✅ %d documentos atualizados em %s", resultado.modified_count,
+                      self.collection.name)
+            return resultado.modified_count
+        except Exception as e:
+            self._fail("Erro ao atualizar documentos", e)
+            return 0
+
+    # DELETE
+    @timed('delete_many')
+    def delete_many(self, filtro, profile=None, **parametros):
+        """
+        Remove todos os documentos que atendem ao filtro ({} remove tudo)
+
+        Returns:
+            int: Documentos removidos (0 em caso de erro)
+        """
+        try:
+            filtro = self.resolve_filter(filtro, **parametros)
+            self._observar(filtro, f'{self.collection.name}.delete_many')
+            with self._invalidando(filtro=filtro):
+                return self._colecao(profile).delete_many(filtro).deleted_count
+        except Exception as e:
+            self._fail("Erro ao remover documentos", e)
+            return 0
+
+    def delete_by_id(self, doc_id, profile=None):
+        """Remove o documento com o _id informado; retorna True se removido"""
+        try:
+            doc_id = _object_id(doc_id)
+            with self._invalidando(chaves=[doc_id]):
+                return self._colecao(profile).delete_one({'_id': doc_id}).deleted_count > 0
+        except Exception as e:
+            self._fail("Erro ao remover documento", e)
+            return False
+
+
+class UsuariosRepository(Repository):
+    colecao = 'usuarios'
+    # Mesmas projeções dos métodos de leitura de MongoDBCRUD (que as importa daqui)
+    VIEWS = {
+        'full': None,
+        'summary': {'nome': 1, 'email': 1},
+        'contato': {'nome': 1, 'email': 1, 'cidade': 1},
+        'perfil': {'nome': 1, 'email': 1, 'idade': 1, 'cidade': 1, 'ativo': 1},
+    }
+    FILTROS = {
+        'ativos': {'ativo': True},
+        'cidade': lambda cidade: {'cidade': cidade},
+        'faixa_idade': lambda minimo, maximo: {'idade': {'$gte': minimo, '$lte': maximo}},
+    }
+
+
+class ProdutosRepository(Repository):
+    colecao = 'produtos'
+    VIEWS = {
+        'vitrine': {'nome': 1, 'preco': 1, 'categoria': 1},
+        'estoque': {'nome': 1, 'estoque': 1},
+        'promocao': {'nome': 1, 'preco': 1, 'desconto': 1},
+    }
+    FILTROS = {
+        'ativos': {'ativo': True},
+        'em_promocao': {'promocao': True},
+        # Mesmo limite do índice parcial de index_manager.INDEX_SPECS
+        'estoque_baixo': {'estoque': {'$lt': 30}},
+        'categoria': lambda categoria: {'categoria': categoria},
+        'faixa_preco': lambda minimo, maximo: {'preco': {'$gte': minimo, '$lte': maximo}},
+        'estoque_acima': lambda minimo: {'estoque': {'$gt': minimo}},
+    }
+
+
+class PostsRepository(Repository):
+    colecao = 'posts'
+    VIEWS = {
+        'resumo': {'titulo': 1, 'autor': 1},
+        'contadores': {'titulo': 1, 'visualizacoes': 1, 'likes': 1},
+    }
+    FILTROS = {
+        'publicados': {'publicado': True},
+        'rascunhos': {'publicado': False},
+        'tag': lambda tag: {'tags': tag},
+        'titulo': lambda titulo: {'titulo': titulo},
+    }
+
+
+class VendasRepository(Repository):
+    colecao = 'vendas'
+    VIEWS = {
+        'valores': {'_id': 0, 'quantidade': 1, 'preco_unitario': 1, 'total': 1},
+    }
+    FILTROS = {
+        'desde': lambda data: {'data_venda': {'$gte': data}},
+        'produto': lambda produto: {'produto': produto},
+        'vendedor': lambda vendedor: {'vendedor': vendedor},
+    }
+    # Relatórios que toleram ler de secundários pedem profile='analytics' na
+    # chamada; as demais leituras seguem o default_profile e veem as próprias escritas
+
+
+REPOSITORIOS = {
+    classe.colecao: classe
+    for classe in (UsuariosRepository, ProdutosRepository, PostsRepository, VendasRepository)
+}
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Validação de schema no cliente
+Este módulo lê o $jsonSchema de uma coleção diretamente de init-mongo.js (a
+mesma fonte usada pelo servidor) e o compila uma única vez num validador
+Python: regexes pré-compiladas, checagens de tipo por campo e limites
+numéricos. Documentos inválidos são rejeitados no processo, antes de entrar
+num lote, e não desperdiçam round trips nem derrubam lotes inteiros.
+
+Palavras-chave suportadas: bsonType, required, properties, pattern, minimum,
+maximum, exclusiveMinimum, exclusiveMaximum, minLength, maxLength, enum e
+additionalProperties. Um schema com outras palavras-chave não é compilado
+(ValueError), para que o cliente nunca aceite menos do que o servidor.
+
+Uso:
+    python schema_validator.py                  # mostra o schema de usuarios
+    python schema_validator.py --benchmark      # documentos validados por segundo
+"""
+
+import argparse
+import functools
+import json
+import os
+import re
+import time
+from collections.abc import Mapping
+from datetime import datetime
+from decimal import Decimal
+from bson import ObjectId
+from bson.binary import Binary
+from bson.decimal128 import Decimal128
+from bson.int64 import Int64
+from bson.regex import Regex
+from bson.timestamp import Timestamp
+
+
+INIT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'init-mongo.js')
+
+_INT32_MIN, _INT32_MAX = -2 ** 31, 2 ** 31 - 1
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+# Palavras-chave sem efeito na validação
+_ANOTACOES = {'description', 'title'}
+
+
+# Leitura do schema em init-mongo.js
+_TOKEN = re.compile(r"""
+    (?P<espaco>\s+|//[^\n]*|/\*.*?\*/)
+  | (?P<texto>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<numero>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<nome>[A-Za-z_$][\w$]*)
+  | (?P<simbolo>[{}\[\]:,])
+""", re.VERBOSE | re.DOTALL)
+_ESCAPES_JS = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', '0': '\0'}
+
+
+def _texto_js(literal):
+    return re.sub(r'\\(.)', lambda m: _ESCAPES_JS.get(m.group(1), m.group(1)), literal[1:-1])
+
+
+def _literal_js(codigo, inicio):
+    """Converte o objeto literal JavaScript que começa em inicio ('{') em JSON"""
+    partes = []
+    profundidade = 0
+    pos = inicio
+    while True:
+        token = _TOKEN.match(codigo, pos)
+        if token is None:
+            raise ValueError(f"Trecho não suportado em init-mongo.js: {codigo[pos:pos + 30]!r}")
+        pos = token.end()
+        tipo, valor = token.lastgroup, token.group()
+        if tipo == 'espaco':
+            continue
+        if tipo == 'texto':
+            partes.append(json.dumps(_texto_js(valor)))
+        elif tipo == 'nome':
+            partes.append(valor if valor in ('true', 'false', 'null') else json.dumps(valor))
+        elif tipo == 'simbolo' and valor in '}]' and partes and partes[-1] == ',':
+            partes[-1] = valor  # vírgula final, aceita em JavaScript
+        else:
+            partes.append(valor)
+        if valor in ('{', '['):
+            profundidade += 1
+        elif valor in ('}', ']'):
+            profundidade -= 1
+            if profundidade == 0:
+                return json.loads(''.join(partes))
+
+
+def load_schema(colecao='usuarios', caminho=INIT_SCRIPT):
+    """
+    Lê o $jsonSchema do createCollection de colecao em init-mongo.js
+
+    Returns:
+        dict: Schema (None se a coleção é criada sem validador)
+
+    Raises:
+        FileNotFoundError: init-mongo.js não encontrado
+        ValueError: Coleção não criada no script ou schema ilegível
+    """
+    with open(caminho, encoding='utf-8') as arquivo:
+        codigo = arquivo.read()
+    chamada = re.search(r"createCollection\(\s*['\"]%s['\"]\s*(,|\))" % re.escape(colecao), codigo)
+    if chamada is None:
+        raise ValueError(f"{colecao} não é criada em {caminho}")
+    if chamada.group(1) == ')':
+        return None
+    opcoes = _literal_js(codigo, codigo.index('{', chamada.end()))
+    return opcoes.get('validator', {}).get('$jsonSchema')
+
+
+# Compilação
+def _checagem_tipo(bson_type):
+    """Função valor -> bool equivalente ao bsonType do servidor"""
+    checagens = {
+        'string': lambda v: type(v) is str,
+        # int do Python vira int32 no BSON só se couber; Int64 é sempre long
+        'int': lambda v: type(v) is int and _INT32_MIN <= v <= _INT32_MAX,
+        'long': lambda v: (type(v) is Int64 or
+                           (type(v) is int and not _INT32_MIN <= v <= _INT32_MAX
+                            and _INT64_MIN <= v <= _INT64_MAX)),
+        'double': lambda v: type(v) is float,
+        'decimal': lambda v: isinstance(v, (Decimal128, Decimal)),
+        'number': lambda v: (type(v) in (float, Int64, Decimal128, Decimal) or
+                             (type(v) is int and _INT64_MIN <= v <= _INT64_MAX)),
+        'bool': lambda v: type(v) is bool,
+        'date': lambda v: isinstance(v, datetime),
+        'objectId': lambda v: type(v) is ObjectId,
+        'object': lambda v: isinstance(v, Mapping),
+        'array': lambda v: type(v) in (list, tuple),
+        'null': lambda v: v is None,
+        'binData': lambda v: isinstance(v, (bytes, Binary)),
+        'regex': lambda v: isinstance(v, (Regex, re.Pattern)),
+        'timestamp': lambda v: type(v) is Timestamp,
+    }
+    tipos = [bson_type] if isinstance(bson_type, str) else list(bson_type)
+    for tipo in tipos:
+        if tipo not in checagens:
+            raise ValueError(f"bsonType não suportado: {tipo}")
+    if len(tipos) == 1:
+        return checagens[tipos[0]]
+    funcoes = [checagens[tipo] for tipo in tipos]
+    return lambda v: any(funcao(v) for funcao in funcoes)
+
+
+def _checagem(condicao_erro, mensagem):
+    return lambda v: mensagem if condicao_erro(v) else None
+
+
+def _compilar_campo(caminho, regra):
+    """Lista de funções valor -> mensagem de erro (ou None) para uma propriedade"""
+    desconhecidas = set(regra) - _ANOTACOES - {
+        'bsonType', 'pattern', 'minimum', 'maximum', 'exclusiveMinimum', 'exclusiveMaximum',
+        'minLength', 'maxLength', 'enum', 'required', 'properties', 'additionalProperties'}
+    if desconhecidas:
+        raise ValueError(f"Palavras-chave não suportadas em {caminho}: {', '.join(sorted(desconhecidas))}")
+    checagens = []
+    if 'bsonType' in regra:
+        tipo_ok = _checagem_tipo(regra['bsonType'])
+        descricao = regra['bsonType'] if isinstance(regra['bsonType'], str) else '|'.join(regra['bsonType'])
+        checagens.append(_checagem(lambda v: not tipo_ok(v), f"{caminho}: deve ser {descricao}"))
+    if 'enum' in regra:
+        permitidos = list(regra['enum'])
+        checagens.append(_checagem(lambda v: v not in permitidos,
+                                   f"{caminho}: valor fora de {permitidos}"))
+    # As demais palavras-chave só se aplicam ao tipo correspondente (como no servidor)
+    if 'pattern' in regra:
+        busca = re.compile(regra['pattern']).search
+        checagens.append(_checagem(lambda v: type(v) is str and busca(v) is None,
+                                   f"{caminho}: não corresponde ao padrão {regra['pattern']}"))
+    if 'minLength' in regra:
+        minimo = regra['minLength']
+        checagens.append(_checagem(lambda v: type(v) is str and len(v) < minimo,
+                                   f"{caminho}: tamanho deve ser >= {minimo}"))
+    if 'maxLength' in regra:
+        maximo = regra['maxLength']
+        checagens.append(_checagem(lambda v: type(v) is str and len(v) > maximo,
+                                   f"{caminho}: tamanho deve ser <= {maximo}"))
+    if 'minimum' in regra:
+        checagens.append(_limite(caminho, regra['minimum'], regra.get('exclusiveMinimum', False), True))
+    if 'maximum' in regra:
+        checagens.append(_limite(caminho, regra['maximum'], regra.get('exclusiveMaximum', False), False))
+    if 'properties' in regra or 'required' in regra or 'additionalProperties' in regra:
+        subdocumento = _compilar_objeto(caminho, regra)
+        checagens.append(lambda v: subdocumento(v) if isinstance(v, Mapping) else None)
+    return checagens
+
+
+def _limite(caminho, limite, exclusivo, minimo):
+    if isinstance(limite, Decimal128):
+        limite = limite.to_decimal()
+    if minimo:
+        operador = '>' if exclusivo else '>='
+        fora = (lambda v: v <= limite) if exclusivo else (lambda v: v < limite)
+    else:
+        operador = '<' if exclusivo else '<='
+        fora = (lambda v: v >= limite) if exclusivo else (lambda v: v > limite)
+
+    def _fora(valor):
+        if isinstance(valor, Decimal128):
+            valor = valor.to_decimal()
+        elif not _numerico(valor):
+            return False
+        if isinstance(valor, Decimal) and valor.is_nan():
+            # Na ordem do servidor NaN fica abaixo de qualquer número
+            return minimo
+        return fora(valor)
+
+    return _checagem(_fora, f"{caminho}: deve ser {operador} {limite}")
+
+
+def _numerico(valor):
+    return type(valor) in (int, float, Int64) or isinstance(valor, Decimal)
+
+
+def _compilar_objeto(caminho, schema):
+    """Função documento -> lista de erros para um schema de objeto"""
+    obrigatorios = tuple(schema.get('required', ()))
+    propriedades = tuple(
+        (campo, tuple(_compilar_campo(f"{caminho}.{campo}" if caminho else campo, regra)))
+        for campo, regra in schema.get('properties', {}).items()
+    )
+    adicionais = schema.get('additionalProperties', True)
+    if not isinstance(adicionais, bool):
+        raise ValueError("additionalProperties só é suportado como booleano")
+    permitidos = {campo for campo, _ in propriedades} | {'_id'}
+    prefixo = f"{caminho}." if caminho else ''
+
+    def validar(documento):
+        erros = []
+        for campo in obrigatorios:
+            if campo not in documento:
+                erros.append(f"{prefixo}{campo}: obrigatório")
+        for campo, checagens in propriedades:
+            valor = documento.get(campo, _AUSENTE)
+            if valor is _AUSENTE:
+                continue
+            for checagem in checagens:
+                erro = checagem(valor)
+                if erro is None:
+                    continue
+                if type(erro) is list:
+                    erros.extend(erro)
+                else:
+                    erros.append(erro)
+        if not adicionais:
+            erros.extend(f"{prefixo}{campo}: campo não permitido"
+                         for campo in documento if campo not in permitidos)
+        return erros
+
+    return validar
+
+
+_AUSENTE = object()
+
+
+class SchemaValidator:
+    """Validador compilado a partir de um $jsonSchema"""
+
+    def __init__(self, schema, colecao=None):
+        """
+        Compila o schema
+
+        Args:
+            schema (dict): $jsonSchema (bsonType 'object' na raiz)
+            colecao (str, optional): Nome da coleção, usado nas mensagens
+
+        Raises:
+            ValueError: Schema com palavras-chave não suportadas
+        """
+        if schema.get('bsonType', 'object') != 'object':
+            raise ValueError("O $jsonSchema de uma coleção deve ter bsonType 'object'")
+        self.schema = schema
+        self.colecao = colecao
+        self._validar = _compilar_objeto('', {k: v for k, v in schema.items() if k != 'bsonType'})
+
+    def errors(self, documento):
+        """Lista de erros do documento (vazia se válido)"""
+        return self._validar(documento)
+
+    def is_valid(self, documento):
+        return not self._validar(documento)
+
+    def split(self, documentos):
+        """
+        Separa documentos válidos e inválidos
+
+        Returns:
+            tuple: (válidos, [(índice, documento, erros), ...])
+        """
+        validos, invalidos = [], []
+        validar = self._validar
+        for indice, documento in enumerate(documentos):
+            erros = validar(documento)
+            if erros:
+                invalidos.append((indice, documento, erros))
+            else:
+                validos.append(documento)
+        return validos, invalidos
+
+
+@functools.lru_cache(maxsize=None)
+def validator_for(colecao='usuarios', caminho=INIT_SCRIPT):
+    """
+    Validador da coleção, compilado uma vez por processo
+
+    Returns:
+        SchemaValidator: Validador (None se a coleção não tem $jsonSchema)
+    """
+    schema = load_schema(colecao, caminho)
+    return SchemaValidator(schema, colecao) if schema is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mostra e mede o validador compilado de init-mongo.js")
+    parser.add_argument('--colecao', default='usuarios', help="Coleção em init-mongo.js")
+    parser.add_argument('--benchmark', action='store_true', help="Mede documentos validados por segundo")
+    parser.add_argument('--documentos', type=int, default=200000, help="Documentos no benchmark")
+    args = parser.parse_args()
+
+    validador = validator_for(args.colecao)
+    if validador is None:
+        print(f"ℹ️ {args.colecao} não tem $jsonSchema em init-mongo.js")
+        return
+    print(json.dumps(validador.schema, indent=2, ensure_ascii=False))
+    if args.benchmark:
+        documentos = [
+            {'nome': f"Usuário {i}", 'email': f"usuario{i}@exemplo.com" if i % 10 else "inválido",
+             'idade': i % 200, 'cidade': "São Paulo", 'ativo': True}
+            for i in range(args.documentos)
+        ]
+        inicio = time.perf_counter()
+        validos, invalidos = validador.split(documentos)
+        duracao = time.perf_counter() - inicio
+        print(f"\n✅ {len(validos)} válidos, {len(invalidos)} inválidos em {duracao:.3f} s "
+              f"({len(documentos) / duracao:,.0f} docs/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""
+Configuração comum dos testes
+Os módulos do projeto ficam na raiz do repositório; os testes rodam sobre o
+mongomock, sem servidor MongoDB.
+"""
+
+import os
+import sys
+
+import mongomock
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db():
+    """Banco em memória, novo a cada teste"""
+    return mongomock.MongoClient()['testes']
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""Reservas, decisão de pedidos e sweep de Inventory"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+from inventory import Inventory
+
+
+@pytest.fixture
+def produtos(db):
+    ids = db.produtos.insert_many([{'nome': 'Caneta', 'estoque': 10},
+                                   {'nome': 'Caderno', 'estoque': 3}]).inserted_ids
+    return db.produtos, ids
+
+
+def _estoque(collection, produto_id):
+    return collection.find_one({'_id': produto_id})['estoque']
+
+
+def test_place_order_baixa_todos_os_itens(produtos):
+    collection, (caneta, caderno) = produtos
+    inventario = Inventory(collection)
+
+    resultado = inventario.place_order({caneta: 4, caderno: 3})
+
+    assert resultado['ok'] and resultado['tentativas'] == 1
+    assert _estoque(collection, caneta) == 6
+    assert _estoque(collection, caderno) == 0
+    assert inventario.order_status(resultado['pedido']) == 'confirmado'
+    # Reservas são removidas depois da confirmação
+    assert collection.count_documents({'reservas.0': {'$exists': True}}) == 0
+
+
+def test_place_order_sem_estoque_devolve_itens_reservados(produtos):
+    collection, (caneta, caderno) = produtos
+    inventario = Inventory(collection)
+
+    resultado = inventario.place_order([(caneta, 2), (caderno, 5)])
+
+    assert not resultado['ok']
+    assert resultado['faltantes'] == {caderno: 3}
+    assert _estoque(collection, caneta) == 10
+    assert _estoque(collection, caderno) == 3
+    assert collection.count_documents({'reservas.0': {'$exists': True}}) == 0
+    assert inventario.order_status(resultado['pedido']) is None
+
+
+def test_quantidade_invalida(produtos):
+    collection, (caneta, _) = produtos
+    with pytest.raises(ValueError):
+        Inventory(collection).place_order({caneta: 0})
+
+
+def _reserva_abandonada(collection, produto_id, quantidade, idade_s=600):
+    """Simula um processo que reservou e morreu antes de decidir o pedido"""
+    pedido = ObjectId()
+    em = datetime.now(timezone.utc) - timedelta(seconds=idade_s)
+    collection.update_one({'_id': produto_id}, {
+        '$inc': {'estoque': -quantidade},
+        '$push': {'reservas': {'pedido': pedido, 'quantidade': quantidade, 'em': em}},
+    })
+    return pedido
+
+
+def test_sweep_cancela_e_devolve_reserva_abandonada(produtos):
+    collection, (caneta, _) = produtos
+    inventario = Inventory(collection)
+    pedido = _reserva_abandonada(collection, caneta, 4)
+
+    assert inventario.sweep_reservations(idade_maxima_s=300) == 1
+
+    assert _estoque(collection, caneta) == 10
+    assert inventario.order_status(pedido) == 'cancelado'
+    assert not collection.find_one({'_id': caneta}).get('reservas')
+
+
+def test_sweep_ignora_reservas_recentes(produtos):
+    collection, (caneta, _) = produtos
+    inventario = Inventory(collection)
+    pedido = _reserva_abandonada(collection, caneta, 4, idade_s=10)
+
+    assert inventario.sweep_reservations(idade_maxima_s=300) == 0
+
+    assert _estoque(collection, caneta) == 6
+    assert inventario.order_status(pedido) is None
+
+
+def test_sweep_nao_devolve_estoque_de_pedido_confirmado(produtos):
+    collection, (caneta, _) = produtos
+    inventario = Inventory(collection)
+    # Pedido confirmado cuja limpeza das reservas falhou
+    pedido = _reserva_abandonada(collection, caneta, 4)
+    inventario.decisoes.insert_one({'_id': pedido, 'estado': 'confirmado',
+                                    'em': datetime.now(timezone.utc)})
+
+    assert inventario.sweep_reservations(idade_maxima_s=300) == 0
+
+    assert _estoque(collection, caneta) == 6
+    assert inventario.order_status(pedido) == 'confirmado'
+    assert not collection.find_one({'_id': caneta}).get('reservas')
+
+
+class _SweepVenceAPrimeiraDecisao(Inventory):
+    """Cancela o primeiro pedido antes da confirmação, como um sweep concorrente"""
+
+    cancelados = 0
+
+    def _decidir(self, pedido, estado, tentativas=3):
+        if estado == 'confirmado' and not self.cancelados:
+            self.cancelados += 1
+            super()._decidir(pedido, 'cancelado')
+        return super()._decidir(pedido, estado, tentativas)
+
+
+def test_pedido_cancelado_pelo_sweep_nao_fica_confirmado_em_parte(produtos):
+    collection, (caneta, caderno) = produtos
+    inventario = _SweepVenceAPrimeiraDecisao(collection, espera_base_s=0)
+
+    resultado = inventario.place_order({caneta: 2, caderno: 1})
+
+    # A primeira tentativa perde para o cancelamento e devolve tudo; a segunda confirma
+    assert resultado['ok'] and resultado['tentativas'] == 2
+    assert _estoque(collection, caneta) == 8
+    assert _estoque(collection, caderno) == 2
+    assert inventario.decisoes.count_documents({'estado': 'cancelado'}) == 1
+    assert inventario.order_status(resultado['pedido']) == 'confirmado'
+    assert collection.count_documents({'reservas.0': {'$exists': True}}) == 0
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Spool do CounterBuffer: falhas de envio e recuperação após queda"""
+
+import glob
+
+import pytest
+from pymongo.errors import AutoReconnect
+
+from post_counters import CounterBuffer
+
+
+class _ForaDoAr:
+    """Coleção cujos bulk_write falham enquanto fora_do_ar for True"""
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.fora_do_ar = True
+
+    def bulk_write(self, operacoes, ordered=True):
+        if self.fora_do_ar:
+            raise AutoReconnect("servidor indisponível")
+        return self._collection.bulk_write(operacoes, ordered=ordered)
+
+    def __getattr__(self, nome):
+        return getattr(self._collection, nome)
+
+
+@pytest.fixture
+def post(db):
+    return db.posts.insert_one({'titulo': 'Olá', 'visualizacoes': 0, 'likes': 0}).inserted_id
+
+
+def _contadores(db, post):
+    doc = db.posts.find_one({'_id': post})
+    return doc['visualizacoes'], doc['likes']
+
+
+def test_falha_no_envio_mantem_incrementos_e_spool(db, post, tmp_path):
+    spool = str(tmp_path / 'contadores.spool')
+    collection = _ForaDoAr(db.posts)
+    buffer = CounterBuffer(collection, max_intervalo_s=None, spool_path=spool)
+    for _ in range(3):
+        buffer.increment(post)
+    buffer.increment(post, 'likes')
+
+    assert buffer.flush() == 0
+    assert buffer.stats['falhas'] == 1
+    assert buffer.pending(post) == {'visualizacoes': 3, 'likes': 1}
+    assert len(glob.glob(f"{spool}.*.enviando")) == 1
+
+    buffer.increment(post)
+    collection.fora_do_ar = False
+    assert buffer.flush() == 1
+
+    assert _contadores(db, post) == (4, 1)
+    assert buffer.pending() == {}
+    assert glob.glob(f"{spool}.*.enviando") == []
+    buffer.close()
+
+
+def test_incrementos_nao_enviados_sao_reaplicados_ao_reiniciar(db, post, tmp_path):
+    spool = str(tmp_path / 'contadores.spool')
+    collection = _ForaDoAr(db.posts)
+    anterior = CounterBuffer(collection, max_intervalo_s=None, spool_path=spool)
+    anterior.increment(post, n=2)
+    anterior.flush()
+    anterior.increment(post, 'likes')
+    # Queda do processo: nada mais é enviado nem removido
+    anterior._spool.close()
+    with open(spool, 'a', encoding='utf-8') as arquivo:
+        arquivo.write('{"id": {"$oid": "')
+
+    novo = CounterBuffer(db.posts, max_intervalo_s=None, spool_path=spool)
+
+    assert novo.stats['reaplicados'] == 2
+    assert _contadores(db, post) == (2, 1)
+    assert glob.glob(f"{spool}.*.enviando") == []
+    novo.close()
+
+
+def test_contador_desconhecido(db, post):
+    with pytest.raises(ValueError):
+        CounterBuffer(db.posts, max_intervalo_s=None).increment(post, 'compartilhamentos')
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Guarda de época do DocumentCache e invalidação pelas escritas do CRUD"""
+
+import pytest
+
+import user_cache
+from mongodb_crud import MongoDBCRUD
+from user_cache import DocumentCache
+
+
+def test_get_devolve_copia_isolada():
+    cache = DocumentCache()
+    _, epoca = cache.get('1')
+    cache.put('1', {'_id': '1', 'nome': 'Ana'}, epoca)
+
+    documento, _ = cache.get('1')
+    documento['nome'] = 'Alterado'
+
+    assert cache.get('1')[0]['nome'] == 'Ana'
+    assert cache.stats()['hits'] == 2
+
+
+def test_leitura_anterior_a_uma_escrita_nao_grava_valor_antigo():
+    cache = DocumentCache()
+    _, epoca = cache.get('1')
+    # Uma escrita termina entre a leitura no servidor e o put()
+    cache.invalidate('1')
+
+    cache.put('1', {'_id': '1', 'nome': 'Antigo'}, epoca)
+
+    assert cache.get('1')[0] is None
+
+
+def test_put_durante_escrita_em_andamento_e_ignorado():
+    cache = DocumentCache()
+    cache.begin_write()
+    _, epoca = cache.get('1')
+    cache.put('1', {'_id': '1'}, epoca)
+    # A escrita não afetou a chave '1': mesmo assim nada foi guardado durante ela
+    cache.end_write(['2'])
+
+    assert cache.keys() == []
+    _, epoca = cache.get('1')
+    cache.put('1', {'_id': '1'}, epoca)
+    assert cache.keys() == ['1']
+
+
+def test_lru_e_orcamento_de_memoria():
+    cache = DocumentCache(max_itens=2)
+    for chave in 'abc':
+        cache.put(chave, {'_id': chave}, cache.get(chave)[1])
+        if chave == 'b':
+            cache.get('a')
+
+    assert sorted(cache.keys()) == ['a', 'c']
+    assert cache.stats()['evictions'] == 1
+
+    pequeno = DocumentCache(max_bytes=10)
+    pequeno.put('x', {'_id': 'x', 'nome': 'grande demais'}, 0)
+    assert pequeno.keys() == []
+
+
+def test_ttl_expira_entradas(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(user_cache.time, 'monotonic', lambda: agora[0])
+    cache = DocumentCache(ttl_s=5)
+    cache.put('1', {'_id': '1'}, 0)
+
+    agora[0] += 6
+
+    assert cache.get('1')[0] is None
+    assert cache.stats()['expirations'] == 1
+
+
+# Integração com o CRUD
+@pytest.fixture
+def crud(db):
+    crud = MongoDBCRUD("mongodb://mongomock/", db.name, verbosity="quiet",
+                       ensure_indexes=False)
+    crud.client = db.client
+    crud.db = db
+    crud.collection = db["usuarios"]
+    crud.enable_cache()
+    return crud
+
+
+def test_update_invalida_usuario_em_cache(crud):
+    user_id = crud.create_user("Ana", "ana@exemplo.com", 30)
+    crud.read_user_by_id(user_id)
+    assert crud.read_user_by_id(user_id)['idade'] == 30
+    assert crud.cache_stats()['hits'] == 1
+
+    crud.update_user(user_id, {"idade": 31})
+    assert crud.read_user_by_id(user_id)['idade'] == 31
+
+    crud.update_multiple_users({"nome": "Ana"}, {"idade": 32})
+    assert crud.read_user_by_id(user_id)['idade'] == 32
+
+    crud.delete_user(user_id)
+    assert crud.read_user_by_id(user_id) is None
+
+
+class _EscritaDuranteLeitura:
+    """Coleção cujo find_one roda uma escrita logo após ler o documento"""
+
+    def __init__(self, collection, escrita):
+        self._collection = collection
+        self._escrita = escrita
+
+    def find_one(self, *args, **kwargs):
+        documento = self._collection.find_one(*args, **kwargs)
+        escrita, self._escrita = self._escrita, None
+        if escrita is not None:
+            escrita()
+        return documento
+
+    def __getattr__(self, nome):
+        return getattr(self._collection, nome)
+
+
+def test_leitura_concorrente_com_update_nao_guarda_versao_antiga(crud):
+    user_id = crud.create_user("Ana", "ana@exemplo.com", 30)
+    original = crud.collection
+    crud.collection = _EscritaDuranteLeitura(
+        original, lambda: crud.update_user(user_id, {"idade": 40}))
+
+    # A leitura devolve o valor que leu, mas não o deixa no cache
+    assert crud.read_user_by_id(user_id)['idade'] == 30
+    crud.collection = original
+
+    assert crud.cache.keys() == []
+    assert crud.read_user_by_id(user_id)['idade'] == 40
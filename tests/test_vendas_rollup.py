@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Reserva dos rollups e combinação de resumos parciais com a cauda"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+from vendas_rollup import COLECAO_MARCAS, VendasRollup
+
+BLOCO_S = 3600
+
+
+def _oid(instante):
+    """ObjectId do instante, com o restante aleatório (vários por segundo)"""
+    return ObjectId(ObjectId.from_datetime(instante).binary[:4] + os.urandom(8))
+
+
+@pytest.fixture
+def rollup(db):
+    return VendasRollup(db, atraso_s=0, bloco_s=BLOCO_S)
+
+
+@pytest.fixture
+def blocos():
+    """Início de três blocos consecutivos, terminando algumas horas atrás"""
+    agora = datetime.now(timezone.utc).timestamp()
+    inicio = int(agora // BLOCO_S) * BLOCO_S - 5 * BLOCO_S
+    return [datetime.fromtimestamp(inicio + i * BLOCO_S, timezone.utc) for i in range(3)]
+
+
+# Reserva
+def test_segundo_refresh_nao_reserva_rollup_em_uso(rollup):
+    dono, outro = ObjectId(), ObjectId()
+
+    assert rollup._reservar('vendas_por_produto', dono) is not None
+    assert rollup._reservar('vendas_por_produto', outro) is None
+
+    limite = ObjectId()
+    rollup._liberar('vendas_por_produto', dono, limite)
+    assert rollup.watermark('vendas_por_produto') == limite
+    assert rollup._reservar('vendas_por_produto', outro) is not None
+
+
+def test_liberar_de_outro_dono_nao_move_a_marca(rollup):
+    dono, outro = ObjectId(), ObjectId()
+    rollup._reservar('vendas_por_produto', dono)
+
+    rollup._liberar('vendas_por_produto', outro, ObjectId())
+
+    assert rollup.watermark('vendas_por_produto') is None
+    assert rollup._reservar('vendas_por_produto', ObjectId()) is None
+
+
+def test_reserva_expirada_pode_ser_assumida(db):
+    rollup = VendasRollup(db, reserva_s=-1)
+    interrompido, novo = ObjectId(), ObjectId()
+    rollup._reservar('vendas_por_produto', interrompido)
+
+    assert rollup._reservar('vendas_por_produto', novo) is not None
+
+    # O refresh interrompido não libera nem avança a reserva do novo dono
+    rollup._liberar('vendas_por_produto', interrompido, ObjectId())
+    marca = db[COLECAO_MARCAS].find_one({'_id': 'vendas_por_produto'})
+    assert marca['dono'] == novo and 'ultimo_id' not in marca
+
+
+# Relatórios
+def _vender(db, instante, produto, total):
+    db.vendas.insert_one({'_id': _oid(instante), 'produto': produto, 'total': total,
+                          'quantidade': 1})
+
+
+def _resumo(db, bloco, produto, total, numero):
+    db.vendas_por_produto.insert_one({
+        '_id': {'chave': produto, 'bloco': bloco},
+        'total_vendas': total, 'quantidade_vendida': numero, 'numero_vendas': numero,
+    })
+
+
+def _marcar(db, instante, bloco_s=BLOCO_S):
+    db[COLECAO_MARCAS].insert_one({'_id': 'vendas_por_produto', 'ultimo_id': _oid(instante),
+                                   'bloco_s': bloco_s})
+
+
+def _totais(rollup):
+    return {item['_id']: (item['total_vendas'], item['numero_vendas'])
+            for item in rollup.vendas_por_produto()}
+
+
+def test_relatorio_soma_blocos_anteriores_ao_corte_e_cauda(db, rollup, blocos):
+    b0, b1, b2 = blocos
+    for bloco in blocos:
+        _vender(db, bloco + timedelta(minutes=10), 'A', 10)
+    _vender(db, b1 + timedelta(minutes=40), 'B', 7)
+    _resumo(db, b0, 'A', 10, 1)
+    # Blocos a partir do corte estão sendo reescritos por um refresh: valores
+    # parciais que não podem entrar no relatório
+    _resumo(db, b1, 'A', 999, 99)
+    _resumo(db, b2, 'B', 999, 99)
+    _marcar(db, b1 + timedelta(minutes=30))
+
+    assert rollup._corte('vendas_por_produto') == b1
+    assert _totais(rollup) == {'A': (30, 3), 'B': (7, 1)}
+
+
+def test_relatorio_sem_marca_le_apenas_a_cauda(db, rollup, blocos):
+    for bloco in blocos:
+        _vender(db, bloco, 'A', 5)
+    _resumo(db, blocos[0], 'A', 999, 99)
+
+    assert rollup._corte('vendas_por_produto') is None
+    assert _totais(rollup) == {'A': (15, 3)}
+
+
+def test_marca_sem_bloco_s_nao_usa_resumos_antigos(db, rollup, blocos):
+    _vender(db, blocos[0], 'A', 5)
+    _resumo(db, blocos[0], 'A', 999, 99)
+    _marcar(db, blocos[2], bloco_s=None)
+
+    assert rollup._corte('vendas_por_produto') is None
+    assert _totais(rollup) == {'A': (5, 1)}
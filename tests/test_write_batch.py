@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Reenvio de lotes do WriteBatch após falhas de rede"""
+
+import pytest
+from pymongo.errors import AutoReconnect
+
+from write_batch import WriteBatch
+
+
+class _RespostaPerdida:
+    """Coleção cujo primeiro bulk_write grava `gravar` operações e perde a resposta"""
+
+    def __init__(self, collection, gravar=None):
+        self._collection = collection
+        self._gravar = gravar
+        self.envios = 0
+
+    def bulk_write(self, operacoes, ordered=True):
+        self.envios += 1
+        if self.envios == 1:
+            parte = operacoes if self._gravar is None else operacoes[:self._gravar]
+            if parte:
+                self._collection.bulk_write(parte, ordered=ordered)
+            raise AutoReconnect("conexão perdida")
+        return self._collection.bulk_write(operacoes, ordered=ordered)
+
+    def __getattr__(self, nome):
+        return getattr(self._collection, nome)
+
+
+def _lote(collection, **opcoes):
+    return WriteBatch(collection, max_intervalo_s=None, **opcoes)
+
+
+def test_reenvio_de_inserts_ja_gravados_conta_como_sucesso(db):
+    collection = _RespostaPerdida(db.usuarios)
+    lote = _lote(collection)
+    lote.insert({'nome': 'Ana'})
+    lote.insert({'nome': 'Bia'})
+
+    with pytest.raises(AutoReconnect):
+        lote.flush()
+    assert lote.resultado['falhas_envio'] == 1
+
+    resultado = lote.flush()
+
+    assert resultado['erros'] == []
+    assert resultado['reenvios_confirmados'] == 2
+    assert resultado['inseridos'] == 2
+    assert db.usuarios.count_documents({}) == 2
+
+
+def test_lote_ordenado_reenvia_o_restante_apos_insert_confirmado(db):
+    collection = _RespostaPerdida(db.usuarios, gravar=1)
+    lote = _lote(collection, ordered=True)
+    for nome in ('Ana', 'Bia', 'Caio'):
+        lote.insert({'nome': nome})
+
+    with pytest.raises(AutoReconnect):
+        lote.flush()
+    # O reenvio para no insert já gravado e devolve o restante à fila
+    lote.flush()
+    resultado = lote.flush()
+
+    assert resultado['erros'] == []
+    assert resultado['reenvios_confirmados'] == 1
+    assert resultado['inseridos'] == 3
+    assert resultado['operacoes'] == 3
+    assert sorted(doc['nome'] for doc in db.usuarios.find()) == ['Ana', 'Bia', 'Caio']
+
+
+def test_chave_duplicada_sem_reenvio_continua_sendo_erro(db):
+    db.usuarios.insert_one({'_id': 1, 'nome': 'Ana'})
+    lote = _lote(db.usuarios)
+    lote.insert({'_id': 1, 'nome': 'Outra Ana'})
+
+    resultado = lote.flush()
+
+    assert resultado['reenvios_confirmados'] == 0
+    assert [erro['codigo'] for erro in resultado['erros']] == [11000]
+    assert resultado['por_tipo']['insert'] == {'ok': 0, 'erros': 1}
+
+
+def test_falha_no_envio_final_nao_esconde_a_excecao_do_bloco(db):
+    collection = _RespostaPerdida(db.usuarios, gravar=0)
+
+    with pytest.raises(KeyError):
+        with _lote(collection) as lote:
+            lote.insert({'nome': 'Ana'})
+            raise KeyError('erro original')
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache em processo para leituras por ID
+Este módulo implementa um cache LRU com TTL e limite de memória, usado por
+MongoDBCRUD.read_user_by_id e invalidado pelas escritas da própria classe.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+import bson
+from bson.raw_bson import RawBSONDocument
+
+
+class DocumentCache:
+    """Cache LRU/TTL de documentos, guardados como BSON para isolar cópias e medir memória"""
+
+    def __init__(self, max_itens=10000, ttl_s=60.0, max_bytes=64 * 1024 * 1024):
+        """
+        Inicializa o cache
+
+        Args:
+            max_itens (int): Número máximo de documentos em cache
+            ttl_s (float): Tempo de vida de cada entrada, em segundos (None = sem expiração)
+            max_bytes (int): Orçamento de memória para os documentos em cache
+        """
+        self.max_itens = max_itens
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._itens = OrderedDict()
+        self._bytes = 0
+        # Época de invalidação e escritas em andamento: uma leitura iniciada antes
+        # de uma escrita nunca grava no cache o valor antigo
+        self._epoca = 0
+        self._escritas = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, chave, raw=False):
+        """
+        Busca um documento no cache
+
+        Args:
+            chave (str): Chave do documento (ID)
+            raw (bool): Devolve RawBSONDocument sobre os bytes guardados, sem decodificar
+
+        Returns:
+            tuple: (documento ou None, época) — a época deve ser repassada a put()
+        """
+        with self._lock:
+            entrada = self._itens.get(chave)
+            if entrada is not None:
+                dados, expira_em = entrada
+                if expira_em is None or expira_em > time.monotonic():
+                    self._itens.move_to_end(chave)
+                    self.hits += 1
+                    documento = RawBSONDocument(dados) if raw else bson.decode(dados)
+                    return documento, self._epoca
+                self._remover(chave)
+                self.expirations += 1
+            self.misses += 1
+            return None, self._epoca
+
+    def put(self, chave, documento, epoca):
+        """
+        Guarda um documento lido do servidor
+
+        Args:
+            chave (str): Chave do documento (ID)
+            documento (dict): Documento lido
+            epoca (int): Época devolvida por get() antes da leitura
+        """
+        dados = bson.encode(documento)
+        if len(dados) > self.max_bytes:
+            return
+        expira_em = time.monotonic() + self.ttl_s if self.ttl_s is not None else None
+        with self._lock:
+            if self._escritas or epoca != self._epoca:
+                return
+            if chave in self._itens:
+                self._remover(chave)
+            self._itens[chave] = (dados, expira_em)
+            self._bytes += len(dados)
+            while len(self._itens) > self.max_itens or self._bytes > self.max_bytes:
+                antiga, _ = next(iter(self._itens.items()))
+                self._remover(antiga)
+                self.evictions += 1
+
+    def _remover(self, chave):
+        dados, _ = self._itens.pop(chave)
+        self._bytes -= len(dados)
+
+    def keys(self):
+        """Retorna as chaves atualmente em cache"""
+        with self._lock:
+            return list(self._itens)
+
+    def begin_write(self):
+        """Marca o início de uma escrita; leituras concorrentes deixam de popular o cache"""
+        with self._lock:
+            self._escritas += 1
+            self._epoca += 1
+
+    def end_write(self, chaves=None, tudo=False):
+        """
+        Marca o fim de uma escrita e invalida as chaves afetadas
+
+        Args:
+            chaves (iterable, optional): Chaves a invalidar
+            tudo (bool): Limpa o cache inteiro
+        """
+        with self._lock:
+            self._escritas -= 1
+            self._epoca += 1
+            if tudo:
+                self.invalidations += len(self._itens)
+                self._itens.clear()
+                self._bytes = 0
+            else:
+                for chave in chaves or ():
+                    if chave in self._itens:
+                        self._remover(chave)
+                        self.invalidations += 1
+
+    def invalidate(self, *chaves):
+        """Remove as chaves informadas do cache"""
+        self.begin_write()
+        self.end_write(chaves)
+
+    def clear(self):
+        """Esvazia o cache"""
+        self.begin_write()
+        self.end_write(tudo=True)
+
+    def stats(self):
+        """
+        Retorna os contadores do cache
+
+        Returns:
+            dict: itens, bytes, hits, misses, evictions, expirations, invalidations, hit_ratio
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'itens': len(self._itens),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rollups incrementais da coleção de vendas
+Este módulo mantém coleções de resumo (vendas por dia, por produto e por
+vendedor) atualizadas com $merge a partir de uma marca d'água (_id da última
+venda consolidada). Os relatórios leem os resumos e agregam apenas a "cauda" de
+vendas posteriores à marca, em vez de um $group sobre toda a coleção.
+
+Os resumos são parciais por bloco de tempo do _id (bloco_s, 1 hora por padrão):
+cada documento guarda os totais de uma chave num bloco e é recalculado por
+inteiro, com whenMatched 'replace'. Assim, reprocessar um intervalo não conta
+nada duas vezes, e cada refresh() recalcula também os blocos da janela de
+reprocessamento (janela_s antes da marca). Vendas com ObjectId abaixo da marca
+que chegam atrasadas (relógio adiantado ou atrasado num cliente, escritor
+lento) entram no próximo refresh(), desde que o atraso não passe de janela_s;
+além disso, só backfill() as recupera.
+
+A marca avança só até vendas com alguns segundos de idade (atraso_s), o que
+mantém na cauda as vendas mais recentes. Cada rollup é reservado em
+rollup_marcas (find_one_and_update) antes de ser atualizado, então dois
+refresh() simultâneos não processam o mesmo rollup ao mesmo tempo.
+
+Os relatórios leem a marca primeiro e dividem as vendas no início do bloco que
+a contém: blocos anteriores vêm do resumo e o resto vem da cauda. Um refresh()
+em andamento só reescreve blocos a partir desse ponto (ou blocos antigos com o
+mesmo conteúdo), então resumo e cauda nunca cobrem as mesmas vendas.
+
+Uso:
+    python vendas_rollup.py --database vendas_db --backfill   # recalcula do zero
+    python vendas_rollup.py --database vendas_db              # atualização incremental
+"""
+
+import argparse
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+
+COLECAO_VENDAS = 'vendas'
+COLECAO_MARCAS = 'rollup_marcas'
+
+# Rollups: coleção de destino, chave de agrupamento e acumuladores somados
+ROLLUPS = {
+    'vendas_diarias': {
+        'chave': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$data_venda'}},
+        'campos': {'total_dia': '$total', 'vendas_dia': 1, 'quantidade_dia': '$quantidade'},
+    },
+    'vendas_por_produto': {
+        'chave': '$produto',
+        'campos': {'total_vendas': '$total', 'quantidade_vendida': '$quantidade',
+                   'numero_vendas': 1},
+    },
+    'vendas_por_vendedor': {
+        'chave': '$vendedor',
+        'campos': {'total_vendas': '$total', 'numero_vendas': 1,
+                   'quantidade_vendida': '$quantidade'},
+    },
+}
+
+
+def _group(rollup, bloco_s=None):
+    """$group pela chave do rollup (e pelo bloco de tempo do _id, se bloco_s)"""
+    chave = rollup['chave']
+    if bloco_s:
+        instante = {'$toLong': {'$toDate': '$_id'}}
+        bloco = {'$toDate': {'$subtract': [instante, {'$mod': [instante, bloco_s * 1000]}]}}
+        chave = {'chave': chave, 'bloco': bloco}
+    return {
+        '$group': {
+            '_id': chave,
+            **{campo: {'$sum': origem} for campo, origem in rollup['campos'].items()},
+        }
+    }
+
+
+class VendasRollup:
+    """Mantém e consulta os resumos incrementais da coleção de vendas"""
+
+    def __init__(self, db, atraso_s=5.0, atualizar_ao_inserir=False, janela_s=600,
+                 bloco_s=3600, reserva_s=300):
+        """
+        Args:
+            db (Database): Banco que contém a coleção vendas
+            atraso_s (float): Idade mínima de uma venda para entrar no resumo
+            atualizar_ao_inserir (bool): insert_sales() dispara refresh() após inserir
+                (consolida só as vendas anteriores, mais velhas que atraso_s; as
+                recém-inseridas ficam na cauda até o refresh() seguinte)
+            janela_s (float): Quanto antes da marca cada refresh() reprocessa
+                (maior atraso tolerado para uma venda chegar)
+            bloco_s (int): Duração dos blocos de tempo dos resumos parciais
+            reserva_s (float): Validade da reserva de um rollup (um refresh()
+                interrompido a libera quando ela expira)
+        """
+        self.db = db
+        self.vendas = db[COLECAO_VENDAS]
+        self.marcas = db[COLECAO_MARCAS]
+        self.atraso_s = atraso_s
+        self.atualizar_ao_inserir = atualizar_ao_inserir
+        self.janela_s = janela_s
+        self.bloco_s = int(bloco_s)
+        self.reserva_s = reserva_s
+
+    # Marca d'água
+    def watermark(self, nome):
+        """_id da última venda consolidada no rollup (None se nunca atualizado)"""
+        marca = self.marcas.find_one({'_id': nome})
+        return marca.get('ultimo_id') if marca else None
+
+    def _limite(self):
+        # Primeiro ObjectId possível para o instante agora - atraso
+        instante = datetime.now(timezone.utc) - timedelta(seconds=self.atraso_s)
+        return ObjectId.from_datetime(instante)
+
+    def _inicio_reprocessamento(self, marca):
+        # Início do bloco que contém marca - janela (os blocos são recalculados inteiros)
+        instante = marca.generation_time.timestamp() - self.janela_s
+        inicio = int(instante // self.bloco_s) * self.bloco_s
+        return ObjectId.from_datetime(datetime.fromtimestamp(inicio, timezone.utc))
+
+    def _reservar(self, nome, dono):
+        """
+        Reserva o rollup para este refresh()
+
+        Returns:
+            dict|None: Documento da marca, ou None se outro refresh() o reservou
+        """
+        agora = datetime.now(timezone.utc)
+        try:
+            return self.marcas.find_one_and_update(
+                {'_id': nome, '$or': [{'reservado_ate': None}, {'reservado_ate': {'$lt': agora}}]},
+                {'$set': {'reservado_ate': agora + timedelta(seconds=self.reserva_s), 'dono': dono}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # A marca existe e está reservada: o upsert tentou criar outra
+            return None
+
+    def _liberar(self, nome, dono, limite=None):
+        """Libera a reserva, avançando a marca para limite (se informado)"""
+        atualizacao = {'$unset': {'reservado_ate': '', 'dono': ''}}
+        if limite is not None:
+            atualizacao['$set'] = {'ultimo_id': limite, 'bloco_s': self.bloco_s,
+                                   'atualizado_em': datetime.now(timezone.utc)}
+        # Só o dono libera: se a reserva expirou e outro refresh() a assumiu, nada muda
+        self.marcas.update_one({'_id': nome, 'dono': dono}, atualizacao)
+
+    # Atualização
+    def _consolidar(self, nome, rollup, limite, recalcular=False):
+        """
+        Recalcula os blocos entre a marca (menos a janela) e limite
+
+        Returns:
+            ObjectId|None: Nova marca, ou None se o rollup está reservado
+        """
+        dono = ObjectId()
+        marca = self._reservar(nome, dono)
+        if marca is None:
+            return None
+        try:
+            inicio = marca.get('ultimo_id')
+            # Resumos de outro bloco_s (ou do formato antigo) não se combinam: recalcula
+            if recalcular or marca.get('bloco_s') != self.bloco_s:
+                self.db[nome].drop()
+                inicio = None
+            intervalo = {'$lt': limite}
+            if inicio is not None:
+                limite = max(limite, inicio)
+                intervalo = {'$gte': self._inicio_reprocessamento(inicio), '$lt': limite}
+            self.vendas.aggregate([
+                {'$match': {'_id': intervalo}},
+                _group(rollup, self.bloco_s),
+                {'$merge': {
+                    'into': nome,
+                    'on': '_id',
+                    'whenMatched': 'replace',
+                    'whenNotMatched': 'insert',
+                }},
+            ])
+        except BaseException:
+            self._liberar(nome, dono)
+            raise
+        self._liberar(nome, dono, limite)
+        return limite
+
+    def refresh(self):
+        """
+        Consolida nos rollups as vendas até o limite de atraso
+
+        Cada rollup é reservado, recalculado a partir da marca menos janela_s e
+        liberado com a nova marca. Rollups reservados por outro refresh() em
+        andamento são pulados (a marca devolvida é a atual). Uma interrupção
+        antes de liberar não duplica nada: o próximo refresh() recalcula os
+        mesmos blocos.
+
+        Returns:
+            dict: Marca d'água resultante por rollup
+        """
+        limite = self._limite()
+        marcas = {}
+        for nome, rollup in ROLLUPS.items():
+            marcas[nome] = self._consolidar(nome, rollup, limite) or self.watermark(nome)
+        return marcas
+
+    def backfill(self):
+        """
+        Descarta os rollups e os recalcula a partir de toda a coleção de vendas
+
+        Raises:
+            RuntimeError: Algum rollup está reservado por um refresh() em andamento
+        """
+        limite = self._limite()
+        marcas = {}
+        for nome, rollup in ROLLUPS.items():
+            marca = self._consolidar(nome, rollup, limite, recalcular=True)
+            if marca is None:
+                raise RuntimeError(f"Rollup {nome} reservado por outro refresh(); tente de novo")
+            marcas[nome] = marca
+        return marcas
+
+    def insert_sales(self, vendas):
+        """
+        Insere vendas e, se configurado, atualiza os rollups em seguida
+
+        As vendas inseridas aqui têm menos de atraso_s segundos e nunca entram no
+        refresh() disparado por esta chamada; os relatórios as leem pela cauda.
+        Consolide com refresh() periódico (ex.: python vendas_rollup.py via cron).
+
+        Returns:
+            list: IDs inseridos
+        """
+        resultado = self.vendas.insert_many(vendas)
+        if self.atualizar_ao_inserir:
+            self.refresh()
+        return resultado.inserted_ids
+
+    # Relatórios
+    def _corte(self, nome):
+        """
+        Início do bloco que contém a marca (None se não há resumo utilizável)
+
+        Blocos anteriores ao corte estão completos no resumo; vendas a partir
+        dele são lidas da cauda.
+        """
+        marca = self.marcas.find_one({'_id': nome}, {'ultimo_id': 1, 'bloco_s': 1})
+        if not marca or marca.get('ultimo_id') is None or not marca.get('bloco_s'):
+            return None
+        bloco_s = marca['bloco_s']
+        instante = marca['ultimo_id'].generation_time.timestamp()
+        return datetime.fromtimestamp(int(instante // bloco_s) * bloco_s, timezone.utc)
+
+    def _tail(self, nome, corte, match=None):
+        """Agrega as vendas a partir do corte (todas, sem corte)"""
+        filtro = dict(match or {})
+        if corte is not None:
+            filtro['_id'] = {'$gte': ObjectId.from_datetime(corte)}
+        return {doc['_id']: doc for doc in self.vendas.aggregate([{'$match': filtro},
+                                                                  _group(ROLLUPS[nome])])}
+
+    def _combinar(self, nome, filtro_rollup=None, match_cauda=None):
+        campos = ROLLUPS[nome]['campos']
+        # A marca é lida antes dos blocos: um refresh() concorrente pode reescrever
+        # blocos a partir do corte, mas esses ficam de fora e vêm da cauda
+        corte = self._corte(nome)
+        resultado = {}
+        if corte is not None:
+            # Soma os resumos parciais dos blocos anteriores ao corte, por chave
+            blocos = self.db[nome].aggregate([
+                {'$match': {**(filtro_rollup or {}), '_id.bloco': {'$lt': corte}}},
+                {'$group': {'_id': '$_id.chave',
+                            **{campo: {'$sum': f'${campo}'} for campo in campos}}},
+            ])
+            resultado = {doc['_id']: doc for doc in blocos}
+        for chave, parcial in self._tail(nome, corte, match_cauda).items():
+            atual = resultado.setdefault(chave, {'_id': chave, **{c: 0 for c in campos}})
+            for campo in campos:
+                atual[campo] = atual.get(campo, 0) + parcial[campo]
+        return list(resultado.values())
+
+    def vendas_por_produto(self):
+        """Total vendido e quantidade por produto, do maior para o menor"""
+        itens = self._combinar('vendas_por_produto')
+        return sorted(itens, key=lambda item: item['total_vendas'], reverse=True)
+
+    def vendas_por_vendedor(self):
+        """Total vendido e número de vendas por vendedor, do maior para o menor"""
+        itens = self._combinar('vendas_por_vendedor')
+        return sorted(itens, key=lambda item: item['total_vendas'], reverse=True)
+
+    def vendas_por_dia(self, data_limite):
+        """
+        Total e número de vendas por dia a partir de data_limite
+
+        O resumo diário é por dia inteiro (UTC): o primeiro dia é incluído completo.
+        """
+        dia_inicial = data_limite.strftime('%Y-%m-%d')
+        itens = self._combinar(
+            'vendas_diarias',
+            filtro_rollup={'_id.chave': {'$gte': dia_inicial}},
+            match_cauda={'data_venda': {'$gte': datetime.strptime(dia_inicial, '%Y-%m-%d')}},
+        )
+        return sorted(itens, key=lambda item: item['_id'])
+
+
+def main():
+    from mongodb_crud import MongoDBCRUD
+
+    parser = argparse.ArgumentParser(description="Atualiza os rollups da coleção de vendas")
+    parser.add_argument('--environment', help="Ambiente de config.py (padrão: auto-detectado)")
+    parser.add_argument('--database', help="Banco de dados (padrão: o do ambiente)")
+    parser.add_argument('--backfill', action='store_true', help="Recalcula os rollups do zero")
+    args = parser.parse_args()
+
+    crud = MongoDBCRUD(database_name=args.database, environment=args.environment,
+                       ensure_indexes=False)
+    if not crud.connect():
+        print("❌ Não foi possível conectar ao MongoDB.")
+        return
+    try:
+        rollup = VendasRollup(crud.db)
+        marcas = rollup.backfill() if args.backfill else rollup.refresh()
+        for nome, marca in marcas.items():
+            if marca is None:
+                print(f"ℹ️ {nome}: reservado por outro refresh em andamento")
+            else:
+                print(f"✅ {nome}: consolidado até {marca.generation_time:%Y-%m-%d %H:%M:%S} UTC")
+    finally:
+        crud.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lote de escritas mistas para o MongoDB
+Este módulo acumula inserções, atualizações, substituições e remoções e as envia
+em poucas chamadas bulk_write, em vez de uma ida ao servidor por operação.
+
+Se o envio falhar por erro de rede ou do servidor (PyMongoError que não seja
+BulkWriteError), as operações voltam para o início da fila e o envio é
+reagendado; o erro é registrado no logger e em resultado['falhas_envio'].
+Os inserts reenviados mantêm o _id gerado no primeiro envio: se aquele envio
+chegou ao servidor, o reenvio recebe chave duplicada (11000) no _id, que conta
+como sucesso (resultado['reenvios_confirmados']) e não como erro.
+"""
+
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from bson import ObjectId
+from pymongo import DeleteOne, InsertOne, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from bulk_loader import ERRO_CHAVE_DUPLICADA
+from crud_logging import logger
+
+
+def _object_id(doc_id):
+    return ObjectId(doc_id) if isinstance(doc_id, str) else doc_id
+
+
+class WriteBatch:
+    """Acumula operações de escrita e as envia via bulk_write"""
+
+    def __init__(self, collection, max_ops=1000, max_intervalo_s=1.0, ordered=False,
+                 invalidar=None):
+        """
+        Inicializa o lote
+
+        Args:
+            collection (Collection): Coleção de destino
+            max_ops (int): Envia o lote ao atingir este número de operações
+            max_intervalo_s (float): Envia o lote quando a operação mais antiga
+                pendente tiver esperado este tempo (None desativa)
+            ordered (bool): Executa as operações em ordem, parando no primeiro erro
+            invalidar (callable, optional): Fábrica de context manager chamada como
+                invalidar(chaves=..., filtro=...) em volta de cada bulk_write, para
+                invalidar caches dos documentos afetados
+        """
+        self.collection = collection
+        self.max_ops = max_ops
+        self.max_intervalo_s = max_intervalo_s
+        self.ordered = ordered
+        self.invalidar = invalidar
+        self._lock = threading.RLock()
+        self._pendentes = []
+        self._tipos = []
+        self._chaves = []
+        self._emails = []
+        self._timer = None
+        self._total_enviadas = 0
+        # id() dos InsertOne que voltaram para a fila após uma falha de envio
+        self._reenviados = set()
+        self.resultado = {
+            'operacoes': 0,
+            'lotes': 0,
+            'inseridos': 0,
+            'casados': 0,
+            'modificados': 0,
+            'removidos': 0,
+            'upserts': 0,
+            'por_tipo': {},
+            'erros': [],
+            'falhas_envio': 0,
+            'ultimo_erro_envio': None,
+            'reenvios_confirmados': 0,
+        }
+
+    # Operações
+    def insert(self, documento):
+        """Agenda a inserção de um documento (com data_criacao e ativo)"""
+        documento = {**documento, 'data_criacao': datetime.now(),
+                     'ativo': documento.get('ativo', True)}
+        self._adicionar('insert', InsertOne(documento))
+
+    def update(self, doc_id, novos_dados):
+        """Agenda um $set no documento com o _id informado"""
+        novos_dados = {**novos_dados, 'data_atualizacao': datetime.now()}
+        self._adicionar('update', UpdateOne({'_id': _object_id(doc_id)}, {'$set': novos_dados}),
+                        chave=doc_id)
+
+    def replace(self, doc_id, documento):
+        """Agenda a substituição completa do documento com o _id informado"""
+        self._adicionar('replace', ReplaceOne({'_id': _object_id(doc_id)}, documento), chave=doc_id)
+
+    def delete(self, doc_id):
+        """Agenda a remoção do documento com o _id informado"""
+        self._adicionar('delete', DeleteOne({'_id': _object_id(doc_id)}), chave=doc_id)
+
+    def upsert_by_email(self, email, dados):
+        """Agenda a atualização do usuário com o email informado, criando-o se não existir"""
+        agora = datetime.now()
+        campos = {**dados, 'email': email, 'data_atualizacao': agora}
+        # Um campo não pode estar em $set e $setOnInsert (conflito de caminho)
+        na_criacao = {campo: valor for campo, valor in
+                      (('data_criacao', agora), ('ativo', True)) if campo not in campos}
+        alteracao = {'$set': campos}
+        if na_criacao:
+            alteracao['$setOnInsert'] = na_criacao
+        self._adicionar('upsert', UpdateOne({'email': email}, alteracao, upsert=True),
+                        email=email)
+
+    # Controle do lote
+    def _adicionar(self, tipo, operacao, chave=None, email=None):
+        with self._lock:
+            self._pendentes.append(operacao)
+            self._tipos.append(tipo)
+            if chave is not None:
+                self._chaves.append(chave)
+            if email is not None:
+                self._emails.append(email)
+            if len(self._pendentes) >= self.max_ops:
+                self.flush()
+            elif len(self._pendentes) == 1 and self.max_intervalo_s:
+                self._agendar_envio()
+
+    def _agendar_envio(self):
+        self._cancelar_timer()
+        self._timer = threading.Timer(self.max_intervalo_s, self._flush_agendado)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _cancelar_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _flush_agendado(self):
+        # Executado pela thread do Timer: ninguém recebe a exceção, então o
+        # erro fica no logger e no resultado (flush() já os registrou)
+        try:
+            self.flush()
+        except PyMongoError:
+            pass
+        except Exception as e:
+            logger.exception("Falha no envio agendado do lote", extra={
+                'colecao': self.collection.name, 'erro': type(e).__name__,
+            })
+
+    def flush(self):
+        """
+        Envia as operações pendentes
+
+        Returns:
+            dict: Resultado acumulado do lote
+
+        Raises:
+            PyMongoError: Falha de rede ou do servidor no envio (exceto
+                BulkWriteError, contado em resultado['erros']); as operações
+                continuam pendentes e o envio é reagendado
+        """
+        with self._lock:
+            self._cancelar_timer()
+            if not self._pendentes:
+                return self.resultado
+            # A fila é trocada sob o lock: novas operações vão para uma lista nova
+            operacoes, tipos = self._pendentes, self._tipos
+            chaves, emails = self._chaves, self._emails
+            self._pendentes, self._tipos, self._chaves, self._emails = [], [], [], []
+            base = self._total_enviadas
+
+            if self.invalidar is not None:
+                filtro = {'email': {'$in': emails}} if emails else None
+                contexto = self.invalidar(chaves=chaves, filtro=filtro)
+            else:
+                contexto = nullcontext()
+
+            inicio = time.perf_counter()
+            try:
+                with contexto:
+                    try:
+                        resultado = self.collection.bulk_write(operacoes, ordered=self.ordered)
+                        contagens = resultado.bulk_api_result
+                        erros = []
+                    except BulkWriteError as e:
+                        contagens = e.details or {}
+                        erros = contagens.get('writeErrors', [])
+            except PyMongoError as e:
+                # Sem confirmação do servidor: as operações voltam para o início
+                # da fila (inserts reenviados com o mesmo _id não se duplicam)
+                self._pendentes[:0] = operacoes
+                self._tipos[:0] = tipos
+                self._reenviados.update(id(op) for op, tipo in zip(operacoes, tipos)
+                                        if tipo == 'insert')
+                self._chaves[:0] = chaves
+                self._emails[:0] = emails
+                self.resultado['falhas_envio'] += 1
+                self.resultado['ultimo_erro_envio'] = f"{type(e).__name__}: {e}"
+                logger.error("Falha ao enviar lote de %d operações: %s", len(operacoes), e, extra={
+                    'colecao': self.collection.name, 'erro': type(e).__name__,
+                })
+                if self.max_intervalo_s:
+                    self._agendar_envio()
+                raise
+
+            reenviados = [id(op) in self._reenviados for op in operacoes]
+            erros, confirmados = self._separar_reenvios(erros, tipos, reenviados)
+            if confirmados and self.ordered and (not erros or min(confirmados) < erros[0]['index']):
+                # O lote ordenado parou num insert que já estava gravado: o
+                # restante não foi executado e volta para o início da fila
+                corte = min(confirmados) + 1
+                self._pendentes[:0] = operacoes[corte:]
+                self._tipos[:0] = tipos[corte:]
+                self._chaves[:0] = chaves
+                self._emails[:0] = emails
+                operacoes, tipos = operacoes[:corte], tipos[:corte]
+                if self.max_intervalo_s and self._pendentes:
+                    self._agendar_envio()
+            self._reenviados.difference_update(id(op) for op in operacoes)
+            self._total_enviadas += len(operacoes)
+            self.resultado['inseridos'] += len(confirmados)
+            self.resultado['reenvios_confirmados'] += len(confirmados)
+            self._acumular(contagens, tipos, erros, base)
+            self.resultado['duracao_s'] = (
+                self.resultado.get('duracao_s', 0.0) + time.perf_counter() - inicio
+            )
+            return self.resultado
+
+    @staticmethod
+    def _separar_reenvios(erros, tipos, reenviados):
+        """Separa as chaves duplicadas de inserts reenviados (já gravados) dos erros reais"""
+        reais, confirmados = [], []
+        for erro in erros:
+            indice = erro.get('index', 0)
+            if (erro.get('code') == ERRO_CHAVE_DUPLICADA and tipos[indice] == 'insert'
+                    and reenviados[indice] and '_id' in (erro.get('keyValue') or {'_id': None})):
+                confirmados.append(indice)
+            else:
+                reais.append(erro)
+        return reais, confirmados
+
+    def _acumular(self, contagens, tipos, erros, base):
+        r = self.resultado
+        r['operacoes'] += len(tipos)
+        r['lotes'] += 1
+        r['inseridos'] += contagens.get('nInserted', 0)
+        r['casados'] += contagens.get('nMatched', 0)
+        r['modificados'] += contagens.get('nModified', 0)
+        r['removidos'] += contagens.get('nRemoved', 0)
+        r['upserts'] += contagens.get('nUpserted', 0)
+
+        falhas = {erro.get('index') for erro in erros}
+        if self.ordered and erros:
+            # Em lotes ordenados, nada após o primeiro erro é executado
+            primeiro = min(falhas)
+            falhas |= set(range(primeiro, len(tipos)))
+        for i, tipo in enumerate(tipos):
+            contagem = r['por_tipo'].setdefault(tipo, {'ok': 0, 'erros': 0})
+            contagem['erros' if i in falhas else 'ok'] += 1
+        for erro in erros:
+            indice = erro.get('index', 0)
+            r['erros'].append({
+                'indice': base + indice,
+                'tipo': tipos[indice],
+                'codigo': erro.get('code'),
+                'mensagem': erro.get('errmsg'),
+            })
+
+    def close(self):
+        """Envia o que estiver pendente e retorna o resultado final"""
+        return self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+            return False
+        # Já há uma exceção saindo do bloco: uma falha no envio final não a esconde
+        try:
+            self.close()
+        except Exception as e:
+            logger.error("Falha ao enviar o lote ao sair do bloco: %s", e, extra={
+                'colecao': self.collection.name, 'erro': type(e).__name__,
+            })
+        return False